@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import subprocess
+import importlib.util
+
+from synthetic import generate_capture
+
+# ===============================
+# BENCHMARK HARNESS
+# ===============================
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPOSITORY, "gar7ic.py")
+RESULTS = os.path.join(REPOSITORY, "benchmarks", "results")
+
+
+def git_commit():
+    """ Commit hash of the benchmarked tree (with a '-dirty' suffix for uncommitted changes), or None. """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPOSITORY, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPOSITORY,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def build_cases(modes, backends, formats, workers):
+    """
+    Lists the CLI configurations to measure.
+
+    :return: List of case dictionaries (mode, backend, format, workers).
+    """
+    cases = []
+    for mode in modes:
+        for backend in backends:
+            for count in workers:
+                if count > 1 and backend != "native":
+                    continue
+                for table_format in (formats if mode == "table" else ["pcapng"]):
+                    cases.append({"mode": mode, "backend": backend, "format": table_format, "workers": count})
+    return cases
+
+
+def run_case(case, capture, config, workdir):
+    """
+    Runs the CLI once in a child process and measures it.
+
+    :return: Dictionary with wall time, peak RSS (largest of the process and its workers), exit code and output size.
+    """
+    output = os.path.join(workdir, f"out-{case['mode']}-{case['backend']}-{case['workers']}.{case['format']}")
+    command = [sys.executable, SCRIPT, "-f", capture, "-c", config, "-o", output,
+               "-b", case["backend"], "-w", str(case["workers"])]
+    command += ["-t", "--format", case["format"]] if case["mode"] == "table" else ["-p"]
+
+    start = time.perf_counter()
+    env = dict(os.environ, GAR7IC_CACHE_DIR=os.path.join(workdir, "cache"))     # Compiled configurations stay with the captures
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(process.pid, 0)                     # Resource usage of this child only
+    wall = time.perf_counter() - start
+    stderr = process.stderr.read().decode(errors="replace")
+    process.stderr.close()
+
+    result = {"wall_s": round(wall, 4), "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+              "cpu_s": round(usage.ru_utime + usage.ru_stime, 4), "returncode": os.waitstatus_to_exitcode(status),
+              "output_bytes": os.path.getsize(output) if os.path.exists(output) else None}
+    if result["returncode"]:
+        result["error"] = stderr.strip().splitlines()[-1:] or None
+    if os.path.exists(output):
+        os.remove(output)
+    return result
+
+
+def compare(previous_path, results):
+    """ Prints the wall-time ratio of every case against a previous result file. """
+    with open(previous_path) as file:
+        previous = json.load(file)
+
+    key = lambda entry: (entry["packets"], entry["mode"], entry["backend"], entry["format"], entry["workers"])
+    before = {key(entry): entry for entry in previous["results"]}
+
+    print(f"\nComparison with {previous.get('commit')} ({previous_path}):")
+    for entry in results:
+        old = before.get(key(entry))
+        if old is None or not old.get("wall_s") or entry["returncode"] or old["returncode"]:
+            continue
+        ratio = entry["wall_s"] / old["wall_s"]
+        flag = "  REGRESSION" if ratio > 1.1 else ""
+        print(f"  {entry['packets']:>10} {entry['mode']:<5} {entry['backend']:<7} {entry['format']:<7} "
+              f"w={entry['workers']:<2} {old['wall_s']:>9.3f}s -> {entry['wall_s']:>9.3f}s  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GAR7IC on synthetic S7COMM captures.")
+    parser.add_argument("--sizes", default="1000,100000",
+                        help="Comma-separated capture sizes in frames (e.g. 1000,100000,1000000,10000000).")
+    parser.add_argument("--modes", default="table,pcap", help="Comma-separated modes: table, pcap.")
+    parser.add_argument("--backends", default="native,pyshark",
+                        help="Comma-separated decoding backends (pyshark is skipped when unavailable).")
+    parser.add_argument("--formats", default="csv,parquet", help="Comma-separated table formats.")
+    parser.add_argument("--workers", default="1", help="Comma-separated worker counts (native backend).")
+    parser.add_argument("--plcs", type=int, default=4, help="PLCs in the synthetic captures.")
+    parser.add_argument("--clients", type=int, default=2, help="Client connections per PLC.")
+    parser.add_argument("--tags", type=int, default=2000, help="Data block variables per PLC.")
+    parser.add_argument("--noise", type=float, default=0.0,
+                        help="Fraction of background (non-S7COMM) TCP frames in the synthetic captures.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case (the fastest is kept).")
+    parser.add_argument("--workdir", default=os.path.join(RESULTS, "captures"),
+                        help="Directory for generated captures (reused between runs).")
+    parser.add_argument("-o", "--output", help="Result JSON file (default: benchmarks/results/<commit>.json).")
+    parser.add_argument("--compare", help="Previous result JSON file to compare against.")
+    args = parser.parse_args()
+
+    backends = args.backends.split(",")
+    if "pyshark" in backends and (importlib.util.find_spec("pyshark") is None or shutil.which("tshark") is None):
+        print("pyshark or tshark not available: skipping the pyshark backend.")
+        backends.remove("pyshark")
+    formats = args.formats.split(",")
+    if importlib.util.find_spec("pyarrow") is None:
+        formats = [table_format for table_format in formats if table_format == "csv"]
+
+    cases = build_cases(args.modes.split(","), backends, formats, [int(count) for count in args.workers.split(",")])
+    os.makedirs(args.workdir, exist_ok=True)
+
+    report = {"commit": git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+              "generator": {"plcs": args.plcs, "clients": args.clients, "tags": args.tags, "noise": args.noise}, "results": []}
+
+    for packets in (int(size) for size in args.sizes.split(",")):
+        name = f"synthetic-{packets}-{args.plcs}x{args.clients}-{args.tags}" + (f"-noise{args.noise}" if args.noise else "")
+        capture = os.path.join(args.workdir, name + ".pcapng")
+        config = os.path.join(args.workdir, name + ".yaml")
+        if not (os.path.exists(capture) and os.path.exists(config)):
+            print(f"Generating {packets} frames...")
+            generate_capture(capture, config, packets=packets, plcs=args.plcs, clients=args.clients, tags=args.tags,
+                             noise=args.noise)
+
+        for case in cases:
+            runs = [run_case(case, capture, config, args.workdir) for _ in range(args.repeat)]
+            result = min(runs, key=lambda run: (run["returncode"] != 0, run["wall_s"]))
+            result.update(case, packets=packets, capture_bytes=os.path.getsize(capture),
+                          packets_per_s=round(packets / result["wall_s"]))
+            report["results"].append(result)
+            print(f"  {packets:>10} {case['mode']:<5} {case['backend']:<7} {case['format']:<7} w={case['workers']:<2} "
+                  f"{result['wall_s']:>9.3f}s {result['packets_per_s']:>10} pkt/s {result['peak_rss_mb']:>8.1f} MB"
+                  + (f"  FAILED: {result.get('error')}" if result["returncode"] else ""))
+
+    output = args.output or os.path.join(RESULTS, f"{report['commit'] or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to '{output}'.")
+
+    if args.compare:
+        compare(args.compare, report["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import heapq
+import random
+import struct
+import socket
+import argparse
+
+import yaml
+
+# ===============================
+# SYNTHETIC S7COMM CAPTURES
+# ===============================
+
+# Tag types of the generated configurations and their size in bytes
+TAG_TYPES = (("BOOL", 1), ("INT", 2), ("REAL", 4), ("DINT", 4), ("WORD", 2), ("UINT", 2), ("BYTE", 1), ("LREAL", 8))
+
+TAGS_PER_DB = 250                                                   # Variables per generated data block
+IO_TAGS = 16                                                        # BOOL inputs and outputs per PLC
+S7_PORT = 102
+NOISE_PORTS = (443, 445, 80, 3389)                                  # Server ports of the background traffic
+START_TIME_NS = 1_740_841_672_000_000_000                           # 2025-03-01, like the example captures
+
+AREA_INPUTS, AREA_OUTPUTS, AREA_DATA_BLOCK = 0x81, 0x82, 0x84
+TRANSPORT_BIT, TRANSPORT_BYTE = 0x01, 0x02                          # Request transport sizes
+DATA_BIT, DATA_BYTE = 0x03, 0x04                                    # Data transport sizes (lengths in bits)
+
+
+def build_config(plcs, tags):
+    """
+    Builds a PLC configuration with many tags and the address layout used to generate requests.
+
+    :param plcs: Number of PLCs.
+    :param tags: Number of data block variables per PLC.
+    :return: Tuple (configuration dictionary, {PLC IP: list of (area, db, byte, bit, size)}).
+    """
+    config = {"plc": []}
+    layout = {}
+
+    for plc_index in range(plcs):
+        ip = f"10.0.{plc_index // 250}.{plc_index % 250 + 1}"
+        data_blocks, addresses = [], []
+
+        for tag_index in range(tags):
+            db_index, position = divmod(tag_index, TAGS_PER_DB)
+            if position == 0:
+                data_blocks.append({"name": f"DB{db_index + 1}", "number": db_index + 1, "variables": []})
+                byte = 0
+
+            data_type, size = TAG_TYPES[tag_index % len(TAG_TYPES)]
+            byte += byte % 2 if size > 1 else 0                     # Word-aligned like S7 data blocks
+            bit = tag_index % 8 if data_type == "BOOL" else 0
+            data_blocks[-1]["variables"].append({"name": f"PLC{plc_index + 1}.DB{db_index + 1}.Tag{position}",
+                                                 "address": f"{byte}.{bit}", "type": data_type})
+            addresses.append((AREA_DATA_BLOCK, db_index + 1, byte, bit, size))
+            byte += size
+
+        io = {"inputs": [], "outputs": []}
+        for area_name, area in (("inputs", AREA_INPUTS), ("outputs", AREA_OUTPUTS)):
+            for index in range(IO_TAGS):
+                io[area_name].append({"name": f"PLC{plc_index + 1}.{area_name}.{index}",
+                                      "address": f"{index // 8}.{index % 8}", "type": "BOOL"})
+                addresses.append((area, 0, index // 8, index % 8, 1))
+
+        config["plc"].append({"name": f"PLC{plc_index + 1}", "model": "CPU 315-2 PN/DP", "ip": ip,
+                              "rack": 0, "slot": 2, "port": S7_PORT,
+                              "io_mapping": dict(data_block=data_blocks, **io)})
+        layout[ip] = addresses
+
+    return config, layout
+
+
+# ===============================
+# PACKET BUILDING
+# ===============================
+
+def _request_item(area, db, byte, bit, size):
+    """ S7ANY item of a request: BIT access for BOOL variables, BYTE access otherwise. """
+    if size == 1 and bit:
+        transport, length, address = TRANSPORT_BIT, 1, byte * 8 + bit
+    else:
+        transport, length, address = TRANSPORT_BYTE, size, byte * 8
+    return struct.pack(">BBBBHHB", 0x12, 0x0a, 0x10, transport, length, db, area) + address.to_bytes(3, "big")
+
+
+def _data_item(data, bit_access, last, returncode=0xff):
+    """ Data item of a READ response or WRITE request, with its fill byte when needed. """
+    transport, length = (DATA_BIT, 1) if bit_access else (DATA_BYTE, len(data) * 8)
+    fill = b"\x00" if len(data) % 2 and not last else b""
+    return struct.pack(">BBH", returncode, transport, length) + data + fill
+
+
+def _s7_pdu(rosctr, pduref, param, data):
+    """ S7COMM PDU (12-byte header with error fields for ACK_DATA) wrapped in TPKT and COTP DT. """
+    if rosctr == 0x03:
+        header = struct.pack(">BBHHHHBB", 0x32, rosctr, 0, pduref, len(param), len(data), 0, 0)
+    else:
+        header = struct.pack(">BBHHHH", 0x32, rosctr, 0, pduref, len(param), len(data))
+    pdu = b"\x02\xf0\x80" + header + param + data
+    return struct.pack(">BBH", 3, 0, len(pdu) + 4) + pdu
+
+
+def _ipv4_checksum(header):
+    total = sum(struct.unpack("!10H", header))
+    total = (total & 0xffff) + (total >> 16)
+    return ~((total & 0xffff) + (total >> 16)) & 0xffff
+
+
+class _Connection:
+    """ One client -> PLC TCP connection with its sequence numbers and PDU reference counter. """
+
+    def __init__(self, client_ip, client_port, plc_ip, addresses, period_ns, rng, server_port=S7_PORT):
+        self.client = (socket.inet_aton(client_ip), client_port)
+        self.plc = (socket.inet_aton(plc_ip), server_port)
+        self.addresses = addresses
+        self.period_ns = period_ns
+        self.seq = {self.client: rng.getrandbits(32), self.plc: rng.getrandbits(32)}
+        self.pduref = rng.randrange(1, 0x10000)
+        self.ip_id = rng.getrandbits(16)
+
+    def frame(self, from_client, payload):
+        """ Ethernet/IPv4/TCP frame carrying a payload in one direction, advancing the sequence numbers. """
+        src, dst = (self.client, self.plc) if from_client else (self.plc, self.client)
+        seq, ack = self.seq[src], self.seq[dst]
+        self.seq[src] = (seq + len(payload)) & 0xffffffff
+        self.ip_id = (self.ip_id + 1) & 0xffff
+
+        tcp = struct.pack(">HHIIBBHHH", src[1], dst[1], seq, ack, 0x50, 0x18 if payload else 0x10, 8192, 0, 0)
+        ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp) + len(payload), self.ip_id, 0x4000, 64, 6, 0,
+                         src[0], dst[0])
+        ip = ip[:10] + struct.pack(">H", _ipv4_checksum(ip)) + ip[12:]
+        macs = b"\x00\x1b\x1b" + src[0][1:] + b"\x00\x1b\x1b" + dst[0][1:]
+        return macs[6:] + macs[:6] + b"\x08\x00" + ip + tcp + payload
+
+    def next_pduref(self):
+        self.pduref = self.pduref % 0xffff + 1
+        return self.pduref
+
+
+def _exchange(connection, rng, max_items, write_ratio, range_ratio):
+    """
+    Builds one request and its response on a connection.
+
+    :return: Tuple (request payload, response payload).
+    """
+    pduref = connection.next_pduref()
+    write = rng.random() < write_ratio
+    count = rng.randint(1, max_items)
+
+    items = []
+    for _ in range(count):
+        area, db, byte, bit, size = rng.choice(connection.addresses)
+        if not write and area == AREA_DATA_BLOCK and rng.random() < range_ratio:
+            size = rng.choice((8, 16, 32))                          # Block read spanning several variables
+        items.append((area, db, byte, bit, size))
+
+    param = bytes([0x05 if write else 0x04, count]) + b"".join(_request_item(*item) for item in items)
+    values = [rng.randbytes(size) if not (size == 1 and bit) else bytes([rng.getrandbits(1)])
+              for _, _, _, bit, size in items]
+    data = b"".join(_data_item(value, size == 1 and bit, index == count - 1, returncode=0x00)
+                    for index, (value, (_, _, _, bit, size)) in enumerate(zip(values, items)))
+
+    if write:
+        request = _s7_pdu(0x01, pduref, param, data)
+        response = _s7_pdu(0x03, pduref, bytes([0x05, count]), b"\xff" * count)
+    else:
+        request = _s7_pdu(0x01, pduref, param, b"")
+        response_data = b"".join(_data_item(value, size == 1 and bit, index == count - 1)
+                                 for index, (value, (_, _, _, bit, size)) in enumerate(zip(values, items)))
+        response = _s7_pdu(0x03, pduref, bytes([0x04, count]), response_data)
+
+    return request, response
+
+
+def _setup_communication(connection):
+    """ SETUP_COMMUNICATION request and response opening a connection. """
+    pduref = connection.next_pduref()
+    param = struct.pack(">BBHHH", 0xf0, 0, 1, 1, 480)
+    return _s7_pdu(0x01, pduref, param, b""), _s7_pdu(0x03, pduref, param, b"")
+
+
+# ===============================
+# PCAPNG OUTPUT
+# ===============================
+
+def _pcapng_block(block_type, body):
+    total_length = len(body) + 12
+    return struct.pack("<II", block_type, total_length) + body + struct.pack("<I", total_length)
+
+
+def _pcapng_header():
+    """ Section header and one Ethernet interface with nanosecond timestamps. """
+    shb = _pcapng_block(0x0a0d0d0a, struct.pack("<IHHq", 0x1a2b3c4d, 1, 0, -1))
+    idb = _pcapng_block(0x00000001, struct.pack("<HHI", 1, 0, 65535) + struct.pack("<HHB3x", 9, 1, 9) + b"\x00" * 4)
+    return shb + idb
+
+
+def _pcapng_packet(timestamp_ns, frame):
+    padding = b"\x00" * (-len(frame) % 4)
+    body = struct.pack("<IIIII", 0, timestamp_ns >> 32, timestamp_ns & 0xffffffff, len(frame), len(frame))
+    return _pcapng_block(0x00000006, body + frame + padding)
+
+
+def generate_capture(capture_path, config_path, packets=100_000, plcs=4, clients=2, tags=2000, max_items=8,
+                     write_ratio=0.2, range_ratio=0.1, ack_ratio=0.3, noise=0.0, seed=7):
+    """
+    Writes a synthetic S7COMM capture and the matching YAML configuration.
+
+    Every PLC is polled by several client connections at their own rate. Responses arrive after a
+    random latency that may exceed the polling period, so requests of one connection overlap and
+    requests of different connections interleave. Some responses are followed by a bare TCP ACK.
+    With noise, unrelated TCP traffic between office hosts is mixed in, as on a mirrored plant network.
+
+    :param capture_path: Output pcapng path.
+    :param config_path: Output YAML configuration path.
+    :param packets: Number of frames to write.
+    :param plcs: Number of PLCs.
+    :param clients: Number of client connections per PLC.
+    :param tags: Number of data block variables per PLC.
+    :param max_items: Maximum number of items per READ/WRITE job.
+    :param write_ratio: Fraction of WRITE jobs.
+    :param range_ratio: Fraction of READ items spanning several variables.
+    :param ack_ratio: Fraction of responses followed by a bare TCP ACK frame.
+    :param noise: Fraction of the frames that are background (non-S7COMM) TCP traffic.
+    :param seed: Random seed (same parameters and seed give the same files).
+    :return: Dictionary of generation statistics.
+    """
+    rng = random.Random(seed)
+    config, layout = build_config(plcs, tags)
+    with open(config_path, "w") as file:
+        yaml.dump(config, file, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper), sort_keys=False)
+
+    connections = []
+    for plc_index, (plc_ip, addresses) in enumerate(layout.items()):
+        for client_index in range(clients):
+            client_ip = f"10.1.{client_index // 250}.{client_index % 250 + 1}"
+            connections.append(_Connection(client_ip, 49152 + plc_index, plc_ip, addresses,
+                                           rng.randrange(1_000_000, 20_000_000), rng))
+    background = [_Connection(f"10.2.0.{index + 1}", 50000 + index, f"10.3.0.{index % 8 + 1}", None, None, rng,
+                              NOISE_PORTS[index % len(NOISE_PORTS)]) for index in range(32 if noise else 0)]
+
+    # Events (time, order, connection index, frame builder) in capture-time order
+    events = []
+    order = 0
+    for index, connection in enumerate(connections):
+        request, response = _setup_communication(connection)
+        start = START_TIME_NS + rng.randrange(0, 1_000_000)
+        heapq.heappush(events, (start, order, index, True, request))
+        heapq.heappush(events, (start + 200_000, order + 1, index, False, response))
+        heapq.heappush(events, (start + 1_000_000, order + 2, index, None, None))
+        order += 3
+
+    written = requests = 0
+    with open(capture_path, "wb") as file:
+        file.write(_pcapng_header())
+
+        while written < packets:
+            timestamp, _, index, from_client, payload = heapq.heappop(events)
+            connection = connections[index]
+
+            if payload is None and from_client is None:             # Next poll of this connection
+                request, response = _exchange(connection, rng, max_items, write_ratio, range_ratio)
+                latency = rng.randrange(100_000, 3 * connection.period_ns // 2)
+                heapq.heappush(events, (timestamp, order, index, True, request))
+                heapq.heappush(events, (timestamp + latency, order + 1, index, False, response))
+                if rng.random() < ack_ratio:
+                    heapq.heappush(events, (timestamp + latency + 20_000, order + 2, index, True, b""))
+                heapq.heappush(events, (timestamp + connection.period_ns, order + 3, index, None, None))
+                order += 4
+                requests += 1
+                continue
+
+            while noise and written < packets and rng.random() < noise:       # Geometric run: noise is a fraction of all frames
+                noise_frame = rng.choice(background).frame(rng.random() < 0.3, rng.randbytes(rng.randrange(0, 1400)))
+                file.write(_pcapng_packet(timestamp, noise_frame))
+                written += 1
+            if written == packets:
+                break
+
+            file.write(_pcapng_packet(timestamp, connection.frame(from_client, payload)))
+            written += 1
+
+    return {"packets": written, "requests": requests, "plcs": plcs, "connections": len(connections),
+            "tags": plcs * (tags + 2 * IO_TAGS)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic S7COMM capture and its GAR7IC configuration.")
+    parser.add_argument("-o", "--output", default="synthetic", help="Output prefix (<prefix>.pcapng and <prefix>.yaml).")
+    parser.add_argument("-n", "--packets", type=int, default=100_000, help="Number of frames.")
+    parser.add_argument("--plcs", type=int, default=4, help="Number of PLCs.")
+    parser.add_argument("--clients", type=int, default=2, help="Client connections per PLC.")
+    parser.add_argument("--tags", type=int, default=2000, help="Data block variables per PLC.")
+    parser.add_argument("--max-items", type=int, default=8, help="Maximum items per READ/WRITE job.")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fraction of WRITE jobs.")
+    parser.add_argument("--noise", type=float, default=0.0,
+                        help="Fraction of background (non-S7COMM) TCP frames, e.g. 0.95 for a mirrored plant network.")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed.")
+    args = parser.parse_args()
+
+    stats = generate_capture(f"{args.output}.pcapng", f"{args.output}.yaml", packets=args.packets, plcs=args.plcs,
+                             clients=args.clients, tags=args.tags, max_items=args.max_items,
+                             write_ratio=args.write_ratio, noise=args.noise, seed=args.seed)
+    print(f"Wrote {stats['packets']} frames ({stats['requests']} requests, {stats['connections']} connections, "
+          f"{stats['tags']} tags) to '{args.output}.pcapng' and '{args.output}.yaml'.")
+
+
+if __name__ == "__main__":
+    main()
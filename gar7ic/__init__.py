@@ -0,0 +1,26 @@
+from .enums import S7CommParamFunction, S7CommHeaderRosctr, S7CommMemoryArea, S7CommTransportSize, S7CommItemResponse
+from .capture import CaptureReader, iter_capture_frames, iter_file_frames
+from .annotate import annotate_pcapng, write_annotated_pcapng
+from .decoder import Decoder, FrameFilter, decode_s7_frame, iter_s7_packets, parse_s7comm
+from .index import RecordFilter, build_capture_index, load_capture_index, save_capture_index
+from .config import build_fast_lookup, compile_config, load_config
+from .correlation import RequestCorrelator
+from .labeling import Labeler, iter_records, label_packet_comments, label_packet_rows
+from .rules import RuleEngine
+from .sampler import Sampler
+from .sinks import Sink, CsvLineSink, PcapngSink, StoreSink, TableSink, TimeSeriesSink, TrafficSink
+from .store import RecordStore
+from .stats import Stats
+from .timeseries import TimeSeries
+from .traffic import TrafficStats
+
+__all__ = [
+    "S7CommParamFunction", "S7CommHeaderRosctr", "S7CommMemoryArea", "S7CommTransportSize", "S7CommItemResponse",
+    "CaptureReader", "iter_capture_frames", "iter_file_frames", "annotate_pcapng", "write_annotated_pcapng",
+    "Decoder", "FrameFilter", "decode_s7_frame", "iter_s7_packets", "parse_s7comm",
+    "RecordFilter", "build_capture_index", "load_capture_index", "save_capture_index",
+    "build_fast_lookup", "compile_config", "load_config", "RequestCorrelator",
+    "Labeler", "iter_records", "label_packet_comments", "label_packet_rows", "RuleEngine", "Sampler",
+    "Sink", "CsvLineSink", "PcapngSink", "StoreSink", "TableSink", "TimeSeriesSink", "TrafficSink", "RecordStore",
+    "Stats", "TimeSeries", "TrafficStats"
+]
@@ -0,0 +1,186 @@
+import struct
+import functools
+
+from .capture import (PCAPNG_SHB, PCAPNG_IDB, PCAPNG_PB, PCAPNG_SPB, PCAPNG_EPB, PCAPNG_BYTE_ORDER_MAGIC,
+                      PCAPNG_OPT_IF_TSRESOL, _parse_pcapng_idb, _parse_pcap_header, _read_pcap_header,
+                      _iter_pcap_records, _iter_pcapng_blocks, _iter_mapped_pcap_records, _iter_mapped_pcapng_blocks,
+                      _pcapng_block_frame, _is_pcapng, _is_pcap)
+
+# ===============================
+# ANNOTATED PCAPNG WRITER
+# ===============================
+
+PCAPNG_OPT_COMMENT = 1
+
+
+def _pad4(length):
+    """ Rounds a length up to the next 32-bit boundary, as required by pcapng. """
+    return (length + 3) & ~3
+
+
+def _pcapng_comment_options(comments, endian):
+    """
+    Encodes comments as a list of pcapng opt_comment options.
+
+    :param comments: List of comment strings.
+    :param endian: Struct endianness prefix of the current section.
+    :return: Encoded options (without the terminating opt_endofopt).
+    """
+    options = []
+    for comment in comments:
+        text = comment.encode("utf-8")
+        options.append(struct.pack(endian + "HH", PCAPNG_OPT_COMMENT, len(text)))
+        options.append(text + b"\x00" * (_pad4(len(text)) - len(text)))
+    return b"".join(options)
+
+
+def _pcapng_block(block_type, endian, body):
+    """ Frames a block body with its type and (repeated) total length. """
+    total_length = len(body) + 12
+    return struct.pack(endian + "II", block_type, total_length) + body + struct.pack(endian + "I", total_length)
+
+
+def _comment_pcapng_block(block_type, endian, block, comments):
+    """
+    Returns a copy of a packet block with extra opt_comment options appended.
+
+    Existing options are preserved. Simple Packet Blocks cannot carry options and are
+    rewritten as Enhanced Packet Blocks on interface 0.
+
+    :param block_type: Block type (only PCAPNG_EPB, PCAPNG_PB and PCAPNG_SPB blocks can be commented).
+    :param endian: Struct endianness prefix of the current section.
+    :param block: Raw block bytes including framing.
+    :param comments: List of comment strings.
+    :return: New raw block bytes (the block itself when there is no comment).
+    """
+    if not comments:
+        return block
+    block = bytes(block)                                            # Only the commented blocks of a mapped capture are copied
+
+    if block_type == PCAPNG_SPB:
+        origlen = struct.unpack_from(endian + "I", block, 8)[0]
+        data = block[12:12 + min(origlen, len(block) - 16)]
+        fixed = struct.pack(endian + "IIIII", 0, 0, 0, len(data), origlen) + data + b"\x00" * (_pad4(len(data)) - len(data))
+        options = b""
+        block_type = PCAPNG_EPB
+    else:
+        caplen = struct.unpack_from(endian + "I", block, 20)[0]
+        options_offset = 28 + _pad4(caplen)
+        fixed = block[8:options_offset]
+        options = block[options_offset:-4]
+        if options.endswith(b"\x00\x00\x00\x00"):                    # Drop opt_endofopt, re-added below
+            options = options[:-4]
+
+    options += _pcapng_comment_options(comments, endian) + b"\x00\x00\x00\x00"
+    return _pcapng_block(block_type, endian, fixed + options)
+
+
+def _comment_pcap_record(body, comments):
+    """ Builds the Enhanced Packet Block of a classic pcap record, with its comments if any. """
+    if comments:
+        body += _pcapng_comment_options(comments, "<") + b"\x00\x00\x00\x00"
+    return _pcapng_block(PCAPNG_EPB, "<", body)
+
+
+def iter_pcapng_copy(src):
+    """
+    Reads capture data block by block and yields what is needed to copy it into pcapng.
+
+    Only the current block is held in memory, so the source may be a pipe. A memory-mapped
+    source (see MappedCapture) is read without copying: uncommented pcapng blocks are written
+    straight from the map. Classic pcap inputs are converted to pcapng since comments are a
+    pcapng feature.
+
+    :param src: Binary file object positioned at the start of the capture, or memoryview of a whole capture file.
+    :return: Generator of (frame, encode). frame is (frame_number, linktype, timestamp_ns, original_length,
+        frame_bytes), or None for non-packet blocks; encode(comments) returns the output block bytes.
+    """
+    mapped = isinstance(src, memoryview)
+    header = src[:4] if mapped else src.read(4)
+    if len(header) < 4:
+        return
+
+    if _is_pcapng(header):
+        frame_number = 0
+        interfaces = []
+        blocks = _iter_mapped_pcapng_blocks(src) if mapped else _iter_pcapng_blocks(src, header)
+        for block_type, endian, block in blocks:
+            frame = None
+            if block_type == PCAPNG_SHB:
+                interfaces = []
+            elif block_type == PCAPNG_IDB:
+                interfaces.append(_parse_pcapng_idb(block[8:-4], endian))
+            elif block_type in (PCAPNG_EPB, PCAPNG_PB, PCAPNG_SPB):
+                frame_number += 1
+                frame = (frame_number, *_pcapng_block_frame(block_type, endian, block, interfaces))
+            yield frame, functools.partial(_comment_pcapng_block, block_type, endian, block)
+
+    elif _is_pcap(header):
+        pcap_header = _parse_pcap_header(src) if mapped else _read_pcap_header(src, header)
+        records = _iter_mapped_pcap_records(src, pcap_header) if mapped else _iter_pcap_records(src, pcap_header)
+        tsresol = 9 if pcap_header["nano"] else 6
+        frac_scale = 1 if pcap_header["nano"] else 1000
+
+        shb = struct.pack("<IHHq", PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1) + b"\x00\x00\x00\x00"
+        idb = struct.pack("<HHI", pcap_header["linktype"], 0, pcap_header["snaplen"]) + \
+            struct.pack("<HHB3x", PCAPNG_OPT_IF_TSRESOL, 1, tsresol) + b"\x00\x00\x00\x00"
+        yield None, functools.partial(_comment_pcapng_block, PCAPNG_SHB, "<", _pcapng_block(PCAPNG_SHB, "<", shb))
+        yield None, functools.partial(_comment_pcapng_block, PCAPNG_IDB, "<", _pcapng_block(PCAPNG_IDB, "<", idb))
+
+        for frame_number, (ts_sec, ts_frac, origlen, data) in enumerate(records, 1):
+            ticks = ts_sec * 10 ** tsresol + ts_frac
+            body = struct.pack("<IIIII", 0, ticks >> 32, ticks & 0xffffffff, len(data), origlen) + \
+                data + b"\x00" * (_pad4(len(data)) - len(data))
+            frame = (frame_number, pcap_header["linktype"], ts_sec * 1_000_000_000 + ts_frac * frac_scale, origlen, data)
+            yield frame, functools.partial(_comment_pcap_record, body)
+
+    else:
+        raise ValueError(f"Unsupported capture format: {getattr(src, 'name', 'memory-mapped capture')}")
+
+
+def annotate_pcapng(src, dst, comments_for_frame, flush=False):
+    """
+    Copies capture data into pcapng in one sequential pass, commenting packets on the fly.
+
+    :param src: Binary file object positioned at the start of the capture.
+    :param dst: Binary file object receiving the pcapng output.
+    :param comments_for_frame: Callable (frame_number, linktype, timestamp_ns, original_length, frame_bytes) -> list of comments.
+    :param flush: Flush the output after every packet (streaming mode).
+    :return: Number of commented packets.
+    """
+    commented = 0
+
+    for frame, encode in iter_pcapng_copy(src):
+        texts = [] if frame is None else comments_for_frame(*frame)
+        if texts:
+            commented += 1
+        dst.write(encode(texts))
+        if flush:
+            dst.flush()
+
+    return commented
+
+
+def write_annotated_pcapng(src_path, dst_path, comments):
+    """
+    Copies a capture into a pcapng file in one sequential pass, commenting the requested packets.
+
+    :param src_path: Input pcap/pcapng file.
+    :param dst_path: Output pcapng file.
+    :param comments: Iterable of (frame_number, comment) in increasing frame order; a frame may appear several times.
+    :return: Number of commented packets.
+    """
+    comments = iter(comments)
+    pending = next(comments, None)
+
+    def take(frame_number, *frame):
+        nonlocal pending
+        texts = []
+        while pending is not None and pending[0] <= frame_number:
+            if pending[0] == frame_number:
+                texts.append(pending[1])
+            pending = next(comments, None)
+        return texts
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return annotate_pcapng(src, dst, take)
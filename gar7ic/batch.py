@@ -0,0 +1,175 @@
+import os
+import glob
+import concurrent.futures
+
+from .decoder import Decoder
+from .labeling import Labeler
+from .sinks import PcapngSink, TableSink
+from .stats import Stats
+from .table import TABLE_FORMATS
+
+# ===============================
+# BATCH PROCESSING
+# ===============================
+
+CAPTURE_EXTENSIONS = (".pcap", ".pcapng", ".cap")                   # Files picked up when a directory is given
+
+_worker_lookup = None
+
+
+def _init_worker(lookup):
+    """ Process pool initializer: keeps one copy of the address index per worker. """
+    global _worker_lookup
+    _worker_lookup = lookup
+
+
+def expand_inputs(patterns):
+    """
+    Expands the capture arguments of a batch: files, glob patterns and directories (searched recursively).
+
+    :param patterns: List of paths or glob patterns.
+    :return: List of (capture path, output path relative to the output directory, without extension), sorted by path.
+    """
+    captures = {}
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in paths:
+            if not os.path.isdir(path):
+                captures.setdefault(os.path.normpath(path), os.path.splitext(os.path.basename(path))[0])
+                continue
+
+            # Directory: keep the sub-directory layout so that captures with the same name do not collide
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name.lower().endswith(CAPTURE_EXTENSIONS):
+                        capture = os.path.normpath(os.path.join(root, name))
+                        captures.setdefault(capture, os.path.splitext(os.path.relpath(capture, path))[0])
+
+    return sorted(captures.items())
+
+
+def is_up_to_date(dst, sources):
+    """
+    Tells whether an output is newer than every file it was produced from.
+
+    :param dst: Output path.
+    :param sources: Input paths (capture, configuration).
+    :return: True if dst exists and was modified after all sources.
+    """
+    try:
+        dst_mtime = os.stat(dst).st_mtime_ns
+    except OSError:
+        return False
+    return all(os.stat(src).st_mtime_ns <= dst_mtime for src in sources)
+
+
+def process_capture(src, dst, lookup, pcap=False, table_format="csv", backend="native", stats=None, frame_filter=None,
+                    reassemble=True):
+    """
+    Labels one capture file into one output file.
+
+    The output is written under a temporary name and renamed when complete, so an interrupted run
+    never leaves a truncated file that would look up to date.
+
+    :param src: Capture path.
+    :param dst: Output path (pcapng in pcap mode, table_format otherwise).
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param pcap: Annotate a pcapng copy instead of writing a table.
+    :param table_format: Table output format (see TABLE_FORMATS).
+    :param backend: 'native' (built-in decoder) or 'pyshark' (tshark dissection).
+    :param stats: (Optional) Stats measuring the run.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :return: Request/response correlation counters (see RequestCorrelator.stats).
+    """
+    labeler = Labeler(lookup, stats=stats)
+    packets = Decoder(backend, stats=stats, frame_filter=frame_filter, reassemble=reassemble).iter_packets(src)
+    records = labeler.iter_comments(packets) if pcap else labeler.iter_rows(packets)
+
+    temporary = f"{dst}.{os.getpid()}.tmp"
+    try:
+        with (PcapngSink(src, temporary) if pcap else TableSink(temporary, table_format)) as sink:
+            sink.write_all(records)
+        os.replace(temporary, dst)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    if stats is not None:
+        stats.release(labeler.correlator)                           # Sent back to the parent process
+    return labeler.stats()
+
+
+def _process_capture_worker(src, dst, pcap, table_format, backend, profile, frame_filter, reassemble):
+    """ Batch task: labels one capture with the worker's index; returns (correlation counters, Stats or None). """
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    stats = Stats() if profile else None
+    if stats is not None:
+        stats.switch("write")                                       # Same accounting as a single-file run
+    correlation = process_capture(src, dst, _worker_lookup, pcap, table_format, backend, stats, frame_filter,
+                                  reassemble)
+    if stats is not None:
+        stats.switch("write")
+        stats.correlator = None
+    return correlation, stats
+
+
+def iter_batch(captures, output_dir, lookup, config_path=None, pcap=False, table_format="csv", backend="native",
+               jobs=None, force=False, stats=None, frame_filter=None, reassemble=True):
+    """
+    Labels many capture files concurrently, one output file per capture.
+
+    Each worker process labels whole files with its own copy of the address index. Outputs newer
+    than their capture (and configuration) are skipped unless force is set, so an interrupted or
+    repeated batch only processes new and modified captures.
+
+    :param captures: List of (capture path, output name without extension), as returned by expand_inputs.
+    :param output_dir: Directory receiving the outputs.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param config_path: (Optional) Configuration file, whose modification also invalidates the outputs.
+    :param pcap: Annotate pcapng copies instead of writing tables.
+    :param table_format: Table output format (see TABLE_FORMATS).
+    :param backend: 'native' (built-in decoder) or 'pyshark' (tshark dissection).
+    :param jobs: Number of worker processes (default: one per CPU).
+    :param force: Reprocess captures whose output is up to date.
+    :param stats: (Optional) Stats accumulating the stage times and counters of every file.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :return: Generator of (capture path, output path, result) in completion order; result holds the correlation
+        counters, None for a skipped capture, or the exception that made the capture fail.
+    """
+    extension = ".pcapng" if pcap else TABLE_FORMATS[table_format]
+    outputs = [(src, os.path.join(output_dir, name + extension)) for src, name in captures]
+
+    destinations = {}
+    for src, dst in outputs:
+        if os.path.abspath(dst) == os.path.abspath(src):
+            raise ValueError(f"Output would overwrite its capture: {src}")
+        if destinations.setdefault(os.path.abspath(dst), src) != src:
+            raise ValueError(f"Captures {destinations[os.path.abspath(dst)]} and {src} have the same output: {dst}")
+
+    tasks = []
+    for src, dst in outputs:
+        if not force and is_up_to_date(dst, [src] + ([config_path] if config_path else [])):
+            yield src, dst, None
+        else:
+            tasks.append((src, dst))
+
+    if not tasks:
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(tasks)),
+                                                initializer=_init_worker, initargs=(lookup,)) as executor:
+        futures = {executor.submit(_process_capture_worker, src, dst, pcap, table_format, backend, stats is not None,
+                                   frame_filter, reassemble): (src, dst) for src, dst in tasks}
+
+        for future in concurrent.futures.as_completed(futures):
+            src, dst = futures[future]
+            try:
+                correlation, file_stats = future.result()
+            except Exception as error:                              # One unreadable capture does not stop the batch
+                yield src, dst, error
+                continue
+            if stats is not None:
+                stats.merge(file_stats)
+            yield src, dst, correlation
@@ -0,0 +1,615 @@
+import mmap
+import zlib
+import hashlib
+import struct
+import itertools
+
+# ===============================
+# PCAP / PCAPNG READER
+# ===============================
+
+PCAP_MAGIC_MICRO = 0xa1b2c3d4
+PCAP_MAGIC_NANO = 0xa1b23c4d
+PCAPNG_SHB = 0x0a0d0d0a
+PCAPNG_BYTE_ORDER_MAGIC = 0x1a2b3c4d
+PCAPNG_IDB = 0x00000001
+PCAPNG_PB = 0x00000002
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+
+PCAPNG_OPT_ENDOFOPT = 0
+PCAPNG_OPT_IF_TSRESOL = 9
+PCAPNG_OPT_IF_TSOFFSET = 14
+
+DLT_NULL = 0
+DLT_EN10MB = 1
+DLT_RAW = 101
+DLT_LOOP = 108
+DLT_LINUX_SLL = 113
+DLT_LINUX_SLL2 = 276
+DLT_RAW_ALIASES = (12, 14, DLT_RAW)
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8, 0x9100)
+IPPROTO_TCP = 6
+
+FINGERPRINT_BYTES = 65536                                           # Bytes hashed at the start and end of a capture part
+
+
+def _pcapng_ts_to_ns(ticks, tsresol, tsoffset):
+    """
+    Converts a pcapng timestamp expressed in interface ticks into nanoseconds since epoch.
+
+    :param ticks: Raw 64-bit timestamp of the packet block.
+    :param tsresol: Value of the if_tsresol option (default 6, i.e. microseconds).
+    :param tsoffset: Value of the if_tsoffset option in seconds.
+    :return: Timestamp in nanoseconds.
+    """
+    if tsresol & 0x80:
+        ns = (ticks * 1_000_000_000) >> (tsresol & 0x7f)
+    elif tsresol <= 9:
+        ns = ticks * 10 ** (9 - tsresol)
+    else:
+        ns = ticks // 10 ** (tsresol - 9)
+
+    return ns + tsoffset * 1_000_000_000
+
+
+def _parse_pcapng_idb(body, endian):
+    """
+    Extracts link type and timestamp options from a pcapng Interface Description Block body.
+
+    :param body: Block body (without type/length framing).
+    :param endian: Struct endianness prefix of the current section.
+    :return: Dictionary {"linktype", "snaplen", "tsresol", "tsoffset"}.
+    """
+    linktype, _, snaplen = struct.unpack_from(endian + "HHI", body, 0)
+    interface = {"linktype": linktype, "snaplen": snaplen, "tsresol": 6, "tsoffset": 0}
+
+    offset = 8
+    while offset + 4 <= len(body):
+        code, length = struct.unpack_from(endian + "HH", body, offset)
+        offset += 4
+        if code == PCAPNG_OPT_ENDOFOPT:
+            break
+        if code == PCAPNG_OPT_IF_TSRESOL and length >= 1:
+            interface["tsresol"] = body[offset]
+        elif code == PCAPNG_OPT_IF_TSOFFSET and length >= 8:
+            interface["tsoffset"] = struct.unpack_from(endian + "q", body, offset)[0]
+        offset += (length + 3) & ~3
+
+    return interface
+
+
+def _parse_pcap_header(raw):
+    """
+    Parses the 24-byte global header of a classic libpcap file.
+
+    :param raw: Header bytes (magic number included).
+    :return: Dictionary {"endian", "nano", "snaplen", "linktype"}.
+    """
+    magic_le = struct.unpack_from("<I", raw)[0]
+    endian = "<" if magic_le in (PCAP_MAGIC_MICRO, PCAP_MAGIC_NANO) else ">"
+    magic = struct.unpack_from(endian + "I", raw)[0]
+
+    _, _, _, _, snaplen, linktype = struct.unpack_from(endian + "HHiIII", raw, 4)
+
+    return {"endian": endian, "nano": magic == PCAP_MAGIC_NANO, "snaplen": snaplen, "linktype": linktype & 0xffff}
+
+
+def _read_pcap_header(file, header):
+    """
+    Reads the global header of a classic libpcap file.
+
+    :param file: Binary file object positioned after the first 4 bytes.
+    :param header: First 4 bytes of the file (magic number).
+    :return: Dictionary {"endian", "nano", "snaplen", "linktype"}.
+    """
+    return _parse_pcap_header(header + file.read(20))
+
+
+def _iter_pcap_records(file, pcap_header):
+    """
+    Iterates over the records of a classic libpcap file.
+
+    :param file: Binary file object positioned after the global header.
+    :param pcap_header: Global header as returned by _read_pcap_header.
+    :return: Generator of (ts_sec, ts_frac, original_length, frame_bytes).
+    """
+    record_header = struct.Struct(pcap_header["endian"] + "IIII")
+    while True:
+        raw = file.read(16)
+        if len(raw) < 16:
+            return
+        ts_sec, ts_frac, caplen, origlen = record_header.unpack(raw)
+        data = file.read(caplen)
+        if len(data) < caplen:
+            return
+        yield ts_sec, ts_frac, origlen, data
+
+
+def _pcap_frames(records, pcap_header):
+    """
+    Turns classic libpcap records into frames.
+
+    :param records: Iterable of (ts_sec, ts_frac, original_length, frame_bytes).
+    :param pcap_header: Global header as returned by _read_pcap_header.
+    :return: Generator of (linktype, timestamp_ns, original_length, frame_bytes).
+    """
+    frac_scale = 1 if pcap_header["nano"] else 1000
+    linktype = pcap_header["linktype"]
+
+    for ts_sec, ts_frac, origlen, data in records:
+        yield linktype, ts_sec * 1_000_000_000 + ts_frac * frac_scale, origlen, data
+
+
+def _iter_pcap_frames(file, pcap_header):
+    """
+    Iterates over the frames of a classic libpcap file.
+
+    :param file: Binary file object positioned on a record header.
+    :param pcap_header: Global header as returned by _read_pcap_header.
+    :return: Generator of (linktype, timestamp_ns, original_length, frame_bytes).
+    """
+    return _pcap_frames(_iter_pcap_records(file, pcap_header), pcap_header)
+
+
+def _iter_pcapng_blocks(file, header, endian="<"):
+    """
+    Iterates over the raw blocks of a pcapng file, one block in memory at a time.
+
+    :param file: Binary file object positioned after the first 4 bytes of a block.
+    :param header: First 4 bytes of the block (block type).
+    :param endian: Struct endianness prefix of the section the block belongs to.
+    :return: Generator of (block_type, endian, block_bytes) where block_bytes includes the type/length framing.
+    """
+
+    while True:
+        raw_length = file.read(4)
+        if len(raw_length) < 4:
+            return
+
+        if struct.unpack("<I", header)[0] == PCAPNG_SHB:
+            # The byte-order magic of each section decides the endianness of everything that follows
+            bom = file.read(4)
+            if len(bom) < 4:
+                return
+            endian = "<" if struct.unpack("<I", bom)[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+            total_length = struct.unpack(endian + "I", raw_length)[0]
+            block = header + raw_length + bom + file.read(total_length - 12)
+        else:
+            total_length = struct.unpack(endian + "I", raw_length)[0]
+            block = header + raw_length + file.read(total_length - 8)
+
+        if total_length < 12 or len(block) < total_length:
+            return
+        yield struct.unpack(endian + "I", header)[0], endian, block
+
+        header = file.read(4)
+        if len(header) < 4:
+            return
+
+
+def _pcapng_block_frame(block_type, endian, block, interfaces):
+    """
+    Extracts the frame carried by a pcapng packet block.
+
+    :param block_type: PCAPNG_EPB, PCAPNG_SPB or PCAPNG_PB.
+    :param endian: Struct endianness prefix of the current section.
+    :param block: Raw block bytes including framing.
+    :param interfaces: Interfaces described so far in the current section.
+    :return: Tuple (linktype, timestamp_ns, original_length, frame_bytes).
+    """
+    if block_type == PCAPNG_SPB:
+        origlen = struct.unpack_from(endian + "I", block, 8)[0]
+        interface = interfaces[0]
+        caplen = min(origlen, interface["snaplen"] or origlen)
+        return interface["linktype"], 0, origlen, block[12:12 + caplen]
+
+    if block_type == PCAPNG_EPB:
+        interface_id, ts_high, ts_low, caplen, origlen = struct.unpack_from(endian + "IIIII", block, 8)
+    else:
+        interface_id, _, ts_high, ts_low, caplen, origlen = struct.unpack_from(endian + "HHIIII", block, 8)
+    interface = interfaces[interface_id]
+    ts = _pcapng_ts_to_ns((ts_high << 32) | ts_low, interface["tsresol"], interface["tsoffset"])
+    return interface["linktype"], ts, origlen, block[28:28 + caplen]
+
+
+def _pcapng_frames(blocks, interfaces=None):
+    """
+    Extracts the frames of the packet blocks (EPB, SPB and obsolete PB) of a sequence of pcapng blocks.
+
+    :param blocks: Iterable of (block_type, endian, block) as produced by _iter_pcapng_blocks.
+    :param interfaces: Interfaces already described in the current section (when starting mid-file).
+    :return: Generator of (linktype, timestamp_ns, original_length, frame_bytes).
+    """
+    interfaces = list(interfaces or [])
+
+    for block_type, endian, block in blocks:
+        if block_type == PCAPNG_SHB:
+            interfaces = []
+
+        elif block_type == PCAPNG_IDB:
+            interfaces.append(_parse_pcapng_idb(block[8:-4], endian))
+
+        elif block_type in (PCAPNG_EPB, PCAPNG_SPB, PCAPNG_PB):
+            yield _pcapng_block_frame(block_type, endian, block, interfaces)
+
+
+def _iter_pcapng_frames(file, header, endian="<", interfaces=None):
+    """
+    Iterates over the packet blocks (EPB, SPB and obsolete PB) of a pcapng file.
+
+    :param file: Binary file object positioned after the first 4 bytes of a block.
+    :param header: First 4 bytes of the block (SHB block type at the start of a file).
+    :param endian: Struct endianness prefix of the current section (when starting mid-file).
+    :param interfaces: Interfaces already described in the current section (when starting mid-file).
+    :return: Generator of (linktype, timestamp_ns, original_length, frame_bytes).
+    """
+    return _pcapng_frames(_iter_pcapng_blocks(file, header, endian), interfaces)
+
+
+def _is_pcapng(header):
+    """ Tells whether the first 4 bytes of a capture are a pcapng Section Header Block. """
+    return struct.unpack("<I", header)[0] == PCAPNG_SHB
+
+
+def _is_pcap(header):
+    """ Tells whether the first 4 bytes of a capture are a classic libpcap magic number (either byte order). """
+    return struct.unpack("<I", header)[0] in (PCAP_MAGIC_MICRO, PCAP_MAGIC_NANO) or \
+        struct.unpack(">I", header)[0] in (PCAP_MAGIC_MICRO, PCAP_MAGIC_NANO)
+
+
+# ===============================
+# MEMORY-MAPPED READER
+# ===============================
+
+class MappedCapture:
+    """
+    Read-only memory map of a capture file.
+
+    Blocks, records and frames are handed out as memoryview slices of the map: nothing is copied
+    and the page cache is the only buffer, whatever the size of the file. Slices still referenced
+    when the capture is closed keep the map alive until they are released.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:                                          # Empty file: nothing to map
+            self._map = None
+        else:
+            if hasattr(self._map, "madvise"):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)             # Read-ahead, and pages dropped early once read
+        self.view = memoryview(self._map if self._map is not None else b"")
+
+    def close(self):
+        self.view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass                                                # Frames still referenced: unmapped when collected
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _iter_mapped_pcapng_blocks(view, offset=0, endian="<"):
+    """
+    Iterates over the blocks of a memory-mapped pcapng file.
+
+    :param view: memoryview of the whole file.
+    :param offset: Byte offset of the first block to read.
+    :param endian: Struct endianness prefix of the section the first block belongs to.
+    :return: Generator of (block_type, endian, block_view) where block_view includes the type/length framing.
+    """
+    size = len(view)
+    while offset + 12 <= size:
+        if struct.unpack_from("<I", view, offset)[0] == PCAPNG_SHB:
+            endian = "<" if struct.unpack_from("<I", view, offset + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+        block_type, total_length = struct.unpack_from(endian + "II", view, offset)
+        if total_length < 12 or offset + total_length > size:
+            return
+        yield block_type, endian, view[offset:offset + total_length]
+        offset += total_length
+
+
+def _iter_mapped_pcap_records(view, pcap_header, offset=24):
+    """
+    Iterates over the records of a memory-mapped classic libpcap file.
+
+    :param view: memoryview of the whole file.
+    :param pcap_header: Global header as returned by _parse_pcap_header.
+    :param offset: Byte offset of the first record header.
+    :return: Generator of (ts_sec, ts_frac, original_length, frame_view).
+    """
+    record_header = struct.Struct(pcap_header["endian"] + "IIII")
+    size = len(view)
+    while offset + 16 <= size:
+        ts_sec, ts_frac, caplen, origlen = record_header.unpack_from(view, offset)
+        offset += 16
+        if offset + caplen > size:
+            return
+        yield ts_sec, ts_frac, origlen, view[offset:offset + caplen]
+        offset += caplen
+
+
+def iter_mapped_frames(view):
+    """
+    Reads the frames of a memory-mapped pcap or pcapng file.
+
+    :param view: memoryview of the whole file (see MappedCapture).
+    :return: Generator of (frame_number, linktype, timestamp_ns, original_length, frame_view).
+    """
+    if len(view) < 4:
+        return
+
+    if _is_pcapng(view[:4]):
+        frames = _pcapng_frames(_iter_mapped_pcapng_blocks(view))
+    elif _is_pcap(view[:4]) and len(view) >= 24:
+        pcap_header = _parse_pcap_header(view)
+        frames = _pcap_frames(_iter_mapped_pcap_records(view, pcap_header), pcap_header)
+    else:
+        raise ValueError("Unsupported capture format.")
+
+    for frame_number, (linktype, timestamp_ns, length, data) in enumerate(frames, start=1):
+        yield frame_number, linktype, timestamp_ns, length, data
+
+
+def iter_file_frames(file):
+    """
+    Reads pcap or pcapng data sequentially from a binary file object (regular file, pipe or stdin).
+
+    :param file: Binary file object positioned at the start of the capture.
+    :return: Generator of (frame_number, linktype, timestamp_ns, original_length, frame_bytes).
+    """
+    header = file.read(4)
+    if len(header) < 4:
+        return
+
+    if _is_pcapng(header):
+        frames = _iter_pcapng_frames(file, header)
+    elif _is_pcap(header):
+        frames = _iter_pcap_frames(file, _read_pcap_header(file, header))
+    else:
+        raise ValueError(f"Unsupported capture format: {getattr(file, 'name', file)}")
+
+    for frame_number, (linktype, timestamp_ns, length, data) in enumerate(frames, start=1):
+        yield frame_number, linktype, timestamp_ns, length, data
+
+
+def iter_capture_frames(path, chunk=None):
+    """
+    Reads a pcap or pcapng file through a memory map and yields every captured frame.
+
+    Frames are memoryview slices of the map (see MappedCapture), valid while the generator runs.
+
+    :param path: Path to the capture file.
+    :param chunk: (Optional) Chunk descriptor from scan_capture_chunks, to read only that part of the file.
+    :return: Generator of (frame_number, linktype, timestamp_ns, original_length, frame_view).
+    """
+    with MappedCapture(path) as capture:
+        view = capture.view
+        if chunk is None:
+            try:
+                yield from iter_mapped_frames(view)
+            except ValueError:
+                raise ValueError(f"Unsupported capture format: {path}") from None
+            return
+
+        yield from _iter_chunk_frames(view, chunk)
+
+
+def _iter_chunk_frames(view, chunk):
+    """ Reads the frames of a chunk descriptor (or reader position) out of a memory-mapped capture. """
+    if chunk["format"] == "pcapng":
+        frames = _pcapng_frames(_iter_mapped_pcapng_blocks(view, chunk["offset"], chunk["endian"]), chunk["interfaces"])
+    else:
+        frames = _pcap_frames(_iter_mapped_pcap_records(view, chunk["pcap_header"], chunk["offset"]), chunk["pcap_header"])
+
+    frames = itertools.islice(frames, chunk["frames"])
+    for frame_number, (linktype, timestamp_ns, length, data) in enumerate(frames, start=chunk["first_frame"]):
+        yield frame_number, linktype, timestamp_ns, length, data
+
+
+def iter_frames_at(path, positions):
+    """
+    Reads single frames at known places of a capture file, in one memory map.
+
+    :param path: Path to the capture file.
+    :param positions: Iterable of reader positions (CaptureReader.position() taken just before each frame;
+        None for the first frame of the file).
+    :return: Generator of (frame_number, linktype, timestamp_ns, original_length, frame_view), one per position
+        (None where the file holds no frame).
+    """
+    with MappedCapture(path) as capture:
+        for position in positions:
+            if position is None:
+                yield next(iter_mapped_frames(capture.view), None)
+            else:
+                yield next(_iter_chunk_frames(capture.view, dict(position, frames=1)), None)
+
+
+def capture_fingerprint(path, size):
+    """
+    Identifies the first bytes of a capture, to recognise it later even after it has grown.
+
+    :param path: Path to the capture file.
+    :param size: Number of bytes already processed.
+    :return: Tuple (size, CRC-32 of the first bytes, CRC-32 of the bytes just before size).
+    """
+    with open(path, "rb") as file:
+        head = file.read(min(size, FINGERPRINT_BYTES))
+        file.seek(max(0, size - FINGERPRINT_BYTES))
+        tail = file.read(size - max(0, size - FINGERPRINT_BYTES))
+    return size, zlib.crc32(head), zlib.crc32(tail)
+
+
+def file_digest(path, block_size=1 << 20):
+    """ SHA-256 of a file's content (identifies a capture, or the configuration a run was made with), read by blocks. """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CaptureReader:
+    """
+    Reads the frames of a capture file like iter_capture_frames, keeping track of where it stands.
+
+    position() describes the frame following the last one yielded, in the form of a
+    scan_capture_chunks chunk without frame limit: a later reader started from it carries on with
+    the same frame, possibly in a capture that has grown since (a record still being written at
+    the end of the file is left for then).
+    """
+
+    def __init__(self, path, position=None):
+        """
+        :param path: Path to the capture file.
+        :param position: (Optional) Position returned by position(), to start from instead of the first frame.
+        """
+        self.path = path
+        self._position = None if position is None else dict(position, interfaces=list(position.get("interfaces", ())))
+
+    def position(self):
+        """
+        Reader state at the frame following the last one yielded.
+
+        :return: Chunk-like dictionary {"format", "offset", "first_frame", "frames": None, ...}, or None while
+            the file header has not been read.
+        """
+        if self._position is None:
+            return None
+        return dict(self._position, interfaces=list(self._position["interfaces"]))
+
+    def __iter__(self):
+        with MappedCapture(self.path) as capture:
+            view = capture.view
+            position = self._position
+            if position is None:
+                if len(view) < 4:
+                    return
+                if _is_pcapng(view[:4]):
+                    position = {"format": "pcapng", "offset": 0, "first_frame": 1, "frames": None, "endian": "<",
+                                "interfaces": []}
+                elif not _is_pcap(view[:4]):
+                    raise ValueError(f"Unsupported capture format: {self.path}")
+                elif len(view) < 24:
+                    return                                          # Global header not fully written yet
+                else:
+                    position = {"format": "pcap", "offset": 24, "first_frame": 1, "frames": None,
+                                "pcap_header": _parse_pcap_header(view), "interfaces": []}
+                self._position = position
+
+            if position["format"] == "pcapng":
+                interfaces = position["interfaces"]
+                for block_type, endian, block in _iter_mapped_pcapng_blocks(view, position["offset"], position["endian"]):
+                    position["offset"] += len(block)
+                    position["endian"] = endian
+                    if block_type == PCAPNG_SHB:
+                        interfaces = position["interfaces"] = []
+                    elif block_type == PCAPNG_IDB:
+                        interfaces.append(_parse_pcapng_idb(block[8:-4], endian))
+                    elif block_type in (PCAPNG_EPB, PCAPNG_SPB, PCAPNG_PB):
+                        frame_number = position["first_frame"]
+                        position["first_frame"] += 1
+                        yield (frame_number, *_pcapng_block_frame(block_type, endian, block, interfaces))
+                return
+
+            pcap_header = position["pcap_header"]
+            frac_scale = 1 if pcap_header["nano"] else 1000
+            linktype = pcap_header["linktype"]
+            for ts_sec, ts_frac, origlen, data in _iter_mapped_pcap_records(view, pcap_header, position["offset"]):
+                position["offset"] += 16 + len(data)
+                frame_number = position["first_frame"]
+                position["first_frame"] += 1
+                yield frame_number, linktype, ts_sec * 1_000_000_000 + ts_frac * frac_scale, origlen, data
+
+
+def scan_capture_chunks(path, chunk_frames, lead_frames=0):
+    """
+    Splits a capture into chunks of consecutive frames by walking only the block/record headers.
+
+    Each chunk carries the reader state needed to start decoding in the middle of the file
+    (byte offset, section endianness and interfaces for pcapng, global header for pcap). With
+    lead_frames, every chunk but the first also describes the frames just before it under "lead",
+    in the same form, for decoders that need to see some traffic before the chunk (TCP reassembly).
+    A lead may span several previous chunks.
+
+    :param path: Path to the capture file.
+    :param chunk_frames: Number of frames per chunk.
+    :param lead_frames: Number of frames before each chunk described by its "lead".
+    :return: List of chunk dictionaries {"format", "offset", "first_frame", "frames", "first_timestamp", "lead", ...}.
+    """
+    chunks = []
+    frame_number = 0
+    leads = {}                                                      # First frame index of a chunk -> its lead
+
+    with MappedCapture(path) as capture:
+        view = capture.view
+        if len(view) < 4:
+            return chunks
+
+        if _is_pcapng(view[:4]):
+            endian, interfaces, offset = "<", [], 0
+            while offset + 12 <= len(view):
+                if struct.unpack_from("<I", view, offset)[0] == PCAPNG_SHB:
+                    endian = "<" if struct.unpack_from("<I", view, offset + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+                    interfaces = []
+                block_type, total_length = struct.unpack_from(endian + "II", view, offset)
+                if total_length < 12 or offset + total_length > len(view):
+                    break
+
+                if block_type == PCAPNG_IDB:
+                    interfaces.append(_parse_pcapng_idb(view[offset + 8:offset + total_length - 4], endian))
+                elif block_type in (PCAPNG_EPB, PCAPNG_PB, PCAPNG_SPB):
+                    if frame_number % chunk_frames == 0:
+                        chunks.append({"format": "pcapng", "offset": offset, "first_frame": frame_number + 1,
+                                       "frames": 0, "endian": endian, "interfaces": list(interfaces)})
+                    if lead_frames and (frame_number + lead_frames) % chunk_frames == 0:
+                        leads[frame_number + lead_frames] = {"format": "pcapng", "offset": offset,
+                                                             "first_frame": frame_number + 1, "frames": lead_frames,
+                                                             "endian": endian, "interfaces": list(interfaces)}
+                    chunks[-1]["frames"] += 1
+                    frame_number += 1
+                offset += total_length
+
+        else:
+            pcap_header = _parse_pcap_header(view)
+            caplen_format = struct.Struct(pcap_header["endian"] + "I")
+            offset = 24
+            while offset + 16 <= len(view):
+                end = offset + 16 + caplen_format.unpack_from(view, offset + 8)[0]
+                if end > len(view):
+                    break
+                if frame_number % chunk_frames == 0:
+                    chunks.append({"format": "pcap", "offset": offset, "first_frame": frame_number + 1,
+                                   "frames": 0, "pcap_header": pcap_header})
+                if lead_frames and (frame_number + lead_frames) % chunk_frames == 0:
+                    leads[frame_number + lead_frames] = {"format": "pcap", "offset": offset, "first_frame": frame_number + 1,
+                                                         "frames": lead_frames, "pcap_header": pcap_header}
+                chunks[-1]["frames"] += 1
+                frame_number += 1
+                offset = end
+
+    # Relative timestamps are computed against the first frame of the whole capture
+    first = next(iter_capture_frames(path), None)
+    for chunk in chunks:
+        chunk["first_timestamp"] = first[2]
+        start = chunk["first_frame"] - 1
+        if lead_frames and start:
+            # Chunks closer than lead_frames to the start of the capture lead from its first frame
+            lead = leads.get(start) or {key: value for key, value in chunks[0].items() if key != "lead"}
+            chunk["lead"] = dict(lead, frames=min(lead_frames, start))
+        else:
+            chunk["lead"] = None
+
+    return chunks
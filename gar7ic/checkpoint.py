@@ -0,0 +1,177 @@
+import os
+import time
+import pickle
+
+from .capture import CaptureReader, capture_fingerprint
+from .correlation import RequestCorrelator
+from .decoder import Decoder
+from .labeling import VALUE_BATCH_ROWS, label_packet_rows
+from .sinks import TableSink
+
+# ===============================
+# CHECKPOINTED PROCESSING
+# ===============================
+
+CHECKPOINT_VERSION = 2                                              # Bump when the checkpoint content changes
+CHECKPOINT_INTERVAL_S = 60                                          # Seconds between two checkpoints
+CHECKPOINT_CLOCK_FRAMES = 4096                                      # Frames between two looks at the clock
+
+
+def checkpoint_path(output):
+    """ Checkpoint file kept next to an output file. """
+    return output + ".checkpoint"
+
+
+def load_checkpoint(path):
+    """
+    Reads a checkpoint file.
+
+    :param path: Checkpoint path.
+    :return: Checkpoint dictionary, or None if there is none.
+    """
+    try:
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError) as error:
+        raise ValueError(f"Unreadable checkpoint '{path}': {error}") from None
+
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint '{path}' was written by another version of GAR7IC; delete it to start over.")
+    return state
+
+
+def save_checkpoint(path, state):
+    """ Writes a checkpoint file atomically: an interrupted write leaves the previous checkpoint in place. """
+    with open(f"{path}.{os.getpid()}.tmp", "wb") as file:
+        pickle.dump(dict(state, version=CHECKPOINT_VERSION), file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def _resume_state(capture, dst_path, checkpoint, settings, follow):
+    """
+    Checks that a checkpoint can be continued.
+
+    :return: Checkpoint dictionary, or None to start from the first frame.
+    """
+    state = load_checkpoint(checkpoint)
+    if state is None or (state["complete"] and not follow):
+        return None                                                 # Nothing interrupted: the run starts over
+
+    if state["settings"] != settings:
+        raise ValueError(f"Checkpoint '{checkpoint}' was made with another configuration or other options; "
+                         f"delete it to start over.")
+    size = state["fingerprint"][0]
+    if os.path.getsize(capture) < size or capture_fingerprint(capture, size) != state["fingerprint"]:
+        raise ValueError(f"'{capture}' is not the capture of checkpoint '{checkpoint}' (or was rewritten).")
+    if (os.path.getsize(dst_path) if os.path.exists(dst_path) else 0) < state["output_size"]:
+        raise ValueError(f"'{dst_path}' is shorter than when checkpoint '{checkpoint}' was made.")
+    return state
+
+
+def label_capture_checkpointed(capture, dst_path, lookup, correlator=None, stats=None, frame_filter=None,
+                               reassemble=True, follow=False, settings=None, checkpoint=None,
+                               interval=CHECKPOINT_INTERVAL_S):
+    """
+    Labels a capture into a CSV table, saving checkpoints so that the run can be continued later.
+
+    Every interval seconds, at a frame boundary, the rows labelled so far are flushed to the output
+    and the reader position, the TCP reassembly state and the pending requests are saved with the
+    output size. A new run over the same capture and output continues from the last checkpoint of
+    an interrupted run, truncating the rows written after it. With follow, a completed run is
+    continued as well, so only the frames appended to a growing capture since are processed.
+
+    :param capture: Path to the pcap/pcapng file.
+    :param dst_path: Output CSV path.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param correlator: (Optional) RequestCorrelator to use, e.g. to read its counters afterwards.
+    :param stats: (Optional) Stats charged with the stage times (of this run only) and packet counters.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :param follow: Also continue a completed run, from the end of the capture it processed.
+    :param settings: (Optional) Picklable description of the configuration and options; a checkpoint
+        made with other settings is refused.
+    :param checkpoint: (Optional) Checkpoint path instead of checkpoint_path(dst_path).
+    :param interval: Seconds between two checkpoints.
+    :return: Dictionary {"resumed_at": first frame read (None from the start), "frames": frames read, "rows": rows written}.
+    """
+    from .values import convert_row_values                          # NumPy is only loaded when values are converted
+
+    checkpoint = checkpoint or checkpoint_path(dst_path)
+    if correlator is None:
+        correlator = RequestCorrelator()
+    state = _resume_state(capture, dst_path, checkpoint, settings, follow)
+
+    decoder = Decoder(stats=stats, frame_filter=frame_filter, reassemble=reassemble)
+    if state is not None:
+        if os.path.exists(dst_path):
+            os.truncate(dst_path, state["output_size"])             # Rows written after the checkpoint are redone
+        decoder.first_timestamp, decoder.reassembler = state["first_timestamp"], state["reassembler"]
+        correlator.merge(state["correlator"])
+    reader = CaptureReader(capture, None if state is None else state["position"])
+    resumed_at = None if state is None else state["position"]["first_frame"]
+    total_rows = 0 if state is None else state["rows"]
+
+    decode, label, convert, frames = decoder.decode_segment, label_packet_rows, convert_row_values, reader
+    if stats is not None:
+        decode, label, convert = stats.wrap("decode", decode), stats.wrap_label(label), stats.wrap("convert", convert)
+        frames = stats.timed("read", reader)
+
+    rows = []
+    sink = TableSink(dst_path, append=state is not None and state["output_size"] > 0)
+
+    def write_rows():
+        nonlocal rows, total_rows
+        sink.write_all(convert(rows))
+        total_rows += len(rows)
+        rows = []
+
+    def save(complete):
+        """ Records where processing stands, once the rows labelled so far are on disk. """
+        output_size = 0
+        if os.path.exists(dst_path):
+            with open(dst_path, "rb") as file:
+                os.fsync(file.fileno())
+                output_size = os.fstat(file.fileno()).st_size
+        position = reader.position()
+        if position is None:
+            return                                                  # Not even a capture header yet
+
+        saved = RequestCorrelator(correlator.timeout_ns, correlator.max_pending)
+        saved.merge(correlator)                                     # Plain copy, without any instrumentation
+        save_checkpoint(checkpoint, {
+            "settings": settings,
+            "position": position,
+            "fingerprint": capture_fingerprint(capture, position["offset"]),
+            "first_timestamp": decoder.first_timestamp,
+            "reassembler": decoder.reassembler,
+            "correlator": saved,
+            "output_size": output_size,
+            "rows": total_rows,
+            "complete": complete
+        })
+
+    frame_number = None
+    due = time.monotonic() + interval
+    with sink:
+        for frame in frames:
+            frame_number = frame[0]
+            for packet in decode(*frame):
+                rows.extend(label(packet, lookup, correlator))
+            if len(rows) >= VALUE_BATCH_ROWS:
+                write_rows()
+            if frame_number % CHECKPOINT_CLOCK_FRAMES == 0 and time.monotonic() >= due:
+                write_rows()
+                sink.flush()
+                save(complete=False)
+                due = time.monotonic() + interval
+        write_rows()
+    save(complete=True)                                             # The closed output has its header even when empty
+
+    first = 1 if resumed_at is None else resumed_at
+    return {"resumed_at": resumed_at,
+            "frames": 0 if frame_number is None else frame_number - first + 1,
+            "rows": total_rows - (0 if state is None else state["rows"])}
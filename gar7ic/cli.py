@@ -0,0 +1,501 @@
+import sys
+import argparse
+import datetime
+import importlib.util
+
+from .checkpoint import CHECKPOINT_INTERVAL_S
+from .config import compile_config
+from .decoder import S7COMM_PORTS, Decoder, FrameFilter
+from .enums import S7CommParamFunction
+from .index import RecordFilter
+from .labeling import Labeler, label_packet_comments, label_packet_rows
+from .rules import RuleEngine
+from .sampler import SAMPLER_INTERVAL_S
+from .sinks import CsvLineSink, PcapngSink, TableSink, TimeSeriesSink, TrafficSink
+from .stats import STATS_INTERVAL_S, Stats
+from .store import STORE_FORMATS
+from .stream import stream_annotated_pcapng, stream_table_csv
+from .table import TABLE_FORMATS
+from .timeseries import TIMESERIES_AGGREGATIONS
+from .traffic import TrafficStats
+
+# ===============================
+# SCRIPT ARGUMENTS
+# ===============================
+
+def print_correlation_stats(correlator):
+    """
+    Prints the request/response correlation counters and the latency measured for each PLC.
+
+    :param correlator: RequestCorrelator used to label the capture.
+    """
+    stats = correlator.stats()
+    print(f"Responses matched: {stats['matched']}, orphaned: {stats['orphaned']}, "
+          f"requests expired: {stats['expired']}, still pending: {stats['pending']}.")
+    for plc_ip, latency in sorted(stats["latency"].items()):
+        print(f"  {plc_ip}: {latency['count']} responses, latency mean {latency['mean'] * 1000:.3f} ms, "
+              f"min {latency['min'] * 1000:.3f} ms, max {latency['max'] * 1000:.3f} ms")
+
+
+def print_stats(stats):
+    """
+    Prints the stage timings and packet counters of a run and writes the statistics file, if any.
+
+    :param stats: Stats of the run, or None when statistics are disabled.
+    """
+    if stats is None:
+        return
+    print(stats.format_summary())
+    if stats.path is not None:
+        stats.save()
+        print(f"Statistics saved to '{stats.path}'.")
+
+
+def print_alerts(rules):
+    """
+    Prints the alert counts of a run and closes its alert file.
+
+    :param rules: RuleEngine of the run, or None without --alerts.
+    """
+    if rules is None:
+        return
+    print(rules.format_summary())
+    rules.close()
+
+
+def run_settings(args):
+    """ Configuration content and options that change the labelled rows (recorded by checkpoints and stores). """
+    from .capture import file_digest
+    return {"configuration": file_digest(args.configuration), "ports": sorted(args.ports),
+            "configured_only": args.configured_only, "reassemble": not args.no_reassembly}
+
+
+def iter_capture_records(args, capture, labeler, stats=None, frame_filter=None):
+    """
+    Decodes and labels a whole capture as the options ask: table rows, or pcap comments with -p.
+
+    :param args: Parsed arguments.
+    :param capture: Capture path.
+    :param labeler: Labeler of the capture.
+    :param stats: (Optional) Stats measuring the run.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :return: Generator of row dictionaries or (frame_number, comment).
+    """
+    if args.workers > 1:
+        from .parallel import iter_labels_parallel                  # Process pool and NumPy only when needed
+        label = label_packet_comments if args.pcap else label_packet_rows
+        return iter_labels_parallel(capture, labeler.lookup, label, args.workers, correlator=labeler.correlator,
+                                    stats=stats, frame_filter=frame_filter, reassemble=not args.no_reassembly)
+
+    packets = Decoder(args.backend, stats=stats, frame_filter=frame_filter,
+                      reassemble=not args.no_reassembly).iter_packets(capture)
+    return labeler.iter_comments(packets) if args.pcap else labeler.iter_rows(packets)
+
+
+def parse_time_bound(text):
+    """
+    Reads a --from/--to bound: epoch seconds, or an ISO 8601 date and time (local time without offset).
+
+    :param text: Argument value.
+    :return: Seconds since epoch.
+    """
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date and time: {text}") from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GAR7IC is a tool read S7COMM capture and labelling it according to configuration file.")
+
+    parser.add_argument("-f", "--file", type=str, nargs="+",
+                        help="Capture file; with --output-dir, any number of files, directories or glob patterns "
+                             "(required, except with --sample).")
+    parser.add_argument("-c", "--configuration", type=str, help="", required=True)
+    parser.add_argument("-b", "--backend", choices=["native", "pyshark"], default="native",
+                        help="Packet decoding backend: built-in S7COMM decoder (default) or pyshark/tshark.")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of worker processes decoding chunks of the capture in parallel (native backend).")
+    parser.add_argument("--ports", type=int, nargs="+", default=list(S7COMM_PORTS),
+                        help=f"TCP ports carrying S7COMM; other traffic is dropped before decoding (default: {S7COMM_PORTS[0]}).")
+    parser.add_argument("--configured-only", action="store_true",
+                        help="Also drop, before decoding, the traffic of every device missing from the configuration.")
+    parser.add_argument("--no-reassembly", action="store_true",
+                        help="Decode the first S7COMM PDU of each frame instead of reassembling TCP connections (native backend).")
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="Read a live capture stream (named pipe, or stdin with '-f -') and write labels as packets arrive.")
+    parser.add_argument("-o", "--output", type=str,
+                        help="Output file (default: output.<format> in table mode, output.pcapng in pcap mode).")
+    parser.add_argument("-d", "--output-dir", type=str,
+                        help="Batch mode: label every capture given with -f into one output file each in this directory.")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Batch mode: number of captures processed concurrently (default: one per CPU); "
+                             "--sample: number of PLCs polled concurrently (default: every PLC, up to 32).")
+    parser.add_argument("--force", action="store_true",
+                        help="Batch mode: also reprocess captures whose output is newer than the capture and configuration; "
+                             "database output: replace the rows of captures already stored.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Table mode: save checkpoints next to the output (<output>.checkpoint) and continue an "
+                             "interrupted run from its last checkpoint.")
+    parser.add_argument("--follow", action="store_true",
+                        help="Table mode: like --resume, but a completed run is continued too: only the frames appended "
+                             "to the capture since the last run are labelled.")
+    parser.add_argument("--checkpoint-interval", type=float, default=CHECKPOINT_INTERVAL_S,
+                        help=f"Seconds between two checkpoints with --resume/--follow (default: {CHECKPOINT_INTERVAL_S}).")
+    parser.add_argument("--format", choices=list(TABLE_FORMATS) + list(STORE_FORMATS), default="csv",
+                        help="Table output format: csv (default), parquet, arrow or feather (Arrow IPC); sqlite or duckdb "
+                             "add the rows of every capture given with -f to a database, skipping captures already stored.")
+    parser.add_argument("--changes-only", action="store_true",
+                        help="Time-series mode: keep a value only when it differs from the previous value of its variable.")
+    parser.add_argument("--resample", type=str,
+                        help="Time-series mode: aggregate values over windows of this pandas frequency (e.g. 1s, 5min).")
+    parser.add_argument("--agg", choices=TIMESERIES_AGGREGATIONS, default="last",
+                        help="Time-series mode: aggregation of each --resample window (default: last).")
+    parser.add_argument("--pivot", action="store_true",
+                        help="Time-series mode: one column per PLC/variable instead of (timestamp, plc, variable, value) rows.")
+    parser.add_argument("--no-config-cache", action="store_true",
+                        help="Always recompile the YAML configuration instead of using the compiled cache (~/.cache/gar7ic).")
+    parser.add_argument("--stats", "--profile", dest="stats", action="store_true",
+                        help="Measure the time spent in each processing stage and count packets, printed at the end.")
+    parser.add_argument("--stats-file", type=str,
+                        help="Also write the statistics to this file: JSON for *.json, Prometheus text otherwise (implies --stats).")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL_S,
+                        help=f"Seconds between two rewrites of --stats-file, or of the --traffic report, in stream mode "
+                             f"(default: {STATS_INTERVAL_S}).")
+    parser.add_argument("--from", dest="time_from", type=parse_time_bound,
+                        help="Table/time-series mode: keep packets from this time on (ISO 8601, e.g. 2024-05-02T16:10, "
+                             "or epoch seconds).")
+    parser.add_argument("--to", dest="time_to", type=parse_time_bound,
+                        help="Table/time-series mode: keep packets up to this time (ISO 8601 or epoch seconds).")
+    parser.add_argument("--variable", type=str, nargs="+",
+                        help="Table/time-series mode: keep the rows of these configured variables (and their requests/responses).")
+    parser.add_argument("--function", type=str.upper, nargs="+",
+                        help="Table/time-series mode: keep the packets of these S7COMM functions (e.g. READ WRITE).")
+    parser.add_argument("--alerts", type=str,
+                        help="Check the traffic against the rules of the configuration (read_only and min/max variables, "
+                             "stop_from and max_writes_per_s PLCs): write the alerts to this file as JSON lines, and as "
+                             "packet comments in pcap mode.")
+    parser.add_argument("--sample-interval", type=float, default=SAMPLER_INTERVAL_S,
+                        help=f"--sample: seconds between the starts of two polling cycles (default: {SAMPLER_INTERVAL_S}).")
+    parser.add_argument("--sample-count", type=int,
+                        help="--sample: number of polling cycles (default: until interrupted).")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-t", "--table", help="Generate pandas table of S7COMM communication.", action="store_true")
+    group.add_argument("-p", "--pcap", help="Comment integration into pcap file according to configuration file.", action="store_true")
+    group.add_argument("--timeseries", help="Write the process values (successful READ responses, WRITE jobs) "
+                                            "as a (timestamp, plc, variable, value) time series.", action="store_true")
+    group.add_argument("--traffic", help="Profile the traffic instead of writing labels: poll rate and jitter, writes and "
+                                         "return codes per variable, response latency histogram per PLC; written to -o "
+                                         "(JSON for *.json, Prometheus text otherwise), every --stats-interval seconds "
+                                         "with --stream.", action="store_true")
+    group.add_argument("--index", help="Write a sidecar index next to each capture (<capture>.s7index) so that later "
+                                       "--from/--to/--variable/--function runs only decode the matching packets.",
+                       action="store_true")
+    group.add_argument("--sample", help="Poll the configured PLCs with snap7 (ip, rack, slot, port) instead of reading "
+                                        "a capture, and write the values read as table rows to -o (CSV lines as they "
+                                        "are read, or --format parquet/arrow/feather).", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.file is None and not args.sample:
+        parser.error("the following arguments are required: -f/--file")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    if args.workers > 1 and args.backend != "native":
+        parser.error("--workers requires the native backend.")
+    if args.stream and (args.workers > 1 or args.backend != "native"):
+        parser.error("--stream requires the native backend and a single worker.")
+    if args.format != "csv" and (args.pcap or args.stream):
+        parser.error("--format applies to table mode without --stream (CSV is streamed line by line).")
+    if args.timeseries and (args.stream or args.output_dir is not None):
+        parser.error("--timeseries cannot be combined with --stream or --output-dir.")
+    if args.traffic and (args.format != "csv" or args.output_dir is not None):
+        parser.error("--traffic writes one JSON or Prometheus report (-o), without --format or --output-dir.")
+    if not args.timeseries and (args.changes_only or args.resample or args.pivot or args.agg != "last"):
+        parser.error("--changes-only, --resample, --agg and --pivot apply to --timeseries.")
+    if args.agg != "last" and args.resample is None:
+        parser.error("--agg requires --resample.")
+    if args.resample is not None:
+        from pandas.tseries.frequencies import to_offset
+        try:
+            to_offset(args.resample)
+        except ValueError:
+            parser.error(f"invalid --resample frequency: {args.resample}")
+    if args.format in ("parquet", "arrow", "feather") and importlib.util.find_spec("pyarrow") is None:
+        parser.error("--format parquet/arrow/feather requires the 'pyarrow' package.")
+    if args.format == "duckdb" and importlib.util.find_spec("duckdb") is None:
+        parser.error("--format duckdb requires the 'duckdb' package.")
+    if args.format in STORE_FORMATS and (args.timeseries or args.output_dir is not None):
+        parser.error("--format sqlite/duckdb applies to table mode without --output-dir (give every capture with -f).")
+    several = args.output_dir is not None or args.index or args.format in STORE_FORMATS
+    if not several and args.file is not None and len(args.file) > 1:
+        parser.error("several captures require --output-dir.")
+    if args.output_dir is not None and (args.stream or args.workers > 1 or args.output):
+        parser.error("--output-dir cannot be combined with --stream, --workers or -o (use --jobs).")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
+    if any(not 0 < port < 65536 for port in args.ports):
+        parser.error("--ports must be TCP port numbers.")
+    if (args.resume or args.follow) and not (args.table and args.format == "csv"):
+        parser.error("--resume and --follow apply to table mode with CSV output.")
+    if (args.resume or args.follow) and (args.stream or args.output_dir is not None or args.workers > 1 or
+                                         args.backend != "native"):
+        parser.error("--resume and --follow require the native backend and a single worker, without --stream or --output-dir.")
+    if args.checkpoint_interval <= 0:
+        parser.error("--checkpoint-interval must be positive.")
+    filtered = args.time_from is not None or args.time_to is not None or args.variable or args.function
+    if filtered and (args.pcap or args.index or args.stream or args.output_dir is not None or args.resume or args.follow or
+                     args.format in STORE_FORMATS):
+        parser.error("--from, --to, --variable and --function apply to table, time-series and traffic modes, "
+                     "without --stream, --output-dir, --resume, --follow or database output.")
+    if args.function and not set(args.function) <= set(S7CommParamFunction.__members__):
+        parser.error(f"--function must be among: {', '.join(S7CommParamFunction.__members__)}.")
+    if args.index and (args.backend != "native" or args.no_reassembly or args.stream or args.output_dir is not None):
+        parser.error("--index requires the native backend with TCP reassembly, without --stream or --output-dir.")
+    if args.sample and (args.file is not None or args.stream or args.output_dir is not None or args.workers > 1 or
+                        args.resume or args.follow or filtered or args.alerts is not None or args.stats or
+                        args.stats_file or args.format in STORE_FORMATS):
+        parser.error("--sample reads no capture: it cannot be combined with -f, --stream, --output-dir, --workers, "
+                     "--resume, --follow, --from, --to, --variable, --function, --alerts, --stats or database output.")
+    if args.sample and importlib.util.find_spec("snap7") is None:
+        parser.error("--sample requires the 'python-snap7' package.")
+    if args.sample_interval < 0 or (args.sample_count is not None and args.sample_count < 1):
+        parser.error("--sample-interval must not be negative, and --sample-count must be at least 1.")
+    if args.alerts is not None and (args.index or args.output_dir is not None or args.workers > 1 or args.resume or
+                                    args.follow or filtered):
+        parser.error("--alerts cannot be combined with --index, --output-dir, --workers, --resume, --follow, "
+                     "--from, --to, --variable or --function.")
+
+    if args.output is None:
+        if args.traffic:
+            args.output = "traffic.json"
+        else:
+            args.output = "output.pcapng" if args.pcap else "output" + {**TABLE_FORMATS, **STORE_FORMATS}[args.format]
+    args.file = args.file if several or args.file is None else args.file[0]
+
+    # Stage clock started before loading the configuration; None keeps the pipeline uninstrumented
+    stats = Stats(path=args.stats_file, interval=args.stats_interval) if args.stats or args.stats_file else None
+
+    # ===============================
+    # LOAD YAML CONFIGURATION
+    # ===============================
+
+    lookup = compile_config(args.configuration, cache=not args.no_config_cache)
+    frame_filter = FrameFilter(args.ports, lookup["plcs"] if args.configured_only else None)
+    names = {var["name"] for var in lookup["variables"].values()}
+    if args.variable and not set(args.variable) <= names:
+        parser.error(f"unknown --variable: {', '.join(sorted(set(args.variable) - names))}.")
+    record_filter = RecordFilter(args.time_from, args.time_to, args.variable, args.function)
+    if args.alerts is not None and not RuleEngine(lookup):
+        parser.error("--alerts: the configuration declares no rules.")
+
+    # ===============================
+    # INDEXING CAPTURES
+    # ===============================
+
+    if args.index:
+        from .batch import expand_inputs
+        from .index import build_capture_index, index_path, save_capture_index
+        captures = expand_inputs(args.file)
+        if not captures:
+            parser.error("no capture found.")
+        for capture, _ in captures:
+            index = build_capture_index(capture, frame_filter)
+            save_capture_index(index, index_path(capture))
+            print(f"'{capture}' -> '{index_path(capture)}': {len(index['timestamps'])} S7COMM packets indexed.")
+        return
+
+    # ===============================
+    # SAMPLING PLCS
+    # ===============================
+
+    if args.sample:
+        from .sampler import Sampler                                # snap7 only when needed
+        try:
+            sampler = Sampler(args.configuration, args.jobs)
+        except ValueError as error:
+            parser.error(str(error))
+
+        # CSV lines are visible as soon as a cycle is read; other formats are written in chunks
+        sink = CsvLineSink(args.output) if args.format == "csv" else TableSink(args.output, args.format)
+        errors = {}
+        try:
+            with sampler, sink:
+                for rows in sampler.iter_cycles(args.sample_interval, args.sample_count):
+                    sink.write_all(rows)
+                    if args.format == "csv":
+                        sink.flush()
+                    for connection in sampler.connections:          # Report each PLC lost or back once
+                        if connection.error != errors.get(connection):
+                            print(f"PLC {connection.name} ({connection.ip}): " +
+                                  ("reachable again." if connection.error is None else connection.error), file=sys.stderr)
+                            errors[connection] = connection.error
+        except KeyboardInterrupt:
+            pass
+        print(sampler.format_summary())
+        print(f"Data saved to '{args.output}'.")
+        return
+
+    # ===============================
+    # PROCESSING CAPTURE SETS
+    # ===============================
+
+    if args.output_dir is not None:
+        from .batch import expand_inputs, iter_batch                 # Process pool only when needed
+        captures = expand_inputs(args.file)
+        if not captures:
+            parser.error("no capture found.")
+
+        done = skipped = failed = 0
+        if stats is not None:
+            stats.switch("wait")                                    # The parent only waits for the workers
+        try:
+            for src, dst, result in iter_batch(captures, args.output_dir, lookup, args.configuration, args.pcap,
+                                               args.format, args.backend, args.jobs, args.force, stats,
+                                               frame_filter, not args.no_reassembly):
+                if result is None:
+                    skipped += 1
+                elif isinstance(result, Exception):
+                    failed += 1
+                    print(f"'{src}' failed: {result}", file=sys.stderr)
+                else:
+                    done += 1
+                    print(f"'{src}' -> '{dst}': responses matched: {result['matched']}, "
+                          f"orphaned: {result['orphaned']}, requests expired: {result['expired']}.")
+        except ValueError as error:
+            parser.error(str(error))
+
+        print(f"{done} captures labelled, {skipped} up to date, {failed} failed.")
+        print_stats(stats)
+        sys.exit(1 if failed else 0)
+
+    rules = None if args.alerts is None else RuleEngine(lookup, args.alerts)
+    labeler = Labeler(lookup, stats=stats, rules=rules)             # Compiled address index + request/response correlator
+    if stats is not None:
+        stats.switch("write")                                       # Anything not charged to an inner stage is output work
+
+    # ===============================
+    # PROCESSING LIVE STREAM
+    # ===============================
+
+    if args.stream:
+        src = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+        traffic = None
+        if args.traffic:                                            # Report rewritten every --stats-interval seconds
+            traffic = TrafficStats(labeler.correlator, lookup["plcs"], args.output, args.stats_interval)
+        try:
+            if args.pcap:
+                stream_annotated_pcapng(src, args.output, labeler.lookup, labeler.correlator, stats, frame_filter,
+                                        not args.no_reassembly, rules)
+            else:
+                stream_table_csv(src, args.output, labeler.lookup, labeler.correlator, stats, frame_filter,
+                                 not args.no_reassembly, None if traffic is None else TrafficSink(traffic), rules)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if src is not sys.stdin.buffer:
+                src.close()
+        if traffic is not None:
+            print(traffic.format_summary())
+        print_correlation_stats(labeler.correlator)
+        print_alerts(rules)
+        print_stats(stats)
+        return
+
+    # ===============================
+    # STORING CAPTURES IN A DATABASE
+    # ===============================
+
+    if args.format in STORE_FORMATS:
+        from .batch import expand_inputs
+        from .sinks import StoreSink
+        from .store import RecordStore
+        captures = expand_inputs(args.file)
+        if not captures:
+            parser.error("no capture found.")
+
+        settings, stored = run_settings(args), 0
+        with RecordStore(args.output, args.format) as store:
+            for capture, _ in captures:
+                try:
+                    capture_id = store.begin_capture(capture, settings=settings, replace=args.force)
+                except ValueError as error:
+                    parser.error(f"{error} Use --force to replace its rows.")
+                if capture_id is None:
+                    print(f"'{capture}' is already in '{args.output}'.")
+                    continue
+
+                labeler = Labeler(lookup, stats=stats, rules=rules)  # Requests are not paired across captures
+                with StoreSink(store, capture_id) as sink:
+                    sink.write_all(iter_capture_records(args, capture, labeler, stats, frame_filter))
+                stored += 1
+                correlation = labeler.stats()
+                print(f"'{capture}' -> '{args.output}': responses matched: {correlation['matched']}, "
+                      f"orphaned: {correlation['orphaned']}, requests expired: {correlation['expired']}.")
+        print(f"{stored} captures stored in '{args.output}', {len(captures) - stored} already there.")
+        print_alerts(rules)
+        print_stats(stats)
+        return
+
+    # ===============================
+    # PROCESSING PCAP FILE
+    # ===============================
+
+    if args.resume or args.follow:
+        from .checkpoint import label_capture_checkpointed
+        try:
+            run = label_capture_checkpointed(args.file, args.output, labeler.lookup, labeler.correlator, stats,
+                                             frame_filter, not args.no_reassembly, args.follow, run_settings(args),
+                                             interval=args.checkpoint_interval)
+        except ValueError as error:
+            parser.error(str(error))
+        if run["resumed_at"] is not None:
+            print(f"Continued from frame {run['resumed_at']}: {run['frames']} frames read, {run['rows']} rows added.")
+        print(f"Data saved to '{args.output}'.")
+        print_correlation_stats(labeler.correlator)
+        print_stats(stats)
+        return
+
+    index = None
+    if record_filter and args.backend == "native" and not args.no_reassembly:
+        from .index import load_capture_index
+        try:
+            index = load_capture_index(args.file, frame_filter)
+        except ValueError as error:
+            print(f"{error} Scanning the whole capture instead (rebuild it with --index).", file=sys.stderr)
+
+    if index is not None:
+        from .index import iter_indexed_packets, select_packets
+        packets = iter_indexed_packets(args.file, index, select_packets(index, record_filter, labeler.lookup),
+                                       frame_filter)
+        records = labeler.iter_rows(stats.timed("decode", packets) if stats is not None else packets)
+    else:
+        records = iter_capture_records(args, args.file, labeler, stats, frame_filter)
+    if record_filter:
+        records = record_filter.filter(records)
+
+    if args.pcap:
+        sink = PcapngSink(args.file, args.output)                  # Copies the capture, commenting labelled packets
+    elif args.timeseries:
+        sink = TimeSeriesSink(args.output, args.format, lookup["plcs"], args.changes_only, args.pivot,
+                              args.resample, args.agg)             # Keeps the process values only
+    elif args.traffic:
+        sink = TrafficSink(TrafficStats(labeler.correlator, lookup["plcs"], args.output))   # Counters only, no rows kept
+    else:
+        sink = TableSink(args.output, args.format)                  # One CSV chunk / Parquet row group / Arrow batch at a time
+
+    with sink:
+        sink.write_all(records)
+    if args.traffic:
+        print(sink.traffic.format_summary())
+        print(f"Traffic report saved to '{args.output}'.")
+    else:
+        print(f"Data saved to '{args.output}'.")
+
+    print_correlation_stats(labeler.correlator)
+    print_alerts(rules)
+    print_stats(stats)
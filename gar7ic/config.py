@@ -0,0 +1,297 @@
+import os
+import mmap
+import bisect
+import pickle
+import hashlib
+
+import yaml
+
+from .enums import S7CommMemoryArea, S7CommTransportSize
+
+# ===============================
+# PLC CONFIGURATION
+# ===============================
+
+# S7 types whose values can be checked against a configured min/max
+RULE_NUMERIC_TYPES = ("BOOL", "BYTE", "WORD", "UINT", "INT", "DWORD", "UDINT", "DINT", "REAL", "LREAL", "S5TIME")
+
+# Size in bytes of one element of each S7ANY transport size (BIT is handled separately)
+TRANSPORT_SIZE_BYTES = {
+    0x02: 1, 0x03: 1, 0x04: 2, 0x05: 2, 0x06: 4, 0x07: 4, 0x08: 4,
+    0x09: 2, 0x0a: 4, 0x0b: 4, 0x0c: 2, 0x0f: 8, 0x1c: 2, 0x1d: 2
+}
+
+
+def parse_variable_address(address):
+    """
+    Splits a configuration address ("4", 2.0, "0.3") into integer byte and bit offsets.
+
+    :param address: Address as written in the YAML configuration.
+    :return: Tuple (byte, bit).
+    """
+    byte, _, bit = str(address).partition(".")
+    return int(byte), int(bit or 0)
+
+
+def plc_memory_areas(plc):
+    """
+    Lists the memory areas of a configured PLC with their variables.
+
+    :param plc: PLC entry of the YAML configuration.
+    :return: List of (S7CommMemoryArea, db_number, variables) for each data block, then inputs and outputs (DB number 0).
+    """
+    io_mapping = plc["io_mapping"]
+    areas = [(S7CommMemoryArea.DATA_BLOCK, db["number"], db["variables"]) for db in io_mapping.get("data_block", [])]
+    areas.append((S7CommMemoryArea.INPUTS, 0, io_mapping.get("inputs", [])))
+    areas.append((S7CommMemoryArea.OUTPUTS, 0, io_mapping.get("outputs", [])))
+    return areas
+
+
+def build_fast_lookup(plcs):
+    """
+    Compiles the PLC configuration into a hashed address index.
+
+    Variables are keyed by integer tuples (ip, area, db_number, byte, bit). Inputs and outputs use
+    DB number 0, as on the wire. Each (ip, area, db_number) also keeps its variables sorted by bit
+    address so that a request spanning several variables can be resolved with a range query.
+    The alert rules of the configuration (see compile_plc_rules and compile_variable_rule) are
+    compiled alongside, under the same keys.
+
+    :param plcs: List of PLCs from the YAML configuration.
+    :return: Dictionary {"plcs": {IP: name}, "variables": {key: variable}, "ranges": {(ip, area, db): (starts, variables)},
+        "rules": {"plcs": {IP: rules}, "variables": {key: rule}}}
+    """
+    lookup = {"plcs": {}, "variables": {}, "ranges": {}, "rules": {"plcs": {}, "variables": {}}}
+
+    for plc in plcs:
+        ip = plc["ip"]
+        lookup["plcs"][ip] = plc["name"]
+        if plc.get("rules"):
+            lookup["rules"]["plcs"][ip] = compile_plc_rules(plc)
+
+        for area, db_number, variables in plc_memory_areas(plc):
+            for var in variables:
+                byte, bit = parse_variable_address(var["address"])
+                lookup["variables"][(ip, area.value, db_number, byte, bit)] = {
+                    "ip": ip,
+                    "db_number": db_number,
+                    "address": var["address"],
+                    "byte": byte,
+                    "bit": bit,
+                    "name": var["name"],
+                    "type": var["type"],
+                    "area": area.name
+                }
+                rule = compile_variable_rule(var)
+                if rule is not None:
+                    lookup["rules"]["variables"][(ip, area.value, db_number, byte, bit)] = rule
+
+    ranges = {}
+    for (ip, area, db_number, byte, bit), var in sorted(lookup["variables"].items()):
+        starts, variables = ranges.setdefault((ip, area, db_number), ([], []))
+        starts.append(byte * 8 + bit)
+        variables.append(var)
+    lookup["ranges"] = ranges
+
+    return lookup
+
+
+def compile_plc_rules(plc):
+    """
+    Reads the "rules" of a PLC: hosts allowed to stop it and maximum WRITE rate.
+
+    :param plc: PLC entry of the YAML configuration.
+    :return: Dictionary {"stop_from": frozenset of IPs or None, "max_writes_per_s": int or None}.
+    :raises ValueError: If a rule is unknown or malformed.
+    """
+    rules = plc["rules"]
+    unknown = set(rules) - {"stop_from", "max_writes_per_s"}
+    if unknown:
+        raise ValueError(f"Unknown rules for PLC '{plc['name']}': {', '.join(sorted(unknown))}.")
+
+    stop_from = rules.get("stop_from")
+    if isinstance(stop_from, str):
+        stop_from = [stop_from]
+    max_writes = rules.get("max_writes_per_s")
+    if max_writes is not None and (not isinstance(max_writes, int) or max_writes < 0):
+        raise ValueError(f"max_writes_per_s of PLC '{plc['name']}' must be a non-negative integer.")
+    return {"stop_from": None if stop_from is None else frozenset(stop_from), "max_writes_per_s": max_writes}
+
+
+def compile_variable_rule(var):
+    """
+    Reads the rule of a configured variable: read_only, and/or min and max values.
+
+    :param var: Variable entry of the YAML configuration.
+    :return: Dictionary {"read_only": bool, "min": float, "max": float} (infinite bounds when absent), or None without rule.
+    :raises ValueError: If bounds are given for a non-numeric type.
+    """
+    read_only, low, high = bool(var.get("read_only", False)), var.get("min"), var.get("max")
+    if not read_only and low is None and high is None:
+        return None
+    if (low is not None or high is not None) and var["type"] not in RULE_NUMERIC_TYPES:
+        raise ValueError(f"min/max of variable '{var['name']}' require a numeric type, not {var['type']}.")
+    return {"read_only": read_only,
+            "min": float("-inf") if low is None else float(low),
+            "max": float("inf") if high is None else float(high)}
+
+
+def find_variable(ip, area, db_number, byte_address, bit_address, lookup):
+    """
+    Searches for the variable configured at an exact address.
+
+    :param ip: PLC IP address.
+    :param area: Memory area code (S7CommMemoryArea value).
+    :param db_number: Data block number (0 for inputs/outputs).
+    :param byte_address: Byte address of the variable.
+    :param bit_address: Bit address within the byte.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :return: Dictionary containing variable information or None.
+    """
+    return lookup["variables"].get((ip, area, db_number, byte_address, bit_address))
+
+
+def find_variables(ip, area, db_number, start_bit, end_bit, lookup):
+    """
+    Searches for every variable whose address lies in a bit-address interval.
+
+    :param ip: PLC IP address.
+    :param area: Memory area code (S7CommMemoryArea value).
+    :param db_number: Data block number (0 for inputs/outputs).
+    :param start_bit: First bit address of the interval (byte * 8 + bit).
+    :param end_bit: Bit address just after the interval.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :return: List of variable dictionaries, in address order.
+    """
+    entry = lookup["ranges"].get((ip, area, db_number))
+    if entry is None:
+        return []
+
+    starts, variables = entry
+    return variables[bisect.bisect_left(starts, start_bit):bisect.bisect_left(starts, end_bit)]
+
+
+def item_bit_range(item):
+    """
+    Locates the memory accessed by a request item.
+
+    :param item: Dictionary with the param_item_* fields of the request.
+    :return: Tuple (area, db_number, start_bit, end_bit) with db_number 0 outside data blocks, or None without address.
+    """
+    address = item["param_item_address"]
+    if address is None or item["param_item_area"] is None:
+        return None
+
+    area, db_number = item["param_item_area"], item["param_item_db"] or 0
+    if area != S7CommMemoryArea.DATA_BLOCK.value:
+        db_number = 0
+
+    if item["param_item_transp_size"] == S7CommTransportSize.BIT.value:
+        return area, db_number, address, address + 1
+
+    start_byte = address // 8
+    length = (item["param_item_length"] or 1) * TRANSPORT_SIZE_BYTES.get(item["param_item_transp_size"], 1)
+    return area, db_number, start_byte * 8, (start_byte + length) * 8
+
+
+def resolve_item_variables(ip, item, lookup):
+    """
+    Resolves the configured variables accessed by a request item.
+
+    :param ip: PLC IP address (destination of the JOB).
+    :param item: Dictionary with the param_item_* fields of the request.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :return: List of (variable, byte offset in the item data, bit index) tuples.
+    """
+    memory = item_bit_range(item)
+    if memory is None:
+        return []
+
+    area, db_number, start_bit, end_bit = memory
+    if item["param_item_transp_size"] == S7CommTransportSize.BIT.value:
+        var = find_variable(ip, area, db_number, start_bit // 8, start_bit % 8, lookup)
+        return [] if var is None else [(var, 0, 0)]                # A BIT read returns the bit value in bit 0
+
+    return [(var, var["byte"] - start_bit // 8, var["bit"])
+            for var in find_variables(ip, area, db_number, start_bit, end_bit, lookup)]
+
+
+# libyaml-based loader when PyYAML was built with it (an order of magnitude faster on large configurations)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_config(path):
+    """
+    Reads a PLC architecture configuration file.
+
+    :param path: Path to the YAML configuration.
+    :return: Parsed configuration dictionary (with a "plc" list).
+    """
+    with open(path, "r") as file:
+        return yaml.load(file, Loader=YAML_LOADER)
+
+
+# ===============================
+# COMPILED CONFIGURATION CACHE
+# ===============================
+
+CONFIG_CACHE_VERSION = 2                                            # Bump when the layout of build_fast_lookup changes
+
+
+def config_cache_dir():
+    """ Directory of the compiled configuration cache: $GAR7IC_CACHE_DIR, else $XDG_CACHE_HOME/gar7ic (~/.cache/gar7ic). """
+    return os.environ.get("GAR7IC_CACHE_DIR") or \
+        os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "gar7ic")
+
+
+def load_compiled_config(path, cache_dir=None):
+    """
+    Returns the compiled address index of a YAML configuration, going through an on-disk cache.
+
+    The cache file is named after the SHA-256 of the configuration content, so an edited file is
+    recompiled while a copied or touched one is not. It holds the pickled index and is read through
+    a memory map. An unwritable cache directory only disables caching.
+
+    :param path: Path to the YAML configuration.
+    :param cache_dir: (Optional) Cache directory instead of config_cache_dir().
+    :return: Compiled address index.
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+    digest = hashlib.sha256(content).hexdigest()
+    cache_path = os.path.join(cache_dir or config_cache_dir(), f"config-v{CONFIG_CACHE_VERSION}-{digest}.pickle")
+
+    try:
+        with open(cache_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return pickle.loads(data)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        pass                                                        # Missing, empty or corrupt: recompile
+
+    lookup = build_fast_lookup(yaml.load(content, Loader=YAML_LOADER)["plc"])
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(f"{cache_path}.{os.getpid()}.tmp", "wb") as file:
+            pickle.dump(lookup, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{cache_path}.{os.getpid()}.tmp", cache_path)    # Concurrent runs never read a partial file
+    except OSError:
+        pass
+
+    return lookup
+
+
+def compile_config(config, cache=False):
+    """
+    Returns the compiled address index of a configuration given in any of its forms.
+
+    :param config: Path to a YAML configuration, parsed configuration dictionary, or index from build_fast_lookup.
+    :param cache: Use the compiled configuration cache for paths (see load_compiled_config).
+    :return: Compiled address index.
+    """
+    if isinstance(config, str):
+        if cache:
+            return load_compiled_config(config)
+        config = load_config(config)
+    if "variables" in config and "ranges" in config:
+        return config
+    return build_fast_lookup(config["plc"])
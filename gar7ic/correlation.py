@@ -0,0 +1,161 @@
+import bisect
+import collections
+
+# ===============================
+# REQUEST / RESPONSE CORRELATION
+# ===============================
+
+REQUEST_TIMEOUT_NS = 30 * 1_000_000_000                            # Unanswered requests expire after 30 s of capture time
+MAX_PENDING_REQUESTS = 65536                                        # Hard bound on buffered requests (oldest evicted first)
+
+# Upper bounds of the response latency histogram buckets (1-2-5 series, 100 µs to 10 s); a last bucket counts the rest
+LATENCY_BUCKETS_S = tuple(mantissa * 10.0 ** exponent for exponent in range(-4, 1) for mantissa in (1, 2, 5)) + (10.0,)
+LATENCY_BUCKETS_NS = tuple(round(bound * 1e9) for bound in LATENCY_BUCKETS_S)
+
+
+class RequestCorrelator:
+    """
+    Pairs S7COMM responses with their requests.
+
+    PDU references are only unique within one TCP connection, so requests are keyed by
+    (client IP, client port, PLC IP, PLC port, pduref) and a response looks up the reversed
+    connection. Pending requests are kept oldest first and evicted once older than timeout_ns of
+    capture time, or when more than max_pending are waiting, so memory stays bounded on long
+    captures and live streams.
+    """
+
+    def __init__(self, timeout_ns=REQUEST_TIMEOUT_NS, max_pending=MAX_PENDING_REQUESTS):
+        self.timeout_ns = timeout_ns
+        self.max_pending = max_pending
+        self.pending = collections.OrderedDict()                    # key -> (request timestamp, variables of each item)
+        self.matched = 0                                            # Responses paired with their request
+        self.orphaned = 0                                           # Responses without a pending request
+        self.expired = 0                                            # Requests dropped without a response
+        self.latency = {}                                           # PLC IP -> [count, total, min, max] in nanoseconds
+        self.latency_buckets = {}                                   # PLC IP -> responses per LATENCY_BUCKETS_NS bucket
+
+    @staticmethod
+    def request_key(packet):
+        """ Correlation key of a JOB packet (client -> PLC). """
+        return packet["src_ip"], packet["src_port"], packet["dst_ip"], packet["dst_port"], packet["header_pduref"]
+
+    @staticmethod
+    def response_key(packet):
+        """ Correlation key of the request answered by an ACK/ACK_DATA packet (PLC -> client). """
+        return packet["dst_ip"], packet["dst_port"], packet["src_ip"], packet["src_port"], packet["header_pduref"]
+
+    def expire(self, timestamp_ns):
+        """
+        Drops the requests left unanswered for longer than the timeout.
+
+        :param timestamp_ns: Capture timestamp of the packet about to be correlated.
+        """
+        while self.pending:
+            key, (requested_at, _) = next(iter(self.pending.items()))
+            if timestamp_ns - requested_at <= self.timeout_ns:
+                break
+            del self.pending[key]
+            self.expired += 1
+
+    def add_request(self, packet, requested):
+        """
+        Buffers the variables accessed by a request until its response arrives.
+
+        :param packet: Decoded JOB packet dictionary.
+        :param requested: List of resolved variables, one entry per request item.
+        """
+        self.expire(packet["timestamp_ns"])
+
+        key = self.request_key(packet)
+        if self.pending.pop(key, None) is not None:
+            self.expired += 1                                       # PDU reference reused before any response
+        self.pending[key] = (packet["timestamp_ns"], requested)
+
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.expired += 1
+
+    def match_response(self, packet):
+        """
+        Retrieves and forgets the request answered by a response.
+
+        :param packet: Decoded ACK/ACK_DATA packet dictionary.
+        :return: List of resolved variables, one entry per request item (empty if no request is pending).
+        """
+        self.expire(packet["timestamp_ns"])
+
+        entry = self.pending.pop(self.response_key(packet), None)
+        if entry is None:
+            self.orphaned += 1
+            return []
+
+        self.matched += 1
+        requested_at, requested = entry
+        latency = packet["timestamp_ns"] - requested_at
+        self._record_latency(packet["src_ip"], 1, latency, latency, latency)
+        buckets = self.latency_buckets.get(packet["src_ip"])
+        if buckets is None:
+            buckets = self.latency_buckets[packet["src_ip"]] = [0] * (len(LATENCY_BUCKETS_NS) + 1)
+        buckets[bisect.bisect_left(LATENCY_BUCKETS_NS, latency)] += 1
+        return requested
+
+    def has_request(self, packet):
+        """ Tells whether the request answered by a response is pending. """
+        return self.response_key(packet) in self.pending
+
+    def _record_latency(self, plc_ip, count, total, minimum, maximum):
+        """ Accumulates request -> response latencies of one PLC. """
+        stats = self.latency.get(plc_ip)
+        if stats is None:
+            self.latency[plc_ip] = [count, total, minimum, maximum]
+        else:
+            stats[0] += count
+            stats[1] += total
+            stats[2] = min(stats[2], minimum)
+            stats[3] = max(stats[3], maximum)
+
+    def merge(self, other):
+        """
+        Takes over the counters and pending requests of a correlator that processed the following
+        part of the same capture.
+
+        :param other: RequestCorrelator of the next chunk.
+        """
+        self.matched += other.matched
+        self.orphaned += other.orphaned
+        self.expired += other.expired
+        for plc_ip, stats in other.latency.items():
+            self._record_latency(plc_ip, *stats)
+        for plc_ip, counts in other.latency_buckets.items():
+            buckets = self.latency_buckets.setdefault(plc_ip, [0] * len(counts))
+            for index, count in enumerate(counts):
+                buckets[index] += count
+
+        for key, entry in other.pending.items():
+            if self.pending.pop(key, None) is not None:
+                self.expired += 1
+            self.pending[key] = entry
+
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.expired += 1
+
+    def stats(self):
+        """
+        Summarises the correlation counters.
+
+        :return: Dictionary with matched/orphaned/expired/pending counts and latency per PLC IP in seconds
+            ("buckets": responses per LATENCY_BUCKETS_S bucket, then above the last bound).
+        """
+        return {
+            "matched": self.matched,
+            "orphaned": self.orphaned,
+            "expired": self.expired,
+            "pending": len(self.pending),
+            "latency": {plc_ip: {"count": count,
+                                 "mean": total / count / 1e9,
+                                 "min": minimum / 1e9,
+                                 "max": maximum / 1e9,
+                                 "buckets": list(self.latency_buckets.get(plc_ip, []))}
+                        for plc_ip, (count, total, minimum, maximum) in self.latency.items()}
+        }
@@ -0,0 +1,703 @@
+import time
+import socket
+import struct
+import binascii
+import itertools
+import collections
+
+from .enums import S7CommParamFunction, S7CommHeaderRosctr
+from .capture import (DLT_NULL, DLT_EN10MB, DLT_RAW_ALIASES, DLT_LOOP, DLT_LINUX_SLL, DLT_LINUX_SLL2, ETHERTYPE_IPV4,
+                      ETHERTYPE_IPV6, ETHERTYPE_VLAN, IPPROTO_TCP, iter_file_frames, iter_capture_frames)
+from .reassembly import TcpReassembler
+
+# ===============================
+# NATIVE S7COMM DECODER
+# ===============================
+
+def _network_offset(linktype, frame):
+    """
+    Walks the link-layer header of a frame (and its VLAN tags).
+
+    :param linktype: Link-layer type of the capture interface.
+    :param frame: Raw frame bytes.
+    :return: Tuple (ethertype, offset of the network header) or None if the link type is not supported.
+    """
+    if linktype == DLT_EN10MB:
+        if len(frame) < 14:
+            return None
+        ethertype = (frame[12] << 8) | frame[13]
+        offset = 14
+        while ethertype in ETHERTYPE_VLAN and len(frame) >= offset + 4:
+            ethertype = (frame[offset + 2] << 8) | frame[offset + 3]
+            offset += 4
+    elif linktype == DLT_LINUX_SLL:
+        if len(frame) < 16:
+            return None
+        ethertype = (frame[14] << 8) | frame[15]
+        offset = 16
+    elif linktype == DLT_LINUX_SLL2:
+        if len(frame) < 20:
+            return None
+        ethertype = (frame[0] << 8) | frame[1]
+        offset = 20
+    elif linktype in (DLT_NULL, DLT_LOOP) or linktype in DLT_RAW_ALIASES:
+        offset = 4 if linktype in (DLT_NULL, DLT_LOOP) else 0
+        if len(frame) <= offset:
+            return None
+        ethertype = ETHERTYPE_IPV4 if frame[offset] >> 4 == 4 else ETHERTYPE_IPV6
+    else:
+        return None
+    return ethertype, offset
+
+
+def extract_tcp_payload(linktype, frame):
+    """
+    Walks the link, IP and TCP headers of a frame and returns its TCP payload.
+
+    :param linktype: Link-layer type of the capture interface.
+    :param frame: Raw frame bytes.
+    :return: Tuple (src_ip, dst_ip, src_port, dst_port, payload) or None if the frame is not TCP over IP.
+    """
+    segment = extract_tcp_segment(linktype, frame)
+    return None if segment is None else segment[:4] + segment[6:]
+
+
+def extract_tcp_segment(linktype, frame):
+    """
+    Walks the link, IP and TCP headers of a frame and returns its TCP segment.
+
+    :param linktype: Link-layer type of the capture interface.
+    :param frame: Raw frame bytes.
+    :return: Tuple (src_ip, dst_ip, src_port, dst_port, seq, flags, payload) or None if the frame is not TCP over IP.
+    """
+    network = _network_offset(linktype, frame)
+    if network is None:
+        return None
+    ethertype, offset = network
+
+    if ethertype == ETHERTYPE_IPV4:
+        if len(frame) < offset + 20:
+            return None
+        ihl = (frame[offset] & 0x0f) * 4
+        total_length = (frame[offset + 2] << 8) | frame[offset + 3]
+        fragment_offset = ((frame[offset + 6] & 0x1f) << 8) | frame[offset + 7]
+        if frame[offset + 9] != IPPROTO_TCP or fragment_offset:
+            return None
+        src_ip = socket.inet_ntoa(frame[offset + 12:offset + 16])
+        dst_ip = socket.inet_ntoa(frame[offset + 16:offset + 20])
+        ip_end = offset + total_length if total_length else len(frame)      # Ignore Ethernet padding
+        offset += ihl
+    elif ethertype == ETHERTYPE_IPV6:
+        if len(frame) < offset + 40 or frame[offset + 6] != IPPROTO_TCP:
+            return None
+        payload_length = (frame[offset + 4] << 8) | frame[offset + 5]
+        src_ip = socket.inet_ntop(socket.AF_INET6, frame[offset + 8:offset + 24])
+        dst_ip = socket.inet_ntop(socket.AF_INET6, frame[offset + 24:offset + 40])
+        ip_end = offset + 40 + payload_length
+        offset += 40
+    else:
+        return None
+
+    if len(frame) < offset + 20:
+        return None
+    src_port = (frame[offset] << 8) | frame[offset + 1]
+    dst_port = (frame[offset + 2] << 8) | frame[offset + 3]
+    seq = (frame[offset + 4] << 24) | (frame[offset + 5] << 16) | (frame[offset + 6] << 8) | frame[offset + 7]
+    flags = frame[offset + 13]
+    offset += (frame[offset + 12] >> 4) * 4
+
+    return src_ip, dst_ip, src_port, dst_port, seq, flags, frame[offset:min(ip_end, len(frame))]
+
+
+
+# ===============================
+# FRAME PRE-FILTER
+# ===============================
+
+S7COMM_PORTS = (102,)                                               # ISO-TSAP port of S7 PLCs
+
+
+def _pack_ip(ip):
+    """ Packs a textual IPv4 or IPv6 address into its network bytes. """
+    return socket.inet_pton(socket.AF_INET6 if ":" in ip else socket.AF_INET, ip)
+
+
+class FrameFilter:
+    """
+    Cheap test discarding the frames that cannot carry S7COMM traffic of interest, before decoding.
+
+    Only fixed header fields are read: IP protocol and fragment offset, raw IP addresses (compared
+    as packed bytes, never formatted), TCP ports, and the TPKT version and COTP DT type at the start
+    of the TCP payload. The test never rejects a frame the decoder would accept on these ports and
+    addresses, so filtering only changes which traffic is kept, not how it is decoded.
+    """
+
+    def __init__(self, ports=S7COMM_PORTS, plcs=None):
+        """
+        :param ports: TCP ports carrying TPKT, at either end of the connection.
+        :param plcs: (Optional) IP addresses of the PLCs to keep (e.g. lookup["plcs"]); None keeps every address.
+        """
+        self.ports = frozenset(ports)
+        self.plcs = None if plcs is None else sorted(plcs)
+        self.addresses = None if plcs is None else frozenset(_pack_ip(ip) for ip in plcs)
+
+    def accepts(self, linktype, frame, tpkt=True):
+        """
+        Tells whether a frame may carry S7COMM between a kept port and address.
+
+        :param linktype: Link-layer type of the capture interface.
+        :param frame: Raw frame bytes.
+        :param tpkt: Also require the TCP payload to start with TPKT/COTP headers (off when reassembling:
+            continuation segments and bare SYN/FIN/RST are needed too).
+        :return: False if the frame can be discarded without decoding.
+        """
+        if linktype == DLT_EN10MB and frame[12:14] == b"\x08\x00":
+            ethertype, offset = ETHERTYPE_IPV4, 14                  # Untagged Ethernet, the common case
+        else:
+            network = _network_offset(linktype, frame)
+            if network is None:
+                return False
+            ethertype, offset = network
+        addresses = self.addresses
+
+        if ethertype == ETHERTYPE_IPV4:
+            if len(frame) < offset + 20 or frame[offset + 9] != IPPROTO_TCP or frame[offset + 6] & 0x1f or frame[offset + 7]:
+                return False
+            if addresses is not None and bytes(frame[offset + 12:offset + 16]) not in addresses and \
+                    bytes(frame[offset + 16:offset + 20]) not in addresses:
+                return False
+            offset += (frame[offset] & 0x0f) * 4
+        elif ethertype == ETHERTYPE_IPV6:
+            if len(frame) < offset + 40 or frame[offset + 6] != IPPROTO_TCP:
+                return False
+            if addresses is not None and bytes(frame[offset + 8:offset + 24]) not in addresses and \
+                    bytes(frame[offset + 24:offset + 40]) not in addresses:
+                return False
+            offset += 40
+        else:
+            return False
+
+        if len(frame) < offset + 20 or (((frame[offset] << 8) | frame[offset + 1]) not in self.ports and
+                                        ((frame[offset + 2] << 8) | frame[offset + 3]) not in self.ports):
+            return False
+
+        if not tpkt:
+            return True
+
+        # TPKT version 3, then a COTP DT header
+        offset += (frame[offset + 12] >> 4) * 4
+        return len(frame) >= offset + 7 and frame[offset] == 0x03 and frame[offset + 5] & 0xf0 == 0xf0
+
+    def display_filter(self):
+        """ Equivalent Wireshark display filter, for the pyshark backend. """
+        ports = " ".join(str(port) for port in sorted(self.ports))
+        conditions = ["s7comm", f"tcp.port in {{{ports}}}"]
+        if self.plcs is not None:
+            addresses = [f"{'ipv6' if ':' in ip else 'ip'}.addr == {ip}" for ip in self.plcs]
+            conditions.append(f"({' || '.join(addresses) or 'frame.number == 0'})")
+        return " && ".join(conditions)
+
+
+def _s7_data_length(transport_size, length):
+    """
+    Converts the length field of an S7 data item into a number of bytes.
+
+    :param transport_size: Data item transport size (0x03 BIT, 0x04 BYTE/WORD/DWORD, 0x05 INTEGER, ...).
+    :param length: Length field as found in the data item header.
+    :return: Length of the item data in bytes.
+    """
+    if transport_size in (0x03, 0x04, 0x05):                           # Length is expressed in bits
+        return (length + 7) // 8
+    return length
+
+
+def new_s7_item():
+    """
+    Creates an empty S7COMM item, filled in from the parameter and/or data section.
+
+    :return: Dictionary with the param_item_* and data_* fields set to None.
+    """
+    return {
+        "param_item_transp_size": None,
+        "param_item_length": None,
+        "param_item_db": None,
+        "param_item_area": None,
+        "param_item_address": None,
+        "data_returncode": None,
+        "resp_data": None
+    }
+
+
+# Raw bytes of one variable inside a response item, decoded later in batches (see values.convert_s7_values)
+S7RawValue = collections.namedtuple("S7RawValue", ["data", "bit_index"])
+
+
+def parse_s7comm(payload):
+    """
+    Parses the TPKT, COTP and S7COMM layers of a TCP payload.
+
+    :param payload: TCP payload bytes.
+    :return: Dictionary with the S7COMM header, parameter and data fields, or None if not S7COMM.
+    """
+    # === TPKT / COTP ===
+    if len(payload) < 7 or payload[0] != 0x03:
+        return None
+    tpkt_length = (payload[2] << 8) | payload[3]
+    cotp_length = payload[4]
+    if payload[5] & 0xf0 != 0xf0:                                       # Only COTP DT frames carry S7COMM
+        return None
+
+    offset = 5 + cotp_length
+    end = min(tpkt_length, len(payload))
+    if offset + 10 > end or payload[offset] != 0x32:
+        return None
+
+    # === HEADER ===
+    header_rosctr = payload[offset + 1]
+    header_pduref, header_parlg, header_datlg = struct.unpack_from(">HHH", payload, offset + 4)
+    offset += 12 if header_rosctr in (S7CommHeaderRosctr.ACK.value, S7CommHeaderRosctr.ACK_DATA.value) else 10
+
+    s7 = {
+        "header_rosctr": header_rosctr,
+        "header_pduref": header_pduref,
+        "header_datlg": header_datlg,
+        "param_func": None,
+        "param_itemcount": None,
+        "items": []
+    }
+
+    # === PARAMETER ===
+    param = payload[offset:min(offset + header_parlg, end)]
+    data = payload[offset + header_parlg:min(offset + header_parlg + header_datlg, end)]
+    if not param:
+        return s7
+
+    s7["param_func"] = param[0]
+    if param[0] not in (S7CommParamFunction.READ.value, S7CommParamFunction.WRITE.value) or len(param) < 2:
+        return s7
+    item_count = s7["param_itemcount"] = param[1]
+    items = s7["items"] = [new_s7_item() for _ in range(item_count)]
+
+    # Request items (variable specification: 0x12, spec length, syntax id 0x10 for S7ANY)
+    if header_rosctr == S7CommHeaderRosctr.JOB.value:
+        position = 2
+        for item in items:
+            if position + 2 > len(param):
+                break
+            spec_length = param[position + 1]
+            if spec_length >= 10 and position + 12 <= len(param) and param[position + 2] == 0x10:
+                transport_size, length, db, area = struct.unpack_from(">BHHB", param, position + 3)
+                item["param_item_transp_size"] = transport_size
+                item["param_item_length"] = length
+                item["param_item_db"] = db
+                item["param_item_area"] = area
+                item["param_item_address"] = (param[position + 9] << 16) | (param[position + 10] << 8) | param[position + 11]
+            position += 2 + spec_length
+
+    # === DATA ===
+    if header_rosctr == S7CommHeaderRosctr.ACK_DATA.value and param[0] == S7CommParamFunction.WRITE.value:
+        # WRITE responses only carry one return code per item
+        for item, returncode in zip(items, data):
+            item["data_returncode"] = returncode
+        return s7
+
+    position = 0
+    for index, item in enumerate(items):
+        if position + 4 > len(data):
+            break
+        transport_size, length = struct.unpack_from(">BH", data, position + 1)
+        length = _s7_data_length(transport_size, length)
+        item["data_returncode"] = data[position]
+        item["resp_data"] = bytes(data[position + 4:position + 4 + length])
+        position += 4 + length + (length % 2 if index < item_count - 1 else 0)      # Fill byte after odd items
+
+    return s7
+
+
+def format_timestamp(timestamp_ns):
+    """
+    Formats a timestamp like Wireshark's frame.time field ("Mar  1, 2025 16:07:52.913675704 CET").
+
+    :param timestamp_ns: Timestamp in nanoseconds since epoch.
+    :return: Formatted local time string.
+    """
+    local_time = time.localtime(timestamp_ns // 1_000_000_000)
+    return time.strftime("%b %e, %Y %H:%M:%S", local_time) + \
+        f".{timestamp_ns % 1_000_000_000:09d} " + time.strftime("%Z", local_time)
+
+
+def format_seconds(timestamp_ns):
+    """ Formats a nanosecond duration or epoch as a "seconds.nanoseconds" string. """
+    sign = "-" if timestamp_ns < 0 else ""
+    seconds, nanoseconds = divmod(abs(timestamp_ns), 1_000_000_000)
+    return f"{sign}{seconds}.{nanoseconds:09d}"
+
+
+def _parse_seconds(text):
+    """ Parses a "seconds.fraction" string (as printed by tshark) into integer nanoseconds. """
+    seconds, _, fraction = text.partition(".")
+    return int(seconds) * 1_000_000_000 + int((fraction + "000000000")[:9])
+
+
+def decode_s7_frame(frame_number, linktype, timestamp_ns, length, frame, first_timestamp):
+    """
+    Decodes one captured frame into an S7COMM packet dictionary.
+
+    :param frame_number: Frame number in the capture (1-based).
+    :param linktype: Link-layer type of the capture interface.
+    :param timestamp_ns: Capture timestamp in nanoseconds.
+    :param length: Original frame length on the wire.
+    :param frame: Raw frame bytes.
+    :param first_timestamp: Timestamp of the first frame of the capture (for Timestamp_Shift).
+    :return: Packet dictionary (frame, IP and S7COMM fields) or None if the frame is not S7COMM.
+    """
+    tcp = extract_tcp_segment(linktype, frame)
+    if tcp is None or not tcp[6]:
+        return None
+
+    s7 = parse_s7comm(tcp[6])
+    if s7 is None:
+        return None
+    return _s7_packet(s7, frame_number, timestamp_ns, length, tcp, first_timestamp, (frame_number,), tcp[4])
+
+
+def _s7_packet(s7, frame_number, timestamp_ns, length, tcp, first_timestamp, pdu_frames, pdu_seq):
+    """ Adds the frame and IP fields to parsed S7COMM fields (see decode_s7_frame). """
+    s7.update({
+        "frame_number": frame_number,
+        "timestamp": format_timestamp(timestamp_ns),
+        "timestamp_ns": timestamp_ns,
+        "timestamp_epoch": format_seconds(timestamp_ns),
+        "timestamp_shift": format_seconds(timestamp_ns - first_timestamp),
+        "src_ip": tcp[0],
+        "dst_ip": tcp[1],
+        "src_port": tcp[2],
+        "dst_port": tcp[3],
+        "length": length,
+        "pdu_frames": pdu_frames,
+        "pdu_seq": pdu_seq
+    })
+    return s7
+
+
+def decode_s7_segment(frame_number, linktype, timestamp_ns, length, frame, first_timestamp, reassembler):
+    """
+    Decodes the S7COMM PDUs completed by one captured frame, reassembling them across TCP segments.
+
+    Every PDU is reported at the frame carrying its last byte, like Wireshark's reassembled PDUs;
+    its pdu_frames field lists the frames its bytes came from, pdu_seq is the TCP sequence number
+    of its first byte.
+
+    :param frame_number: Frame number in the capture (1-based).
+    :param linktype: Link-layer type of the capture interface.
+    :param timestamp_ns: Capture timestamp in nanoseconds.
+    :param length: Original frame length on the wire.
+    :param frame: Raw frame bytes.
+    :param first_timestamp: Timestamp of the first frame of the capture (for Timestamp_Shift).
+    :param reassembler: TcpReassembler holding the state of every connection.
+    :return: List of packet dictionaries (frame, IP and S7COMM fields), possibly empty.
+    """
+    tcp = extract_tcp_segment(linktype, frame)
+    if tcp is None:
+        return []
+    packets = []
+    for pdu, pdu_frames, pdu_seq in reassembler.feed((tcp[0], tcp[2], tcp[1], tcp[3]), tcp[4], tcp[5], tcp[6],
+                                                     frame_number):
+        s7 = parse_s7comm(pdu)
+        if s7 is not None:
+            packets.append(_s7_packet(s7, frame_number, timestamp_ns, length, tcp, first_timestamp, pdu_frames, pdu_seq))
+    return packets
+
+
+def decode_s7_pdu(frames, seq, first_timestamp):
+    """
+    Decodes one S7COMM PDU out of a capture, from the frames carrying it (see index.py).
+
+    The connection is taken up at the first byte of the PDU, so whatever precedes it in the first
+    frame (end of the previous PDU) is skipped. As in a full decoding, the packet is dated by the
+    last frame, the one that completed the PDU.
+
+    :param frames: Iterable of (frame_number, linktype, timestamp_ns, original_length, frame_bytes): the pdu_frames
+        of the packet and the frame completing it (frame_number of the packet), in capture order.
+    :param seq: TCP sequence number of the first byte of the PDU (pdu_seq of the packet).
+    :param first_timestamp: Timestamp of the first frame of the capture (for Timestamp_Shift).
+    :return: Packet dictionary, or None if the frames do not hold a complete S7COMM PDU.
+    """
+    reassembler = TcpReassembler()
+    found = None
+    for frame_number, linktype, timestamp_ns, length, frame in frames:
+        tcp = extract_tcp_segment(linktype, frame)
+        if tcp is None:
+            return None
+        key = (tcp[0], tcp[2], tcp[1], tcp[3])
+        if key not in reassembler.directions:
+            reassembler.synchronize(key, seq)
+        pdus = reassembler.feed(key, tcp[4], 0, tcp[6], frame_number)
+        if found is None and pdus:
+            found = pdus[0]
+
+    if found is None:
+        return None
+    pdu, pdu_frames, pdu_seq = found
+    s7 = parse_s7comm(pdu)
+    if s7 is None:
+        return None
+    return _s7_packet(s7, frame_number, timestamp_ns, length, tcp, first_timestamp, pdu_frames, pdu_seq)
+
+
+def decode_s7_frames(frames, first_timestamp=None, frame_filter=None, reassembler=None):
+    """
+    Decodes captured frames with the built-in decoder and yields every S7COMM packet.
+
+    :param frames: Iterable of (frame_number, linktype, timestamp_ns, original_length, frame_bytes).
+    :param first_timestamp: (Optional) Timestamp of the first frame of the capture, when it is not the first frame given.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassembler: (Optional) TcpReassembler rebuilding PDUs split or coalesced across segments; without it,
+        the first PDU of each frame is decoded.
+    :return: Generator of packet dictionaries (frame, IP and S7COMM fields).
+    """
+    accepts = None if frame_filter is None else frame_filter.accepts
+    tpkt = reassembler is None
+    for frame_number, linktype, timestamp_ns, length, frame in frames:
+        if first_timestamp is None:
+            first_timestamp = timestamp_ns
+        if accepts is not None and not accepts(linktype, frame, tpkt):
+            continue
+
+        if reassembler is not None:
+            yield from decode_s7_segment(frame_number, linktype, timestamp_ns, length, frame, first_timestamp, reassembler)
+            continue
+        packet = decode_s7_frame(frame_number, linktype, timestamp_ns, length, frame, first_timestamp)
+        if packet is not None:
+            yield packet
+
+
+def replay_tcp_segments(frames, reassembler, frame_filter=None):
+    """
+    Feeds frames to a reassembler without decoding the PDUs they complete.
+
+    Used before a chunk of a capture, so that the connections active at its start are already
+    synchronized on PDU boundaries when its first frame arrives.
+
+    :param frames: Iterable of (frame_number, linktype, timestamp_ns, original_length, frame_bytes).
+    :param reassembler: TcpReassembler to bring up to date.
+    :param frame_filter: (Optional) FrameFilter applied as when decoding.
+    """
+    for frame_number, linktype, _, _, frame in frames:
+        if frame_filter is not None and not frame_filter.accepts(linktype, frame, tpkt=False):
+            continue
+        tcp = extract_tcp_segment(linktype, frame)
+        if tcp is not None:
+            reassembler.feed((tcp[0], tcp[2], tcp[1], tcp[3]), tcp[4], tcp[5], tcp[6], frame_number)
+
+
+def iter_s7_packets_native(path, chunk=None):
+    """
+    Reads a capture with the built-in decoder and yields every S7COMM packet.
+
+    :param path: Path to the pcap/pcapng file.
+    :param chunk: (Optional) Chunk descriptor from scan_capture_chunks, to decode only that part of the file.
+    :return: Generator of packet dictionaries (frame, IP and S7COMM fields).
+    """
+    first_timestamp = None if chunk is None else chunk["first_timestamp"]
+    return decode_s7_frames(iter_capture_frames(path, chunk), first_timestamp)
+
+
+def iter_s7_packets_pyshark(path, display_filter="s7comm"):
+    """
+    Reads a capture through pyshark/tshark and yields every S7COMM packet.
+
+    :param path: Path to the pcap/pcapng file.
+    :param display_filter: Wireshark display filter selecting the packets (see FrameFilter.display_filter).
+    :return: Generator of packet dictionaries with the same fields as the native decoder.
+    """
+    try:
+        import pyshark                                              # Optional backend (requires tshark), imported on use
+    except ImportError:
+        raise RuntimeError("The pyshark backend requires the 'pyshark' package and tshark.") from None
+
+    def field(packet, name, base=10):
+        value = getattr(packet.s7comm, name, None)
+        return None if value is None else int(value, base)
+
+    def fields(packet, name, base=10):
+        # Every occurrence of a repeated field (one per S7COMM item)
+        value = packet.s7comm.get_field(name)
+        return [] if value is None else [int(f.get_default_value(), base) for f in value.all_fields]
+
+    item_fields = (("param_item_transp_size", 16), ("param_item_length", 10), ("param_item_db", 10),
+                   ("param_item_area", 16), ("param_item_address", 16), ("data_returncode", 16))
+
+    packets = pyshark.FileCapture(path, display_filter=display_filter)
+    try:
+        for packet in packets:
+            item_count = field(packet, "param_itemcount")
+            items = [new_s7_item() for _ in range(item_count or 0)]
+
+            for name, base in item_fields:
+                for item, value in zip(items, fields(packet, name, base)):
+                    item[name] = value
+
+            resp_data = packet.s7comm.get_field("resp_data")
+            for item, value in zip(items, [] if resp_data is None else resp_data.all_fields):
+                item["resp_data"] = binascii.unhexlify(value.get_default_value().replace(":", ""))
+
+            yield {
+                "frame_number": int(packet.number),
+                "timestamp": packet.frame_info.time,
+                "timestamp_ns": _parse_seconds(packet.frame_info.time_epoch),
+                "timestamp_epoch": packet.frame_info.time_epoch,
+                "timestamp_shift": packet.frame_info.time_relative,
+                "src_ip": getattr(packet.ip, "src", None),
+                "dst_ip": getattr(packet.ip, "dst", None),
+                "src_port": int(packet.tcp.srcport),
+                "dst_port": int(packet.tcp.dstport),
+                "length": int(getattr(packet.frame_info, "len", 0)),
+                "header_rosctr": field(packet, "header_rosctr", 16),
+                "header_pduref": field(packet, "header_pduref"),
+                "header_datlg": field(packet, "header_datlg"),
+                "param_func": field(packet, "param_func", 16),
+                "param_itemcount": item_count,
+                "items": items
+            }
+    finally:
+        packets.close()
+
+
+def iter_s7_packets(path, backend="native"):
+    """
+    Yields the S7COMM packets of a capture using the selected decoding backend.
+
+    :param path: Path to the pcap/pcapng file.
+    :param backend: 'native' (built-in decoder) or 'pyshark' (tshark dissection).
+    :return: Generator of packet dictionaries.
+    """
+    if backend == "pyshark":
+        return iter_s7_packets_pyshark(path)
+    return iter_s7_packets_native(path)
+
+
+class Decoder:
+    """
+    Turns captured frames into S7COMM packet dictionaries.
+
+    Files are read with the selected backend. Frames obtained elsewhere (live socket, embedding
+    service, stream) can be pushed one by one with decode(); Timestamp_Shift is then measured from
+    the first frame the decoder saw. With a FrameFilter, frames failing its header test are
+    dropped before being decoded (by tshark itself with the pyshark backend). The built-in decoder
+    reassembles TCP connections, so PDUs split over several segments or pipelined in one segment
+    are all decoded.
+    """
+
+    def __init__(self, backend="native", stats=None, frame_filter=None, reassemble=True):
+        """
+        :param backend: 'native' (built-in decoder) or 'pyshark' (tshark dissection).
+        :param stats: (Optional) Stats charged with the read and decode times.
+        :param frame_filter: (Optional) FrameFilter restricting decoding to some ports and PLC addresses.
+        :param reassemble: Reassemble TCP segments (native backend); otherwise decode the first PDU of each frame.
+        """
+        if backend not in ("native", "pyshark"):
+            raise ValueError(f"Unsupported decoding backend: {backend}")
+        self.backend = backend
+        self.stats = stats
+        self.frame_filter = frame_filter
+        self.reassemble = reassemble
+        self.reassembler = TcpReassembler() if reassemble else None     # Connections of the frames pushed one by one
+        self.first_timestamp = None
+
+    def _decode_frames(self, frames, first_timestamp=None, reassembler=None):
+        """ Decodes frames with the built-in decoder, timing reading and decoding separately when profiling. """
+        if self.stats is None:
+            return decode_s7_frames(frames, first_timestamp, self.frame_filter, reassembler)
+        return self.stats.timed("decode", decode_s7_frames(self.stats.timed("read", frames), first_timestamp,
+                                                           self.frame_filter, reassembler))
+
+    def _decode_chunk(self, path, chunk):
+        """
+        Decodes a chunk with reassembly, after replaying the frames leading to it (chunk["lead"]).
+
+        The chunk yields the PDUs completed by its frames, including those starting in the lead;
+        the PDUs it leaves incomplete belong to the next chunk.
+        """
+        reassembler = TcpReassembler()
+        lead = chunk.get("lead")
+        if lead is None:
+            frames = iter_capture_frames(path, chunk)
+        else:
+            frames = iter_capture_frames(path, dict(lead, frames=lead["frames"] + chunk["frames"]))
+            replay = itertools.islice(frames, lead["frames"])
+            if self.stats is None:
+                replay_tcp_segments(replay, reassembler, self.frame_filter)
+            else:
+                with self.stats.stage("decode"):
+                    replay_tcp_segments(replay, reassembler, self.frame_filter)
+        return self._decode_frames(frames, chunk["first_timestamp"], reassembler)
+
+    def iter_packets(self, path, chunk=None):
+        """
+        Yields the S7COMM packets of a capture file.
+
+        :param path: Path to the pcap/pcapng file.
+        :param chunk: (Optional) Chunk descriptor from scan_capture_chunks (native backend only).
+        :return: Generator of packet dictionaries.
+        """
+        if chunk is not None and self.reassemble:
+            return self._decode_chunk(path, chunk)
+        if chunk is not None or self.backend == "native":
+            return self._decode_frames(iter_capture_frames(path, chunk), None if chunk is None else chunk["first_timestamp"],
+                                       TcpReassembler() if self.reassemble else None)
+
+        packets = iter_s7_packets_pyshark(path, "s7comm" if self.frame_filter is None else self.frame_filter.display_filter())
+        return packets if self.stats is None else self.stats.timed("decode", packets)   # tshark reads and decodes
+
+    def decode(self, frame_number, linktype, timestamp_ns, length, frame):
+        """
+        Decodes the first S7COMM PDU of one frame with the built-in decoder, without reassembly.
+
+        :param frame_number: Frame number in the capture (1-based).
+        :param linktype: Link-layer type of the capture interface.
+        :param timestamp_ns: Capture timestamp in nanoseconds.
+        :param length: Original frame length on the wire.
+        :param frame: Raw frame bytes.
+        :return: Packet dictionary or None if the frame is not S7COMM (or is discarded by the frame filter).
+        """
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp_ns
+        if self.frame_filter is not None and not self.frame_filter.accepts(linktype, frame):
+            return None
+        return decode_s7_frame(frame_number, linktype, timestamp_ns, length, frame, self.first_timestamp)
+
+    def decode_segment(self, frame_number, linktype, timestamp_ns, length, frame):
+        """
+        Decodes one frame with the built-in decoder, reassembling PDUs with the frames pushed before.
+
+        :param frame_number: Frame number in the capture (1-based).
+        :param linktype: Link-layer type of the capture interface.
+        :param timestamp_ns: Capture timestamp in nanoseconds.
+        :param length: Original frame length on the wire.
+        :param frame: Raw frame bytes.
+        :return: List of the packets completed by this frame (several when PDUs are pipelined, none while a PDU is partial).
+        """
+        if self.reassembler is None:
+            packet = self.decode(frame_number, linktype, timestamp_ns, length, frame)
+            return [] if packet is None else [packet]
+
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp_ns
+        if self.frame_filter is not None and not self.frame_filter.accepts(linktype, frame, tpkt=False):
+            return []
+        return decode_s7_segment(frame_number, linktype, timestamp_ns, length, frame, self.first_timestamp,
+                                 self.reassembler)
+
+    def iter_stream(self, src):
+        """
+        Yields the S7COMM packets of pcap/pcapng data read sequentially from a file object (pipe, stdin, socket).
+
+        :param src: Binary file object.
+        :return: Generator of packet dictionaries.
+        """
+        decode = self.decode_segment if self.stats is None else self.stats.wrap("decode", self.decode_segment)
+        frames = iter_file_frames(src) if self.stats is None else self.stats.timed("read", iter_file_frames(src))
+
+        for frame in frames:
+            yield from decode(*frame)
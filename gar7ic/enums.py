@@ -0,0 +1,43 @@
+from enum import Enum
+
+# ===============================
+# ENUMS FOR S7COMM INTERPRETATION
+# ===============================
+
+class S7CommParamFunction(Enum):
+    """ Enumeration of S7COMM parameter functions. """
+    READ = 0x04
+    WRITE = 0x05
+    PLC_STOP = 0x29
+    SETUP_COMMUNICATION = 0xf0
+
+class S7CommHeaderRosctr(Enum):
+    """ Enumeration of S7COMM ROSCTR header types. """
+    JOB = 0x01
+    ACK = 0x02
+    ACK_DATA = 0x03
+
+class S7CommMemoryArea(Enum):
+    """ Enumeration of S7COMM memory areas. """
+    INPUTS = 0x81
+    OUTPUTS = 0x82
+    DATA_BLOCK = 0x84
+
+class S7CommTransportSize(Enum):
+    """ Enumeration of transport sizes in S7COMM. """
+    BIT = 0x01
+    BYTE = 0x02
+    CHAR = 0x03
+    WORD = 0x04
+    INT = 0x05
+
+class S7CommItemResponse(Enum):
+    """ Enumeration of response codes for S7COMM operations. """
+    SUCCESS = 0xFF
+    HARDWARE_FAULT = 0x01
+    OBJECT_DOES_NOT_EXIST = 0x0A
+    ACCESS_NOT_ALLOWED = 0x03
+    ADDRESS_OUT_OF_RANGE = 0x05
+    DATA_TYPE_NOT_SUPPORTED = 0x06
+    DATA_TYPE_INCONSISTENT = 0x07
+    RESERVED = 0x00
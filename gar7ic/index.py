@@ -0,0 +1,273 @@
+import os
+import pickle
+import itertools
+
+from .enums import S7CommParamFunction, S7CommHeaderRosctr, S7CommMemoryArea
+from .capture import CaptureReader, capture_fingerprint, iter_capture_frames, iter_frames_at
+from .config import item_bit_range
+from .correlation import RequestCorrelator
+from .decoder import FrameFilter, decode_s7_frames, decode_s7_pdu
+from .reassembly import TcpReassembler
+
+# ===============================
+# CAPTURE INDEX
+# ===============================
+
+CAPTURE_INDEX_VERSION = 1                                           # Bump when the index content changes
+CAPTURE_INDEX_SUFFIX = ".s7index"
+INDEX_PRUNE_FRAMES = 65536                                          # Frames between two prunings of the frame positions
+
+
+def index_path(capture):
+    """ Sidecar index file of a capture. """
+    return capture + CAPTURE_INDEX_SUFFIX
+
+
+def build_capture_index(path, frame_filter=None):
+    """
+    Decodes a capture once and indexes its S7COMM packets for later filtered queries.
+
+    For every packet (in frame order), the index keeps the reader positions of the frames its PDU
+    came from (and of the frame completing it) and the TCP sequence number of its first byte, so that it can be decoded alone later,
+    plus its timestamp and function code. Request items are indexed by (PLC IP, area, DB)
+    and bit range, and every response is paired with its request, as labelling would.
+
+    :param path: Path to the pcap/pcapng file.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded (default: S7COMM port).
+    :return: Index dictionary (see save_capture_index), with NumPy arrays indexed by packet number.
+    """
+    import numpy as np
+
+    frame_filter = frame_filter or FrameFilter()
+    reader = CaptureReader(path)
+    reassembler = TcpReassembler()
+    positions = {}                                                  # Frame number -> reader position just before it
+
+    def positioned_frames():
+        frames = iter(reader)
+        while True:
+            position = reader.position()
+            frame = next(frames, None)
+            if frame is None:
+                return
+            positions[frame[0]] = position
+            if frame[0] % INDEX_PRUNE_FRAMES == 0:
+                oldest = min(reassembler.oldest_frame() or frame[0], frame[0])
+                while next(iter(positions)) < oldest:               # Frames no PDU can start in any more
+                    del positions[next(iter(positions))]
+            yield frame
+
+    contexts, context_ids = [], {}
+    timestamps, functions, seqs, peers = [], [], [], []
+    frame_starts, frame_numbers, frame_offsets, frame_contexts = [0], [], [], []
+    items = {}                                                      # (ip, area, db) -> [(start_bit, end_bit, packet)]
+    correlator = RequestCorrelator()
+
+    for number, packet in enumerate(decode_s7_frames(positioned_frames(), None, frame_filter, reassembler)):
+        timestamps.append(packet["timestamp_ns"])
+        functions.append(-1 if packet["param_func"] is None else packet["param_func"])
+        seqs.append(packet["pdu_seq"])
+        peers.append(-1)
+
+        # Frames in capture order, as they are decoded again, up to the one that completed the PDU
+        for frame_number in sorted(set(packet["pdu_frames"]) | {packet["frame_number"]}):
+            position = positions[frame_number]
+            if position is None:                                    # First frame of the file
+                frame_offsets.append(-1)
+                frame_contexts.append(0)
+            else:
+                context = {key: value for key, value in position.items() if key not in ("offset", "first_frame", "frames")}
+                context_id = context_ids.setdefault(repr(context), len(contexts))
+                if context_id == len(contexts):
+                    contexts.append(context)
+                frame_offsets.append(position["offset"])
+                frame_contexts.append(context_id)
+            frame_numbers.append(frame_number)
+        frame_starts.append(len(frame_numbers))
+
+        # Requests and responses are paired like label_packet_rows does
+        setup = packet["param_func"] == S7CommParamFunction.SETUP_COMMUNICATION.value
+        if packet["header_rosctr"] == S7CommHeaderRosctr.JOB.value and not setup:
+            correlator.add_request(packet, [number])
+            for item in packet["items"]:
+                memory = item_bit_range(item)
+                if memory is not None:
+                    items.setdefault((packet["dst_ip"], memory[0], memory[1]), []).append((memory[2], memory[3], number))
+        elif packet["header_rosctr"] in (S7CommHeaderRosctr.ACK.value, S7CommHeaderRosctr.ACK_DATA.value) and not setup:
+            for request in correlator.match_response(packet):
+                peers[request], peers[number] = number, request
+
+    first = next(iter_capture_frames(path), None)
+    size = 0 if reader.position() is None else reader.position()["offset"]
+    return {
+        "fingerprint": capture_fingerprint(path, size),
+        "ports": sorted(frame_filter.ports),
+        "plcs": frame_filter.plcs,
+        "first_timestamp": None if first is None else first[2],
+        "contexts": contexts,
+        "timestamps": np.array(timestamps, dtype=np.int64),
+        "functions": np.array(functions, dtype=np.int16),
+        "seqs": np.array(seqs, dtype=np.uint32),
+        "peers": np.array(peers, dtype=np.int32),
+        "frame_starts": np.array(frame_starts, dtype=np.int32),
+        "frame_numbers": np.array(frame_numbers, dtype=np.uint32),
+        "frame_offsets": np.array(frame_offsets, dtype=np.int64),
+        "frame_contexts": np.array(frame_contexts, dtype=np.uint16),
+        "items": {key: tuple(np.array(column, dtype=np.int32) for column in zip(*ranges)) for key, ranges in items.items()}
+    }
+
+
+def save_capture_index(index, path):
+    """
+    Writes a capture index (pickled dictionary of NumPy arrays), atomically.
+
+    :param index: Index from build_capture_index.
+    :param path: Index path (see index_path).
+    """
+    with open(f"{path}.{os.getpid()}.tmp", "wb") as file:
+        pickle.dump(dict(index, version=CAPTURE_INDEX_VERSION), file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def load_capture_index(capture, frame_filter=None):
+    """
+    Reads the sidecar index of a capture, checking that it still describes the capture.
+
+    :param capture: Path to the pcap/pcapng file.
+    :param frame_filter: (Optional) FrameFilter of the query; the index must cover its ports and addresses.
+    :return: Index dictionary, or None if the capture has no index.
+    :raises ValueError: If the index is unreadable, out of date, or built with a narrower filter.
+    """
+    path = index_path(capture)
+    try:
+        with open(path, "rb") as file:
+            index = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as error:
+        raise ValueError(f"Unreadable index '{path}': {error}") from None
+
+    if index.get("version") != CAPTURE_INDEX_VERSION:
+        raise ValueError(f"Index '{path}' was written by another version of GAR7IC.")
+    size = index["fingerprint"][0]
+    if os.path.getsize(capture) != size or capture_fingerprint(capture, size) != index["fingerprint"]:
+        raise ValueError(f"Index '{path}' is out of date.")
+    frame_filter = frame_filter or FrameFilter()
+    if not frame_filter.ports <= set(index["ports"]) or \
+            (index["plcs"] is not None and (frame_filter.plcs is None or not set(frame_filter.plcs) <= set(index["plcs"]))):
+        raise ValueError(f"Index '{path}' was built for other ports or PLCs.")
+    return index
+
+
+# ===============================
+# FILTERED QUERIES
+# ===============================
+
+class RecordFilter:
+    """
+    Keeps the table rows of a time range, of some variables and of some S7COMM functions.
+
+    Criteria left to None keep every row. A filter applies to the rows of any run; with a capture
+    index, select_packets() also narrows decoding down to the packets that can produce such rows.
+    """
+
+    def __init__(self, start=None, end=None, variables=None, functions=None):
+        """
+        :param start: (Optional) Earliest Timestamp_Epoch kept, in seconds.
+        :param end: (Optional) Latest Timestamp_Epoch kept, in seconds.
+        :param variables: (Optional) Names of the variables kept.
+        :param functions: (Optional) S7CommParamFunction names kept.
+        """
+        self.start = start
+        self.end = end
+        self.variables = None if variables is None else set(variables)
+        self.functions = None if functions is None else set(functions)
+
+    def __bool__(self):
+        return any(criterion is not None for criterion in (self.start, self.end, self.variables, self.functions))
+
+    def matches(self, row):
+        """ Tells whether a table row meets every criterion. """
+        return (self.start is None or row["Timestamp_Epoch"] >= self.start) and \
+            (self.end is None or row["Timestamp_Epoch"] <= self.end) and \
+            (self.variables is None or row["Variable_Name"] in self.variables) and \
+            (self.functions is None or row["Param_Function"] in self.functions)
+
+    def filter(self, rows):
+        """ Yields the rows meeting every criterion. """
+        return (row for row in rows if self.matches(row))
+
+
+def select_packets(index, record_filter, lookup):
+    """
+    Finds the indexed packets that can produce rows kept by a filter.
+
+    The selection is a superset (bounds are widened by a microsecond, and every selected request or
+    response brings its counterpart so that it is labelled as in a full run): rows still go through
+    the filter afterwards.
+
+    :param index: Index from build_capture_index.
+    :param record_filter: RecordFilter of the query.
+    :param lookup: Compiled address index from build_fast_lookup (to locate the variables).
+    :return: Sorted NumPy array of packet numbers.
+    """
+    import numpy as np
+
+    timestamps, peers = index["timestamps"], index["peers"]
+    mask = np.ones(len(timestamps), dtype=bool)
+    if record_filter.start is not None:
+        mask &= timestamps >= int(record_filter.start * 1e9) - 1000
+    if record_filter.end is not None:
+        mask &= timestamps <= int(record_filter.end * 1e9) + 1000
+    if record_filter.functions is not None:
+        mask &= np.isin(index["functions"], [S7CommParamFunction[name].value for name in record_filter.functions])
+
+    if record_filter.variables is not None:
+        accesses = np.zeros(len(timestamps), dtype=bool)
+        for var in lookup["variables"].values():
+            ranges = index["items"].get((var["ip"], S7CommMemoryArea[var["area"]].value, var["db_number"]))
+            if var["name"] in record_filter.variables and ranges is not None:
+                starts, ends, packets = ranges
+                bit = var["byte"] * 8 + var["bit"]
+                accesses[packets[(starts <= bit) & (ends > bit)]] = True
+        responses = peers[accesses]
+        accesses[responses[responses >= 0]] = True
+        mask &= accesses
+
+    selected = np.flatnonzero(mask)
+    counterparts = peers[selected]
+    return np.union1d(selected, counterparts[counterparts >= 0])
+
+
+def iter_indexed_packets(capture, index, packets, frame_filter=None):
+    """
+    Decodes chosen packets of an indexed capture, reading only the frames they came from.
+
+    :param capture: Path to the pcap/pcapng file.
+    :param index: Index from build_capture_index / load_capture_index.
+    :param packets: Packet numbers in increasing order (see select_packets).
+    :param frame_filter: (Optional) FrameFilter of the query, applied to the frames read.
+    :return: Generator of packet dictionaries, in frame order.
+    """
+    starts, numbers, offsets, frame_contexts = index["frame_starts"], index["frame_numbers"], index["frame_offsets"], \
+        index["frame_contexts"]
+    contexts, seqs, first_timestamp = index["contexts"], index["seqs"], index["first_timestamp"]
+
+    def positions():
+        for packet in packets:
+            for ref in range(starts[packet], starts[packet + 1]):
+                if offsets[ref] < 0:
+                    yield None
+                else:
+                    yield dict(contexts[frame_contexts[ref]], offset=int(offsets[ref]), first_frame=int(numbers[ref]))
+
+    frames = iter_frames_at(capture, positions())
+    for packet in packets:
+        pdu_frames = list(itertools.islice(frames, int(starts[packet + 1] - starts[packet])))
+        if None in pdu_frames:
+            raise ValueError(f"'{capture}' does not match its index.")
+        if frame_filter is not None and not all(frame_filter.accepts(frame[1], frame[4], tpkt=False) for frame in pdu_frames):
+            continue
+        decoded = decode_s7_pdu(pdu_frames, int(seqs[packet]), first_timestamp)
+        if decoded is not None:
+            yield decoded
@@ -0,0 +1,312 @@
+from .enums import S7CommParamFunction, S7CommHeaderRosctr, S7CommMemoryArea, S7CommTransportSize, S7CommItemResponse
+from .decoder import Decoder, S7RawValue, new_s7_item
+from .correlation import RequestCorrelator
+from .config import compile_config, resolve_item_variables
+
+# ===============================
+# LABELLING
+# ===============================
+
+def enum_name(enum_class, value):
+    """
+    Returns the enum member name of a decoded field, or None when absent or unrecognised.
+
+    :param enum_class: S7COMM enumeration to look the value up in.
+    :param value: Integer value decoded from the packet (or None).
+    :return: Member name or None.
+    """
+    if value is None:
+        return None
+    try:
+        return enum_class(value).name
+    except ValueError:
+        return None
+
+
+UNKNOWN_VARIABLE = [({"name": "Unknown variable."}, 0, 0)]
+
+
+def is_unmatched_response(packet, correlator):
+    """
+    Tells whether a packet is a response whose request is not pending in a correlator.
+
+    :param packet: Decoded packet dictionary.
+    :param correlator: RequestCorrelator holding the pending requests.
+    :return: True for ACK/ACK_DATA packets without a pending request.
+    """
+    return packet["header_rosctr"] in (S7CommHeaderRosctr.ACK.value, S7CommHeaderRosctr.ACK_DATA.value) and \
+        not correlator.has_request(packet)
+
+
+def label_packet_comments(packet, lookup, correlator):
+    """
+    Labels one S7COMM packet with the names of the variables it accesses.
+
+    :param packet: Decoded packet dictionary.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param correlator: RequestCorrelator pairing responses with their requests, updated in place.
+    :return: List of (frame_number, comment), one comment per item and variable.
+    """
+    # Extract packet information (packet number and ip dst)
+    packet_number = packet["frame_number"]
+    packet_ip_dst = packet["dst_ip"]
+
+    # Extract ROSCTR to identify communication direction
+    header_rosctr = packet["header_rosctr"]
+    param_func = packet["param_func"]
+
+    # JOB (request)
+    if header_rosctr == S7CommHeaderRosctr.JOB.value:
+
+        if param_func == S7CommParamFunction.SETUP_COMMUNICATION.value:
+            return []
+
+        if packet_ip_dst not in lookup["plcs"]:
+            return [(packet_number, "Unknown S7COMM device.")]
+
+        # Variables of every request item, paired by index with the response items
+        requested = [resolve_item_variables(packet_ip_dst, item, lookup) for item in packet["items"]]
+        correlator.add_request(packet, requested)
+
+    # ACK_DATA (response with data)
+    elif header_rosctr == S7CommHeaderRosctr.ACK_DATA.value:
+
+        if param_func == S7CommParamFunction.SETUP_COMMUNICATION.value:
+            return []
+
+        requested = correlator.match_response(packet)
+
+    else:
+        return [(packet_number, "Unknown S7COMM device.")]
+
+    return [(packet_number, var["name"]) for variables in requested for var, _, _ in variables or UNKNOWN_VARIABLE]
+
+
+def label_packet_rows(packet, lookup, correlator):
+    """
+    Labels one S7COMM packet and builds one table row per item and accessed variable.
+
+    :param packet: Decoded packet dictionary.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param correlator: RequestCorrelator pairing responses with their requests, updated in place.
+    :return: List of row dictionaries keyed by TABLE_COLUMNS, Data_Value still raw (see convert_row_values).
+    """
+    rows = []
+
+    # ======= S7COMM information =======
+    # === HEADER ===
+    header_rosctr = enum_name(S7CommHeaderRosctr, packet["header_rosctr"])
+    header_pduref = packet["header_pduref"]
+
+    # === PARAMETER ===
+    param_func = enum_name(S7CommParamFunction, packet["param_func"])
+    items = packet["items"]
+    requested = []
+
+    if header_rosctr == S7CommHeaderRosctr.JOB.name:
+        if param_func != S7CommParamFunction.SETUP_COMMUNICATION.name:
+            requested = [resolve_item_variables(packet["dst_ip"], item, lookup) for item in items]
+            correlator.add_request(packet, requested)
+        has_value = param_func == S7CommParamFunction.WRITE.name
+
+    else:
+        if header_rosctr in (S7CommHeaderRosctr.ACK.name, S7CommHeaderRosctr.ACK_DATA.name) and \
+                param_func != S7CommParamFunction.SETUP_COMMUNICATION.name:
+            requested = correlator.match_response(packet)
+        has_value = param_func == S7CommParamFunction.READ.name
+
+    packet_row = {"Frame_Number": packet["frame_number"],
+                  "Timestamp": packet["timestamp"],
+                  "Timestamp_Epoch": float(packet["timestamp_epoch"]),
+                  "Timestamp_Shift": float(packet["timestamp_shift"]),
+                  "Source_IP": packet["src_ip"],
+                  "Destination_IP": packet["dst_ip"],
+                  "Length": packet["length"],
+                  "Header_Rosctr": header_rosctr,
+                  "Header_PduRef": header_pduref,
+                  "Param_Function": param_func,
+                  "Param_Item_Count": packet["param_itemcount"]}
+
+    for index, item in enumerate(items or [new_s7_item()]):
+
+        # === ITEM ===
+        param_item_address = item["param_item_address"]
+        row = dict(packet_row,
+                   Param_Item_Transport_Size=enum_name(S7CommTransportSize, item["param_item_transp_size"]),
+                   Param_Item_Length=item["param_item_length"],
+                   Param_Item_DB=item["param_item_db"],
+                   Param_Item_Area=enum_name(S7CommMemoryArea, item["param_item_area"]),
+                   Param_Address_Byte=None if param_item_address is None else param_item_address // 8,
+                   Param_Address_Bit=None if param_item_address is None else param_item_address % 8,
+                   Variable_Name=None,
+                   Data_Type=None,
+                   Data_Value=None,
+                   Data_Return_Code=enum_name(S7CommItemResponse, item["data_returncode"]))
+
+        variables = requested[index] if items and index < len(requested) else []
+        if not variables:
+            rows.append(row)
+            continue
+
+        # === DATA ===
+        resp_data = item["resp_data"] if has_value else None
+        for var, offset, bit_index in variables:
+            data_value = None
+            if resp_data is not None and offset < len(resp_data):
+                data_value = S7RawValue(resp_data[offset:], bit_index)      # Converted in batches by convert_row_values
+            rows.append(dict(row, Variable_Name=var["name"], Data_Type=var["type"], Data_Value=data_value))
+
+    return rows
+
+
+VALUE_BATCH_ROWS = 8192                                             # Rows whose values are converted together
+
+
+def iter_pcap_comments(packets, lookup, correlator=None, stats=None, rules=None):
+    """
+    Labels S7COMM packets with the names of the variables they access.
+
+    :param packets: Iterable of decoded packet dictionaries, in frame order.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param correlator: (Optional) RequestCorrelator to use, e.g. to read its counters afterwards.
+    :param stats: (Optional) Stats charged with the labelling time and packet counters.
+    :param rules: (Optional) RuleEngine attached to correlator; its alerts are added as comments.
+    :return: Generator of (frame_number, comment), one comment per item and variable (then per alert).
+    """
+    if correlator is None:
+        correlator = RequestCorrelator()                            # Stocks requests before receiving their response
+    label = label_packet_comments if stats is None else stats.wrap_label(label_packet_comments)
+
+    if rules is None:
+        for packet in packets:
+            yield from label(packet, lookup, correlator)
+        return
+
+    comments = []
+    for packet in packets:
+        comments.extend(label(packet, lookup, correlator))
+        if len(comments) >= VALUE_BATCH_ROWS:
+            yield from rules.merge_comments(comments)
+            comments = []
+
+    yield from rules.merge_comments(comments)
+
+
+def iter_table_rows(packets, lookup, correlator=None, stats=None, rules=None):
+    """
+    Labels S7COMM packets and yields one table row per item and accessed variable.
+
+    :param packets: Iterable of decoded packet dictionaries, in frame order.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param correlator: (Optional) RequestCorrelator to use, e.g. to read its counters afterwards.
+    :param stats: (Optional) Stats charged with the labelling and conversion times and packet counters.
+    :param rules: (Optional) RuleEngine attached to correlator; its alerts are collected with every batch of rows.
+    :return: Generator of row dictionaries keyed by TABLE_COLUMNS.
+    """
+    from .values import convert_row_values                          # NumPy is only loaded when values are converted
+
+    if correlator is None:
+        correlator = RequestCorrelator()                            # Stocks requests before receiving their response
+    label = label_packet_rows
+    if stats is not None:
+        label, convert_row_values = stats.wrap_label(label), stats.wrap("convert", convert_row_values)
+
+    rows = []
+    for packet in packets:
+        rows.extend(label(packet, lookup, correlator))
+        if len(rows) >= VALUE_BATCH_ROWS:
+            if rules is not None:
+                rules.collect()
+            yield from convert_row_values(rows)
+            rows = []
+
+    if rules is not None:
+        rules.collect()
+    yield from convert_row_values(rows)
+
+
+class Labeler:
+    """
+    Labels decoded S7COMM packets with the variables of a PLC configuration.
+
+    A Labeler follows one capture or stream: it keeps the pending requests, and the correlation
+    counters, from one call to the next. With a RuleEngine, the labelled packets are also checked
+    against the rules of the configuration.
+    """
+
+    def __init__(self, config, correlator=None, stats=None, rules=None):
+        """
+        :param config: Path to a YAML configuration, parsed configuration, or index from build_fast_lookup.
+        :param correlator: (Optional) RequestCorrelator to use instead of a new one.
+        :param stats: (Optional) Stats charged with the labelling, correlation and conversion times.
+        :param rules: (Optional) RuleEngine built on the same compiled index, raising alerts as packets are labelled.
+        """
+        self.lookup = compile_config(config)
+        self.correlator = RequestCorrelator() if correlator is None else correlator
+        self.rules = rules
+        self._stats = stats
+        if rules is not None:
+            rules.attach(self.correlator)
+        self._label_rows, self._label_comments = label_packet_rows, label_packet_comments
+
+        if stats is not None:
+            stats.correlator = self.correlator
+            stats.instrument(self.correlator)
+            self._label_rows, self._label_comments = stats.wrap_label(label_packet_rows), stats.wrap_label(label_packet_comments)
+
+    def rows(self, packet):
+        """
+        Labels one packet as table rows, with converted values.
+
+        :param packet: Decoded packet dictionary.
+        :return: List of row dictionaries keyed by TABLE_COLUMNS.
+        """
+        from .values import convert_row_values
+        rows = self._label_rows(packet, self.lookup, self.correlator)
+        if self.rules is not None:
+            self.rules.collect()
+        return convert_row_values(rows) if self._stats is None else self._stats.wrap("convert", convert_row_values)(rows)
+
+    def comments(self, packet):
+        """
+        Labels one packet with the names of the variables it accesses (and the alerts it raises).
+
+        :param packet: Decoded packet dictionary.
+        :return: List of (frame_number, comment).
+        """
+        comments = self._label_comments(packet, self.lookup, self.correlator)
+        return comments if self.rules is None else self.rules.merge_comments(comments)
+
+    def iter_rows(self, packets):
+        """ Labels packets in frame order and yields table rows (values converted in batches). """
+        return iter_table_rows(packets, self.lookup, self.correlator, self._stats, self.rules)
+
+    def iter_comments(self, packets):
+        """ Labels packets in frame order and yields (frame_number, comment). """
+        return iter_pcap_comments(packets, self.lookup, self.correlator, self._stats, self.rules)
+
+    def stats(self):
+        """ Request/response correlation counters (see RequestCorrelator.stats). """
+        return self.correlator.stats()
+
+
+def iter_records(path, config, backend="native", workers=1, frame_filter=None, reassemble=True):
+    """
+    Decodes and labels a capture file, yielding one record per S7COMM item and accessed variable.
+
+    :param path: Path to the pcap/pcapng file.
+    :param config: Path to a YAML configuration, parsed configuration, or index from build_fast_lookup.
+    :param backend: 'native' (built-in decoder) or 'pyshark' (tshark dissection).
+    :param workers: Number of worker processes (native backend only).
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :return: Generator of row dictionaries keyed by TABLE_COLUMNS.
+    """
+    labeler = Labeler(config)
+
+    if workers > 1:
+        from .parallel import iter_labels_parallel
+        yield from iter_labels_parallel(path, labeler.lookup, label_packet_rows, workers, correlator=labeler.correlator,
+                                       frame_filter=frame_filter, reassemble=reassemble)
+    else:
+        yield from labeler.iter_rows(Decoder(backend, frame_filter=frame_filter, reassemble=reassemble).iter_packets(path))
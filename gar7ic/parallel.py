@@ -0,0 +1,121 @@
+import itertools
+import collections
+import concurrent.futures
+
+from .capture import scan_capture_chunks
+from .correlation import RequestCorrelator
+from .decoder import Decoder
+from .labeling import is_unmatched_response, label_packet_rows
+from .reassembly import REASSEMBLY_LEAD_FRAMES
+from .stats import Stats
+from .values import convert_row_values
+
+# ===============================
+# PARALLEL PROCESSING
+# ===============================
+
+PARALLEL_CHUNK_FRAMES = 50_000                                      # Frames decoded by a worker per task
+
+_worker_lookup = None
+
+
+def _init_worker(lookup):
+    """ Process pool initializer: keeps one copy of the address index per worker. """
+    global _worker_lookup
+    _worker_lookup = lookup
+
+
+def _label_chunk(path, chunk, label, profile=False, frame_filter=None, reassemble=True):
+    """
+    Decodes and labels one chunk of a capture in a worker process.
+
+    Responses whose request lies in an earlier chunk cannot be labelled here; they are returned
+    undecided so that the parent can resolve them with the requests left open by previous chunks.
+
+    :param path: Path to the capture file.
+    :param chunk: Chunk descriptor from scan_capture_chunks.
+    :param label: label_packet_rows or label_packet_comments.
+    :param profile: Measure the chunk's stage times and counters.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :return: Tuple (results, correlator, stats). results is a list of (unmatched packet or None, labels);
+        correlator holds the chunk's counters and the requests it left open; stats is a Stats or None.
+    """
+    correlator = RequestCorrelator()
+    stats = Stats() if profile else None
+    table_rows, convert = label is label_packet_rows, convert_row_values
+    if stats is not None:
+        label, convert = stats.wrap_label(label), stats.wrap("convert", convert_row_values)
+        stats.instrument(correlator)
+        stats.switch("label")                                       # Loop bookkeeping is labelling work
+    results = []
+
+    for packet in Decoder(stats=stats, frame_filter=frame_filter, reassemble=reassemble).iter_packets(path, chunk):
+        if is_unmatched_response(packet, correlator):
+            results.append((packet, None))
+        else:
+            results.append((None, label(packet, _worker_lookup, correlator)))
+
+    if table_rows:
+        convert([row for _, rows in results if rows for row in rows])
+
+    if stats is not None:
+        stats.release(correlator)                                   # Sent back to the parent process
+        stats.switch("label")                                       # Close the last stage before pickling
+    return results, correlator, stats
+
+
+def iter_labels_parallel(path, lookup, label, workers, chunk_frames=PARALLEL_CHUNK_FRAMES, correlator=None, stats=None,
+                         frame_filter=None, reassemble=True):
+    """
+    Decodes and labels a capture with a pool of worker processes, yielding labels in frame order.
+
+    At most two chunks per worker are in flight, so memory stays bounded whatever the capture size.
+    Request/response pairing across chunk boundaries is reconciled in the parent, in frame order.
+
+    :param path: Path to the capture file.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param label: label_packet_rows (table mode) or label_packet_comments (pcap mode).
+    :param workers: Number of worker processes.
+    :param chunk_frames: Number of frames per chunk.
+    :param correlator: (Optional) RequestCorrelator accumulating the counters of every chunk.
+    :param stats: (Optional) Stats accumulating the stage times and counters of every chunk.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :return: Generator of rows or (frame_number, comment), as produced by label.
+    """
+    chunks = iter(scan_capture_chunks(path, chunk_frames, REASSEMBLY_LEAD_FRAMES if reassemble else 0))
+    if correlator is None:
+        correlator = RequestCorrelator()                            # Requests still open at the end of the merged chunks
+
+    profile = stats is not None
+    table_rows, parent_label, convert = label is label_packet_rows, label, convert_row_values
+    if profile:
+        parent_label, convert = stats.wrap_label(label), stats.wrap("convert", convert_row_values)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(lookup,)) as executor:
+        pending = collections.deque(executor.submit(_label_chunk, path, chunk, label, profile, frame_filter, reassemble)
+                                    for chunk in itertools.islice(chunks, workers * 2))
+
+        while pending:
+            future = pending.popleft()
+            if profile:
+                with stats.stage("wait"):
+                    results, chunk_correlator, chunk_stats = future.result()
+                stats.merge(chunk_stats)
+            else:
+                results, chunk_correlator, _ = future.result()
+
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(executor.submit(_label_chunk, path, chunk, label, profile, frame_filter, reassemble))
+
+            for packet, labels in results:
+                if packet is not None:
+                    labels = parent_label(packet, lookup, correlator)
+                    if table_rows:
+                        convert(labels)
+                yield from labels
+
+            correlator.merge(chunk_correlator)
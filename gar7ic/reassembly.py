@@ -0,0 +1,224 @@
+import zlib
+
+# ===============================
+# TCP STREAM REASSEMBLY
+# ===============================
+
+TCP_FIN, TCP_SYN, TCP_RST = 0x01, 0x02, 0x04
+
+SEQ_MASK = 0xffffffff
+REASSEMBLY_MAX_BUFFERED = 262_144                                   # Out-of-order bytes kept per direction before a gap is given up
+REASSEMBLY_MAX_SEGMENTS = 64                                        # Out-of-order segments kept per direction before a gap is given up
+REASSEMBLY_LEAD_FRAMES = 5_000                                      # Frames replayed before a chunk to resume its connections
+
+COTP_PDU_TYPES = frozenset((0x10, 0x20, 0x50, 0x60, 0x70, 0x80, 0xc0, 0xd0, 0xe0, 0xf0))
+
+
+def is_tpkt_start(data):
+    """
+    Tells whether TCP data starts with a TPKT header followed by a COTP header.
+
+    Used to find PDU boundaries when joining a connection midway (start of a capture or of a chunk,
+    after lost data), where the data preceding the first header cannot be decoded anyway.
+
+    :param data: TCP payload bytes.
+    :return: True if data looks like the start of a TPKT PDU.
+    """
+    if len(data) < 7 or data[0] != 0x03 or data[1] != 0x00:
+        return False
+    length = (data[2] << 8) | data[3]
+    return length >= 7 and data[4] + 5 <= length and data[5] & 0xf0 in COTP_PDU_TYPES
+
+
+class _TcpDirection:
+    """ Reassembly state of one direction of a TCP connection. """
+
+    def __init__(self, next_seq=None):
+        self.next_seq = next_seq                                    # Next expected sequence number (None: not synchronized)
+        self.buffer = bytearray()                                   # Start of an incomplete PDU, reused for the whole connection
+        self.frames = []                                            # Frames the buffered bytes came from
+        self.segments = {}                                          # Sequence number -> (payload, frame number) received early
+        self.buffered = 0                                           # Bytes held in segments
+        self.last = None                                            # (seq, CRC-32) of the last in-order segment
+
+    def reset(self, next_seq=None):
+        """ Forgets the data of the direction, keeping its buffer for reuse. """
+        self.next_seq = next_seq
+        self.buffer.clear()
+        self.frames = []
+        self.segments = {}
+        self.buffered = 0
+        self.last = None
+
+
+class TcpReassembler:
+    """
+    Rebuilds the TPKT PDUs carried by TCP connections, whatever their segmentation.
+
+    Each direction of a connection keeps the sequence number it expects next. In-order data is
+    cut along TPKT lengths: complete PDUs inside one segment are returned as slices of the
+    segment without any copy (several pipelined PDUs per segment included), and only the start
+    of a PDU spanning segments is kept, in one bytearray reused for the life of the connection
+    (at most one TPKT PDU, 64 KiB). Retransmitted bytes are dropped, segments arriving early wait
+    for the missing data, and a gap never filled (packet lost by the capture) is given up once
+    max_buffered bytes or max_segments segments wait behind it. Directions joined midway, or whose data stops making sense
+    as TPKT, resynchronize on the next segment starting with a TPKT header.
+    """
+
+    def __init__(self, max_buffered=REASSEMBLY_MAX_BUFFERED, max_segments=REASSEMBLY_MAX_SEGMENTS):
+        """
+        :param max_buffered: Out-of-order bytes kept per direction while waiting for missing data.
+        :param max_segments: Out-of-order segments kept per direction while waiting for missing data.
+        """
+        self.max_buffered = max_buffered
+        self.max_segments = max_segments
+        self.directions = {}                                        # (src_ip, src_port, dst_ip, dst_port) -> _TcpDirection
+
+    def synchronize(self, key, seq):
+        """
+        Takes up a connection direction at a known PDU boundary, e.g. to decode one PDU out of a capture.
+
+        :param key: Connection direction (src_ip, src_port, dst_ip, dst_port).
+        :param seq: Sequence number of the first byte of a PDU; earlier bytes are ignored.
+        """
+        self.directions[key] = _TcpDirection(seq)
+
+    def oldest_frame(self):
+        """ Earliest frame whose data is still held (start of an incomplete PDU or early segment), or None. """
+        frames = [frame for direction in self.directions.values() for frame in direction.frames[:1]]
+        frames.extend(frame for direction in self.directions.values() for _, frame in direction.segments.values())
+        return min(frames, default=None)
+
+    def feed(self, key, seq, flags, payload, frame_number):
+        """
+        Adds a TCP segment and returns the PDUs it completes.
+
+        :param key: Connection direction (src_ip, src_port, dst_ip, dst_port).
+        :param seq: TCP sequence number of the segment.
+        :param flags: TCP flags byte.
+        :param payload: TCP payload (bytes or memoryview; only kept when part of an incomplete PDU).
+        :param frame_number: Frame carrying the segment.
+        :return: List of (pdu, frame numbers, seq) in stream order; frame numbers are those the PDU's bytes came from,
+            seq the sequence number of its first byte.
+        """
+        if flags & (TCP_SYN | TCP_RST):
+            if flags & TCP_RST:
+                self.directions.pop(key, None)
+            elif key in self.directions:
+                self.directions[key].reset((seq + 1) & SEQ_MASK)    # Data starts after the SYN
+            else:
+                self.directions[key] = _TcpDirection((seq + 1) & SEQ_MASK)
+            return []
+
+        direction = self.directions.get(key)
+        if direction is None:
+            direction = self.directions[key] = _TcpDirection()
+
+        pdus = []
+        if payload:
+            self._add(direction, seq, payload, frame_number, pdus)
+        if flags & TCP_FIN:
+            del self.directions[key]                                # An incomplete PDU is never completed
+        return pdus
+
+    def _add(self, direction, seq, payload, frame_number, pdus):
+        """ Adds the payload of a segment to a direction, appending the completed PDUs to pdus. """
+        if direction.next_seq is None:
+            if not is_tpkt_start(payload):
+                return                                              # Middle of a PDU whose start was not seen
+            direction.next_seq = seq
+
+        offset = (seq - direction.next_seq) & SEQ_MASK
+        if offset >= 0x80000000 and direction.last is not None and direction.last[0] == seq and \
+                direction.last[1] != zlib.crc32(payload) and is_tpkt_start(payload):
+            direction.reset(seq)                                    # Sequence numbers not maintained (crafted capture)
+            offset = 0
+        elif offset >= 0x80000000:                                  # Starts before the expected data: retransmission
+            overlap = 0x100000000 - offset
+            if overlap >= len(payload):
+                return
+            payload, offset = payload[overlap:], 0
+
+        if offset:                                                  # Data missing before this segment
+            if direction.buffered + len(payload) <= self.max_buffered and len(direction.segments) < self.max_segments:
+                if seq not in direction.segments:
+                    direction.segments[seq] = (bytes(payload), frame_number)
+                    direction.buffered += len(payload)
+                return
+            self._skip_gap(direction, seq, payload, frame_number, pdus)
+            return
+
+        direction.last = (seq, zlib.crc32(payload))
+        self._append(direction, payload, frame_number, pdus)
+        while direction.segments and direction.next_seq is not None:
+            if not self._take_segment(direction, pdus):
+                break
+
+    def _take_segment(self, direction, pdus):
+        """ Appends the earliest waiting segment if it is now contiguous; returns False when data is still missing. """
+        for seq in direction.segments:
+            offset = (seq - direction.next_seq) & SEQ_MASK
+            if offset == 0 or offset >= 0x80000000:
+                payload, frame_number = direction.segments.pop(seq)
+                direction.buffered -= len(payload)
+                if offset:
+                    overlap = 0x100000000 - offset
+                    if overlap >= len(payload):
+                        return True                                 # Entirely received meanwhile
+                    payload = payload[overlap:]
+                self._append(direction, payload, frame_number, pdus)
+                return True
+        return False
+
+    def _skip_gap(self, direction, seq, payload, frame_number, pdus):
+        """ Gives up data that never arrived: drops the incomplete PDU and resynchronizes on the waiting segments. """
+        segments = sorted(direction.segments.items(), key=lambda item: (item[0] - direction.next_seq) & SEQ_MASK)
+        segments.append((seq, (payload, frame_number)))
+        direction.reset()
+        for seq, (payload, frame_number) in segments:
+            self._add(direction, seq, payload, frame_number, pdus)
+
+    def _append(self, direction, payload, frame_number, pdus):
+        """ Appends contiguous data to a direction and cuts the complete TPKT PDUs out of it. """
+        start = direction.next_seq                                  # Sequence number of payload[0]
+        direction.next_seq = (start + len(payload)) & SEQ_MASK
+        buffer = direction.buffer
+
+        if not buffer:
+            # Usual case: the segment starts a PDU; complete PDUs are sliced out of it without copying
+            offset, size = 0, len(payload)
+            while offset + 4 <= size:
+                length = (payload[offset + 2] << 8) | payload[offset + 3]
+                if payload[offset] != 0x03 or length < 7:
+                    self._desynchronize(direction)
+                    return
+                if offset + length > size:
+                    break
+                pdus.append((payload[offset:offset + length], (frame_number,), (start + offset) & SEQ_MASK))
+                offset += length
+            if offset < size:
+                buffer += payload[offset:]
+                direction.frames = [frame_number]
+            return
+
+        start = (start - len(buffer)) & SEQ_MASK                    # Sequence number of buffer[0]
+        buffer += payload
+        direction.frames.append(frame_number)
+        offset = 0
+        while len(buffer) - offset >= 4:
+            length = (buffer[offset + 2] << 8) | buffer[offset + 3]
+            if buffer[offset] != 0x03 or length < 7:
+                self._desynchronize(direction)
+                return
+            if offset + length > len(buffer):
+                break
+            pdus.append((bytes(buffer[offset:offset + length]), tuple(direction.frames), (start + offset) & SEQ_MASK))
+            direction.frames = [frame_number]                       # Later PDUs start in the last segment
+            offset += length
+        del buffer[:offset]
+        if not buffer:
+            direction.frames = []
+
+    def _desynchronize(self, direction):
+        """ Drops the data of a direction that is not TPKT, to resynchronize on the next TPKT header. """
+        direction.reset()
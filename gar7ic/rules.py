@@ -0,0 +1,276 @@
+import json
+import operator
+import collections
+
+from .config import RULE_NUMERIC_TYPES
+from .enums import S7CommParamFunction, S7CommHeaderRosctr
+
+# ===============================
+# ALERT RULES
+# ===============================
+
+# Alert kinds: WRITE to a read_only variable, value outside its min/max, PLC_STOP from a host missing
+# from stop_from, more WRITE jobs to a PLC within WRITE_BURST_WINDOW_NS than its max_writes_per_s
+ALERT_RULES = ("read_only_write", "out_of_range", "unexpected_stop", "write_burst")
+
+WRITE_BURST_WINDOW_NS = 1_000_000_000                               # Sliding window of the write rate
+
+_READ, _WRITE, _PLC_STOP = S7CommParamFunction.READ.value, S7CommParamFunction.WRITE.value, S7CommParamFunction.PLC_STOP.value
+_ACK_DATA = S7CommHeaderRosctr.ACK_DATA.value
+
+
+def alert_comment(alert):
+    """ Packet comment of an alert. """
+    return f"ALERT {alert['rule']}: {alert['message']}"
+
+
+class RuleEngine:
+    """
+    Checks labelled S7COMM traffic against the rules of a configuration and raises alerts.
+
+    The rules compiled with the address index (build_fast_lookup) are laid out in NumPy tables
+    following the address order of lookup["ranges"], one row per variable of every (PLC, area,
+    DB) that has bounded variables: byte and bit address, type, min and max. The engine is attached
+    to the correlator of the labelling (see attach), which hands it every request and matched
+    response with their resolved variables. Packets no rule can concern are dismissed on their
+    function and PLC address; the items of the others are queued as (data, first table row, number
+    of variables), and collect() decodes and compares every queued value at once, typically once
+    per batch of rows, so no variable is looked at one by one in Python.
+    """
+
+    def __init__(self, lookup, path=None):
+        """
+        :param lookup: Compiled address index from build_fast_lookup.
+        :param path: (Optional) Alert file, written as JSON lines on every collect().
+        """
+        import numpy as np
+
+        rules = lookup.get("rules") or {"plcs": {}, "variables": {}}
+        self.plcs = lookup["plcs"]
+        self.path = path
+        self.read_only = {id(lookup["variables"][key]) for key, rule in rules["variables"].items() if rule["read_only"]}
+        bounded = {key: rule for key, rule in rules["variables"].items()
+                   if rule["min"] > float("-inf") or rule["max"] < float("inf")}
+
+        # Range table: id(variable) -> row, rows of each (ip, area, db) contiguous and in address order
+        self.rows = {}
+        names, addresses, types, lows, highs = [], [], [], [], []
+        for table in sorted({key[:3] for key in bounded}):
+            for var in lookup["ranges"][table][1]:
+                rule = bounded.get(table + (var["byte"], var["bit"]))
+                self.rows[id(var)] = len(names)
+                names.append(var["name"])
+                addresses.append((var["byte"], var["bit"]))
+                types.append(-1 if rule is None else RULE_NUMERIC_TYPES.index(var["type"]))
+                lows.append(float("-inf") if rule is None else rule["min"])
+                highs.append(float("inf") if rule is None else rule["max"])
+        self.names = names
+        self.bytes = np.array([byte for byte, _ in addresses], dtype=np.int64)
+        self.bits = np.array([bit for _, bit in addresses], dtype=np.uint8)
+        self.types = np.array(types, dtype=np.int8)
+        self.lows, self.highs = np.array(lows), np.array(highs)
+
+        self.bounded_plcs = {key[0] for key in bounded}
+        self.guarded = self.bounded_plcs | {key[0] for key, rule in rules["variables"].items() if rule["read_only"]}
+        self.stop_from = {ip: rule["stop_from"] for ip, rule in rules["plcs"].items() if rule["stop_from"] is not None}
+        self.write_limits = {ip: rule["max_writes_per_s"] for ip, rule in rules["plcs"].items()
+                             if rule["max_writes_per_s"] is not None}
+        self.writes = {}                                            # PLC IP -> timestamps of the WRITE jobs of the window
+        self.bursting = set()                                       # PLCs above their write limit
+        self.counts = collections.Counter()                         # Rule -> alerts raised
+        self._alerts = []                                           # Alerts raised since the last collect()
+        self._packets = []                                          # (packet, requested, plc, client, write) to compare
+        self._file = None if path is None else open(path, "w", encoding="utf-8")
+
+    def __bool__(self):
+        return bool(self.read_only or self.rows or self.stop_from or self.write_limits)
+
+    def attach(self, correlator):
+        """ Makes the requests and matched responses of a correlator go through the rules. """
+        add_request, match_response = correlator.add_request, correlator.match_response
+
+        def checked_add_request(packet, requested):
+            add_request(packet, requested)
+            if packet["param_func"] == _WRITE or packet["param_func"] == _PLC_STOP:
+                self.check_request(packet, requested)
+
+        def checked_match_response(packet):
+            requested = match_response(packet)
+            if requested and packet["src_ip"] in self.bounded_plcs and packet["param_func"] == _READ and \
+                    packet["header_rosctr"] == _ACK_DATA:
+                self._packets.append((packet, requested, packet["src_ip"], packet["dst_ip"], False))
+            return requested
+
+        correlator.add_request, correlator.match_response = checked_add_request, checked_match_response
+
+    # === CHECKS ===
+
+    def _alert(self, packet, rule, plc, client, message, variable=None, value=None):
+        """ Builds an alert about a packet. """
+        return {"frame_number": packet["frame_number"], "timestamp": float(packet["timestamp_epoch"]), "rule": rule,
+                "plc": plc, "plc_name": self.plcs.get(plc), "client": client, "variable": variable, "value": value,
+                "message": message}
+
+    def check_request(self, packet, requested):
+        """
+        Checks a WRITE or PLC_STOP job.
+
+        :param packet: Decoded JOB packet dictionary.
+        :param requested: Resolved variables of each request item (see resolve_item_variables).
+        """
+        plc, client = packet["dst_ip"], packet["src_ip"]
+        if packet["param_func"] == _PLC_STOP:
+            allowed = self.stop_from.get(plc)
+            if allowed is not None and client not in allowed:
+                self._alerts.append(self._alert(packet, "unexpected_stop", plc, client, f"PLC_STOP from unexpected host {client}"))
+            return
+
+        limit = self.write_limits.get(plc)
+        if limit is not None:
+            window = self.writes.get(plc)
+            if window is None:
+                window = self.writes[plc] = collections.deque()
+            timestamp = packet["timestamp_ns"]
+            window.append(timestamp)
+            while timestamp - window[0] >= WRITE_BURST_WINDOW_NS:
+                window.popleft()
+            if len(window) <= limit:
+                self.bursting.discard(plc)
+            elif plc not in self.bursting:                          # One alert per burst
+                self.bursting.add(plc)
+                self._alerts.append(self._alert(packet, "write_burst", plc, client,
+                                                f"{len(window)} WRITE jobs within 1 s (limit {limit}), last from {client}"))
+
+        if plc in self.guarded:
+            self.check_values(packet, requested, plc, client, write=True)
+
+    def check_values(self, packet, requested, plc, client, write):
+        """
+        Checks the variables written by a WRITE job or read by a READ response: read-only variables
+        are checked at once, the packet is queued for the comparison of its values with their bounds.
+
+        :param packet: Decoded packet dictionary carrying the values.
+        :param requested: Resolved variables of each request item.
+        :param plc: PLC IP address.
+        :param client: Client IP address.
+        :param write: True for a WRITE job, False for a READ response.
+        """
+        if write and self.read_only:
+            for variables in requested:
+                for var, _, _ in variables:
+                    if id(var) in self.read_only:
+                        self._alerts.append(self._alert(packet, "read_only_write", plc, client,
+                                                        f"WRITE to read-only variable '{var['name']}' from {client}",
+                                                        var["name"]))
+        if plc in self.bounded_plcs:
+            self._packets.append((packet, requested, plc, client, write))
+
+    def _compare(self):
+        """
+        Decodes the bounded values of the queued packets and compares them with their bounds.
+
+        :return: List of out_of_range alerts, in item and address order.
+        """
+        import numpy as np
+        from .values import S7_TYPE_SIZES, decode_s7_numbers
+
+        # One entry per item with bounded variables: the variables of an item are consecutive rows of
+        # the range table (see find_variables), so an item is described by its first row and their number
+        table_rows, queued = self.rows, []
+        for index, (packet, requested, _, _, _) in enumerate(self._packets):
+            for item, variables in zip(packet["items"], requested):
+                if variables and item["resp_data"]:
+                    var, offset, bit_index = variables[0]
+                    first = table_rows.get(id(var))
+                    if first is not None:
+                        queued.append((item["resp_data"], first, len(variables), var["byte"] - offset, bit_index, index))
+        contexts, self._packets = self._packets, []
+        if not queued:
+            return []
+        datas, firsts, counts, starts, first_bits, packets = zip(*queued)
+
+        # One entry per (item, variable): table row, item, byte offset within the data of the item
+        counts, packets = np.array(counts), np.array(packets)
+        items = np.repeat(np.arange(len(counts)), counts)
+        rows = np.repeat(np.array(firsts), counts) + np.arange(len(items)) - np.repeat(np.cumsum(counts) - counts, counts)
+        offsets = self.bytes[rows] - np.array(starts)[items]
+        # A lone variable uses the bit index of its item (a BIT item returns its bit in bit 0)
+        bits = np.where(counts[items] == 1, np.array(first_bits, dtype=np.uint8)[items], self.bits[rows])
+        lengths = np.array([len(data) for data in datas])
+        positions = np.concatenate(([0], np.cumsum(lengths)[:-1]))[items] + offsets
+        buffer = np.frombuffer(b"".join(datas), dtype=np.uint8)
+
+        outside = np.zeros(len(rows), dtype=bool)
+        values = np.empty(len(rows), dtype=object)
+        types = self.types[rows]
+        for code in np.unique(types[types >= 0]).tolist():
+            data_type = RULE_NUMERIC_TYPES[code]
+            size = S7_TYPE_SIZES[data_type]
+            selected = np.flatnonzero((types == code) & (offsets + size <= lengths[items]))
+            numbers = decode_s7_numbers(data_type, buffer[positions[selected, None] + np.arange(size)], bits[selected])
+            with np.errstate(invalid="ignore"):                     # NaN (signalling ones too) is never outside
+                beyond = (numbers < self.lows[rows[selected]]) | (numbers > self.highs[rows[selected]])
+            outside[selected[beyond]] = True
+            values[selected[beyond]] = numbers[beyond].tolist()
+
+        alerts = []
+        for index in np.flatnonzero(outside).tolist():
+            (packet, _, plc, client, write), row, value = contexts[packets[items[index]]], rows[index], values[index]
+            name, bounds = self.names[row], f"[{self.lows[row]:g}, {self.highs[row]:g}]"
+            message = f"WRITE of {value} to '{name}' from {client}, outside {bounds}" if write else \
+                f"READ of '{name}' returned {value}, outside {bounds}"
+            alerts.append(self._alert(packet, "out_of_range", plc, client, message, name, value))
+        return alerts
+
+    # === REPORTING ===
+
+    def collect(self):
+        """
+        Compares the queued values with their bounds and returns the alerts raised since the last call.
+
+        The alerts are also appended to the alert file, if any.
+
+        :return: List of alert dictionaries, in frame order.
+        """
+        alerts, self._alerts = self._alerts, []
+        if self._packets:
+            alerts.extend(self._compare())
+            alerts.sort(key=operator.itemgetter("frame_number"))   # Stable: earlier checks of a frame stay first
+
+        for alert in alerts:
+            self.counts[alert["rule"]] += 1
+        if self._file is not None and alerts:
+            self._file.writelines(json.dumps(alert) + "\n" for alert in alerts)
+            self._file.flush()                                      # Lines can be followed while a stream runs
+        return alerts
+
+    def merge_comments(self, comments):
+        """
+        Adds the collected alerts to labels given as (frame_number, comment), in frame order.
+
+        :param comments: List of (frame_number, comment) of the packets checked since the last collect().
+        :return: List of (frame_number, comment), the alerts of a frame after its labels.
+        """
+        alerts = self.collect()
+        if not alerts:
+            return comments
+        return sorted(comments + [(alert["frame_number"], alert_comment(alert)) for alert in alerts],
+                      key=operator.itemgetter(0))
+
+    def format_summary(self):
+        """ One-line count of the alerts raised, per rule. """
+        total = sum(self.counts.values())
+        details = ", ".join(f"{rule}: {self.counts[rule]}" for rule in ALERT_RULES if self.counts[rule])
+        return f"{total} alerts" + (f" ({details})" if details else "") + \
+            (f" written to '{self.path}'." if self.path is not None else ".")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,367 @@
+import time
+import ctypes
+import itertools
+import concurrent.futures
+
+from .config import load_config, parse_variable_address, plc_memory_areas
+from .decoder import S7RawValue, format_seconds, format_timestamp
+from .enums import S7CommParamFunction, S7CommHeaderRosctr, S7CommMemoryArea, S7CommTransportSize
+
+# ===============================
+# ACTIVE SAMPLING
+# ===============================
+
+SAMPLER_INTERVAL_S = 1.0                                            # Seconds between the starts of two polling cycles
+SAMPLER_THREADS = 32                                                # PLCs polled at once by default
+SAMPLER_RECONNECT_S = 10.0                                          # Seconds between two connection attempts to a PLC
+SAMPLER_MAX_ITEMS = 20                                              # Items of one multi-variable read (snap7 limit)
+SAMPLER_MERGE_GAP_BYTES = 16                                        # Unused bytes read rather than adding an item
+SAMPLER_STRING_BYTES = 256                                          # STRING without "length": 2-byte header + 254 characters
+
+# S7COMM sizes: READ job header and parameter head, job item; ACK_DATA header and parameter head, data item header
+_JOB_BYTES, _JOB_ITEM_BYTES = 12, 12
+_ACK_DATA_BYTES, _DATA_ITEM_BYTES = 14, 4
+
+# snap7 result of a read item -> S7COMM return code name (None for the other snap7 errors)
+SNAP7_ITEM_RESULTS = {
+    0x00000000: "SUCCESS",
+    0x00900000: "ADDRESS_OUT_OF_RANGE",
+    0x00A00000: "DATA_TYPE_NOT_SUPPORTED",
+    0x00B00000: "DATA_TYPE_INCONSISTENT",
+    0x00C00000: "OBJECT_DOES_NOT_EXIST"
+}
+
+_AREA_NAMES = {area.value: area.name for area in S7CommMemoryArea}
+
+snap7 = None                                                        # snap7, imported on first sampler
+
+
+def _load_snap7():
+    """ Imports snap7, which is only needed to sample PLCs. """
+    global snap7
+    if snap7 is None:
+        try:
+            import snap7 as module
+            import snap7.client
+            import snap7.type
+        except ImportError:
+            raise RuntimeError("Sampling PLCs requires the 'python-snap7' package.") from None
+        snap7 = module
+
+
+def variable_size(var):
+    """
+    Bytes to read for a configured variable.
+
+    :param var: Variable entry of the YAML configuration (a STRING may give its "length" in characters).
+    :return: Size in bytes.
+    :raises ValueError: If the type of the variable is not supported.
+    """
+    from .values import S7_TYPE_SIZES                               # NumPy is only loaded when sampling
+
+    if var["type"] == "STRING":
+        return 2 + var["length"] if "length" in var else SAMPLER_STRING_BYTES
+    size = S7_TYPE_SIZES.get(var["type"])
+    if size is None:
+        raise ValueError(f"Unsupported type of variable '{var['name']}': {var['type']}.")
+    return size
+
+
+def locate_variables(plc):
+    """
+    Lists the variables of a configured PLC with the memory they occupy.
+
+    :param plc: PLC entry of the YAML configuration.
+    :return: List of (area code, db_number, byte, bit, size in bytes, variable), in address order.
+    """
+    located = []
+    for area, db_number, variables in plc_memory_areas(plc):
+        for var in variables:
+            byte, bit = parse_variable_address(var["address"])
+            located.append((area.value, db_number, byte, bit, variable_size(var), var))
+    located.sort(key=lambda entry: entry[:4])
+    return located
+
+
+def plan_reads(variables, pdu_length):
+    """
+    Groups variables into as few READ requests as the PDU size of their PLC allows.
+
+    Variables of one area and DB become one item while the hole between two of them is at most
+    SAMPLER_MERGE_GAP_BYTES and the item still fits alone in a response. Items are then packed into
+    multi-variable reads, largest first into the first request with room left, within the
+    SAMPLER_MAX_ITEMS limit and the size of the job and of its response. An item larger than a
+    response is read alone by an area read, which snap7 splits into several PDUs.
+
+    :param variables: Variables of one PLC, as returned by locate_variables.
+    :param pdu_length: PDU size negotiated with the PLC.
+    :return: List of requests {"items": [(area code, db_number, start byte, size, [(variable, byte offset, bit)])],
+        "area_read": bool, "response_bytes": int}, items in address order.
+    """
+    max_data = pdu_length - _ACK_DATA_BYTES - _DATA_ITEM_BYTES     # Data of an item alone in a response
+
+    items = []
+    for area, db_number, byte, bit, size, var in variables:
+        last = items[-1] if items else None
+        if last is not None and last[:2] == [area, db_number] and byte - last[3] <= SAMPLER_MERGE_GAP_BYTES and \
+                max(last[3], byte + size) - last[2] <= max_data:
+            last[3] = max(last[3], byte + size)
+            last[4].append((var, byte - last[2], bit))
+        else:
+            items.append([area, db_number, byte, byte + size, [(var, 0, bit)]])
+    items = [(area, db_number, start, end - start, members) for area, db_number, start, end, members in items]
+
+    requests = []
+    for item in sorted(items, key=lambda item: -item[3]):          # Stable: equal sizes stay in address order
+        size = item[3]
+        if size > max_data:
+            requests.append({"items": [item], "area_read": True,
+                             "response_bytes": _ACK_DATA_BYTES + _DATA_ITEM_BYTES + size})
+            continue
+
+        data_bytes = _DATA_ITEM_BYTES + size + size % 2              # Odd items are followed by a fill byte
+        for request in requests:
+            if not request["area_read"] and len(request["items"]) < SAMPLER_MAX_ITEMS and \
+                    _JOB_BYTES + _JOB_ITEM_BYTES * (len(request["items"]) + 1) <= pdu_length and \
+                    request["response_bytes"] + data_bytes <= pdu_length:
+                request["items"].append(item)
+                request["response_bytes"] += data_bytes
+                break
+        else:
+            requests.append({"items": [item], "area_read": False, "response_bytes": _ACK_DATA_BYTES + data_bytes})
+
+    for request in requests:
+        request["items"].sort(key=lambda item: item[:3])
+    requests.sort(key=lambda request: request["items"][0][:3])
+    return requests
+
+
+class PlcConnection:
+    """
+    Persistent snap7 connection to one configured PLC, with its read plan.
+
+    The plan is made when the connection is opened, from the PDU size negotiated with the PLC,
+    together with the snap7 item arrays and data buffers of every multi-variable read, which are
+    reused by each poll. A connection is used by one thread at a time.
+    """
+
+    def __init__(self, plc):
+        """
+        :param plc: PLC entry of the YAML configuration (ip, rack, slot, port, io_mapping).
+        :raises ValueError: If a variable has an unsupported type.
+        """
+        self.plc = plc
+        self.ip, self.name = plc["ip"], plc["name"]
+        self.variables = locate_variables(plc)
+        self.client = None
+        self.requests = []
+        self.retry_at = 0.0                                         # time.monotonic() of the next connection attempt
+        self.error = None                                           # Why the last poll failed (None after a success)
+        self.polls = self.failures = 0
+        self.poll_time = 0.0                                        # Seconds spent in successful polls
+
+    def connect(self):
+        """ Opens the connection and plans the reads for the negotiated PDU size. """
+        client = snap7.client.Client()
+        client.connect(self.ip, self.plc.get("rack", 0), self.plc.get("slot", 0), self.plc.get("port", 102))
+        requests = plan_reads(self.variables, client.get_pdu_length())
+
+        for request in requests:
+            if request["area_read"]:
+                continue
+            entries, buffers = (snap7.type.S7DataItem * len(request["items"]))(), []
+            for entry, (area, db_number, start, size, _) in zip(entries, request["items"]):
+                buffer = (ctypes.c_uint8 * size)()
+                entry.Area, entry.WordLen, entry.DBNumber = area, snap7.type.WordLen.Byte, db_number
+                entry.Start, entry.Amount = start, size
+                entry.pData = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_uint8))
+                buffers.append(buffer)
+            request["entries"], request["buffers"] = entries, buffers
+        self.client, self.requests = client, requests
+
+    def close(self):
+        if self.client is not None:
+            self.client.disconnect()
+            self.client = None                                      # Destroyed by snap7 when collected
+
+    def _read(self, request):
+        """
+        Sends one planned request.
+
+        :return: List of (return code name, item data or None), one per item.
+        :raises RuntimeError: If the request could not be sent or answered.
+        """
+        if request["area_read"]:
+            area, db_number, start, size, _ = request["items"][0]
+            try:
+                return [("SUCCESS", bytes(self.client.read_area(snap7.type.Area(area), db_number, start, size)))]
+            except RuntimeError:
+                if not self.client.get_connected():
+                    raise
+                return [(None, None)]                               # Refused by the PLC; snap7 keeps no item code
+
+        self.client.read_multi_vars(request["entries"])
+        return [(SNAP7_ITEM_RESULTS.get(entry.Result), bytes(buffer) if entry.Result == 0 else None)
+                for entry, buffer in zip(request["entries"], request["buffers"])]
+
+    def poll(self):
+        """
+        Reads every configured variable once, connecting first when needed.
+
+        :return: List of (request, timestamp_ns, [(return code name, item data)]), one per planned request, or None
+            when the PLC could not be read (reason in self.error).
+        """
+        if self.client is None:
+            if time.monotonic() < self.retry_at:
+                return None
+            try:
+                self.connect()
+            except RuntimeError as error:
+                self._fail(error)
+                return None
+
+        start, reads = time.perf_counter(), []
+        try:
+            for request in self.requests:
+                results = self._read(request)
+                reads.append((request, time.time_ns(), results))
+        except RuntimeError as error:
+            self._fail(error)
+            return None
+
+        self.polls += 1
+        self.poll_time += time.perf_counter() - start
+        self.error = None
+        return reads
+
+    def _fail(self, error):
+        """ Drops the connection after an error; it is reopened after SAMPLER_RECONNECT_S seconds. """
+        message = error.args[0] if error.args else error
+        self.error = (message.decode(errors="replace") if isinstance(message, bytes) else str(message)).strip()
+        self.failures += 1
+        self.close()
+        self.retry_at = time.monotonic() + SAMPLER_RECONNECT_S
+
+
+class Sampler:
+    """
+    Polls the configured PLCs with snap7 and returns their variables as table rows.
+
+    Every PLC has one persistent connection (see PlcConnection), reading its variables with the
+    fewest requests its PDU size allows. At each cycle, the PLCs are polled concurrently by a pool
+    of threads (snap7 calls release the GIL), and the values of the whole cycle are converted in one
+    batch. Rows follow the schema of table mode (TABLE_COLUMNS), as if labelled from the READ
+    responses: Frame_Number is the cycle, Header_PduRef the request within the PLC poll, Length the
+    response size, and the item columns describe the memory read for the variable.
+    """
+
+    def __init__(self, config, jobs=None):
+        """
+        :param config: Path to a YAML configuration, or parsed configuration dictionary.
+        :param jobs: (Optional) Number of PLCs polled at once (default: every PLC, up to SAMPLER_THREADS).
+        :raises ValueError: If a variable has an unsupported type.
+        """
+        _load_snap7()
+        if isinstance(config, str):
+            config = load_config(config)
+
+        self.connections = [PlcConnection(plc) for plc in config["plc"]]
+        self.connections = [connection for connection in self.connections if connection.variables]
+        self.jobs = max(1, min(jobs or SAMPLER_THREADS, len(self.connections)))
+        self.cycles = 0
+        self.first_timestamp = None                                 # Start of the first cycle (ns), origin of Timestamp_Shift
+        self._executor = None
+
+    def _request_rows(self, connection, pdu_ref, request, timestamp_ns, results):
+        """ Builds the table rows of one answered request, Data_Value still raw. """
+        rows = []
+        packet_row = {"Frame_Number": self.cycles,
+                      "Timestamp": format_timestamp(timestamp_ns),
+                      "Timestamp_Epoch": float(format_seconds(timestamp_ns)),
+                      "Timestamp_Shift": float(format_seconds(timestamp_ns - self.first_timestamp)),
+                      "Source_IP": connection.ip,
+                      "Destination_IP": None,                       # Local address, not exposed by snap7
+                      "Length": request["response_bytes"],
+                      "Header_Rosctr": S7CommHeaderRosctr.ACK_DATA.name,
+                      "Header_PduRef": pdu_ref,
+                      "Param_Function": S7CommParamFunction.READ.name,
+                      "Param_Item_Count": len(request["items"])}
+
+        for (area, db_number, start, size, members), (return_code, data) in zip(request["items"], results):
+            row = dict(packet_row,
+                       Param_Item_Transport_Size=S7CommTransportSize.BYTE.name,
+                       Param_Item_Length=size,
+                       Param_Item_DB=db_number,
+                       Param_Item_Area=_AREA_NAMES[area],
+                       Param_Address_Byte=start,
+                       Param_Address_Bit=0,
+                       Variable_Name=None,
+                       Data_Type=None,
+                       Data_Value=None,
+                       Data_Return_Code=return_code)
+            for var, offset, bit in members:
+                rows.append(dict(row, Variable_Name=var["name"], Data_Type=var["type"],
+                                 Data_Value=None if data is None else S7RawValue(data[offset:], bit)))
+        return rows
+
+    def sample(self):
+        """
+        Polls every PLC once.
+
+        :return: List of row dictionaries keyed by TABLE_COLUMNS, PLCs in configuration order; unreachable PLCs have none.
+        """
+        from .values import convert_row_values
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="gar7ic-sampler")
+        self.cycles += 1
+        if self.first_timestamp is None:
+            self.first_timestamp = time.time_ns()
+
+        rows = []
+        for connection, reads in zip(self.connections, self._executor.map(PlcConnection.poll, self.connections)):
+            for pdu_ref, (request, timestamp_ns, results) in enumerate(reads or [], 1):
+                rows.extend(self._request_rows(connection, pdu_ref, request, timestamp_ns, results))
+        return convert_row_values(rows)
+
+    def iter_cycles(self, interval=SAMPLER_INTERVAL_S, count=None):
+        """
+        Polls the PLCs every interval seconds; a cycle longer than the interval delays the next one.
+
+        :param interval: Seconds between the starts of two cycles.
+        :param count: (Optional) Number of cycles (default: until the generator is closed).
+        :return: Generator of the rows of each cycle (see sample).
+        """
+        due = time.monotonic()
+        for cycle in itertools.count(1):
+            yield self.sample()
+            if count is not None and cycle >= count:
+                return
+            due = max(due + interval, time.monotonic())             # Late cycles are not caught up
+            time.sleep(max(0.0, due - time.monotonic()))
+
+    # === REPORTING ===
+
+    def format_summary(self):
+        """ Human-readable summary of the polls, per PLC. """
+        lines = [f"{'PLC':<18}{'Variables':>10}{'Requests':>10}{'Polls':>8}{'Failed':>8}{'Poll time':>14}"]
+        for connection in self.connections:
+            poll_time = f"{connection.poll_time / connection.polls * 1000:.3f} ms" if connection.polls else "-"
+            lines.append(f"{connection.name or connection.ip:<18}{len(connection.variables):>10}"
+                         f"{len(connection.requests) or '-':>10}"
+                         f"{connection.polls:>8}{connection.failures:>8}{poll_time:>14}")
+        lines.append(f"\n{self.cycles} cycles.")
+        return "\n".join(lines)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for connection in self.connections:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,196 @@
+import csv
+
+from .annotate import iter_pcapng_copy
+from .capture import MappedCapture
+from .store import STORE_BATCH_ROWS
+from .table import TABLE_COLUMNS, TABLE_CHUNK_ROWS, TableWriter, new_table_buffer
+from .timeseries import TimeSeries, write_timeseries
+
+# ===============================
+# OUTPUT SINKS
+# ===============================
+
+class Sink:
+    """
+    Destination of labelled records (table rows or (frame_number, comment) pairs).
+
+    Subclasses implement write(); flush() and close() default to no-ops. Sinks are context managers.
+    """
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def write_all(self, records):
+        """ Writes every record of an iterable. """
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TableSink(Sink):
+    """ Collects table rows in typed column buffers and writes them in chunks as CSV, Parquet or Arrow. """
+
+    def __init__(self, path, table_format="csv", chunk_rows=TABLE_CHUNK_ROWS, append=False):
+        self.writer = TableWriter(path, table_format, append)
+        self.buffer = new_table_buffer()
+        self.chunk_rows = chunk_rows
+
+    def write(self, row):
+        for column, value in row.items():
+            self.buffer[column].append(value)
+
+        if len(self.buffer["Frame_Number"]) >= self.chunk_rows:
+            self.writer.write(self.buffer)
+
+    def flush(self):
+        if self.buffer["Frame_Number"]:
+            self.writer.write(self.buffer)
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class CsvLineSink(Sink):
+    """ Writes table rows as CSV lines; flush() makes them visible immediately (live streams). """
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file, lineterminator="\n")
+        self.writer.writerow(TABLE_COLUMNS)
+        self.file.flush()
+
+    def write(self, row):
+        self.writer.writerow(["Unknown" if value is None else value for value in row.values()])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class PcapngSink(Sink):
+    """
+    Copies a capture into a pcapng file, attaching the (frame_number, comment) records written to the sink.
+
+    Records must arrive in increasing frame order. Packets are copied as soon as no later record can
+    concern them. The source is memory-mapped, so uncommented blocks go from the page cache to the
+    output without being copied in Python.
+    """
+
+    def __init__(self, src_path, dst_path):
+        self._src = MappedCapture(src_path)
+        self._dst = open(dst_path, "wb")
+        self._blocks = iter_pcapng_copy(self._src.view)
+        self._next = next(self._blocks, None)                      # Next block to copy: (frame, encode)
+        self._comments = {}                                         # Frame number -> comments not yet written
+        self.commented = 0
+
+    def _copy_until(self, frame_number=None):
+        """ Copies the blocks preceding a frame (every remaining block when frame_number is None). """
+        while self._next is not None:
+            frame, encode = self._next
+            if frame is not None and frame_number is not None and frame[0] >= frame_number:
+                return
+
+            texts = [] if frame is None else self._comments.pop(frame[0], [])
+            if texts:
+                self.commented += 1
+            self._dst.write(encode(texts))
+            self._next = next(self._blocks, None)
+
+    def write(self, record):
+        frame_number, comment = record
+        self._copy_until(frame_number)
+        self._comments.setdefault(frame_number, []).append(comment)
+
+    def flush(self):
+        self._dst.flush()
+
+    def close(self):
+        self._copy_until()
+        self._next = self._blocks = None                            # Drop the last block views before unmapping
+        self._src.close()
+        self._dst.close()
+
+
+class StoreSink(Sink):
+    """ Inserts the table rows of one capture into a RecordStore, in batches of one transaction each. """
+
+    def __init__(self, store, capture_id, batch_rows=STORE_BATCH_ROWS):
+        """
+        :param store: RecordStore receiving the rows.
+        :param capture_id: Id of the capture in the store (see RecordStore.begin_capture).
+        :param batch_rows: Rows inserted per transaction.
+        """
+        self.store = store
+        self.capture_id = capture_id
+        self.batch_rows = batch_rows
+        self.rows = []
+        self._frame = None                                          # Frame of the last row and rows seen for it
+        self._index = 0
+
+    def write(self, row):
+        if row["Frame_Number"] != self._frame:
+            self._frame, self._index = row["Frame_Number"], 0
+        self.rows.append((self._index, row))
+        self._index += 1
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.store.insert(self.capture_id, self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.store.end_capture(self.capture_id)
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:                                        # An interrupted capture is not marked complete
+            self.close()
+
+
+class TrafficSink(Sink):
+    """ Aggregates table rows into TrafficStats; the report is rewritten periodically on flush() and on close(). """
+
+    def __init__(self, traffic):
+        self.traffic = traffic
+
+    def write(self, row):
+        self.traffic.add(row)
+
+    def flush(self):
+        self.traffic.tick()
+
+    def close(self):
+        self.traffic.save()
+
+
+class TimeSeriesSink(Sink):
+    """ Keeps the process values of table rows and writes them as a time series on close(). """
+
+    def __init__(self, path, table_format="csv", plcs=None, changes_only=False, pivot=False, resample=None, agg="last"):
+        self.path = path
+        self.format = table_format
+        self.series = TimeSeries(plcs, changes_only)
+        self.options = {"pivot": pivot, "resample": resample, "agg": agg}
+
+    def write(self, row):
+        self.series.add(row)
+
+    def close(self):
+        write_timeseries(self.series.to_frame(**self.options), self.path, self.format)
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import contextlib
+import collections
+
+from .enums import S7CommParamFunction, S7CommHeaderRosctr
+
+# ===============================
+# RUN STATISTICS
+# ===============================
+
+# Processing stages, in pipeline order. Time is attributed to exactly one stage at a time; "wait" is
+# the time the parent process spends waiting for worker results (--workers), the workers' own
+# stage times being added to the other stages.
+STAGES = ("config", "read", "decode", "label", "correlate", "convert", "write", "wait")
+
+STATS_INTERVAL_S = 10                                               # Stream mode: statistics file refresh period
+
+
+def _name(enum_class, value):
+    try:
+        return enum_class(value).name
+    except ValueError:
+        return "UNKNOWN" if value is None else str(value)
+
+
+class Stats:
+    """
+    Per-stage timings and packet counters of one run.
+
+    A single stage clock runs for the whole pipeline: wrappers built with timed()/wrap() switch
+    the current stage while the wrapped code runs and switch back afterwards, so nested stages
+    (e.g. read inside decode inside label) are each charged their own time only. Nothing is
+    wrapped when statistics are disabled, so the normal path pays no overhead.
+    """
+
+    def __init__(self, correlator=None, path=None, interval=STATS_INTERVAL_S):
+        """
+        :param correlator: (Optional) RequestCorrelator whose counters are reported with the statistics.
+        :param path: (Optional) Statistics file written by save(): JSON for *.json, Prometheus text otherwise.
+        :param interval: Minimum delay in seconds between two periodic writes by tick().
+        """
+        self.correlator = correlator
+        self.path = path
+        self.interval = interval
+        self.times = dict.fromkeys(STAGES, 0)                       # Stage -> nanoseconds
+        self.packets = collections.Counter()                        # (ROSCTR, function) -> labelled packets
+        self.unknown_addresses = 0                                  # Request items matching no configured variable
+        self.unknown_devices = 0                                    # Requests to IPs missing from the configuration
+        self._stage = "config"
+        self._last = time.perf_counter_ns()
+        self._saved = time.monotonic()
+
+    # === STAGE CLOCK ===
+
+    def switch(self, stage):
+        """
+        Charges the time elapsed since the last switch to the current stage and makes another stage current.
+
+        :param stage: Stage becoming current.
+        :return: Stage that was current before.
+        """
+        now = time.perf_counter_ns()
+        self.times[self._stage] += now - self._last
+        self._last = now
+        previous, self._stage = self._stage, stage
+        return previous
+
+    def timed(self, stage, iterable):
+        """ Wraps an iterable so that producing each item is charged to a stage. """
+        iterator = iter(iterable)
+        while True:
+            previous = self.switch(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.switch(previous)
+                return
+            self.switch(previous)
+            yield item
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """ Context manager charging the enclosed block to a stage. """
+        previous = self.switch(stage)
+        try:
+            yield
+        finally:
+            self.switch(previous)
+
+    def wrap(self, stage, function):
+        """ Wraps a function so that its calls are charged to a stage. """
+        def timed_function(*args, **kwargs):
+            previous = self.switch(stage)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.switch(previous)
+        return timed_function
+
+    def wrap_label(self, label):
+        """
+        Wraps label_packet_rows or label_packet_comments: times the call and counts packets and unknown items.
+
+        :param label: Labelling function (packet, lookup, correlator) -> list of rows or (frame_number, comment).
+        :return: Wrapped function with the same signature.
+        """
+        timed_label = self.wrap("label", label)
+
+        def counted_label(packet, lookup, correlator):
+            labels = timed_label(packet, lookup, correlator)
+            rosctr, function = packet["header_rosctr"], packet["param_func"]
+            self.packets[(_name(S7CommHeaderRosctr, rosctr), _name(S7CommParamFunction, function))] += 1
+
+            if rosctr == S7CommHeaderRosctr.JOB.value and function != S7CommParamFunction.SETUP_COMMUNICATION.value:
+                if packet["dst_ip"] not in lookup["plcs"]:
+                    self.unknown_devices += 1
+                elif labels and isinstance(labels[0], dict):
+                    self.unknown_addresses += sum(row["Variable_Name"] is None for row in labels)
+                else:
+                    self.unknown_addresses += sum(comment == "Unknown variable." for _, comment in labels)
+            return labels
+
+        return counted_label
+
+    def instrument(self, correlator):
+        """ Charges the request/response lookups of a correlator to the correlate stage. """
+        correlator.add_request = self.wrap("correlate", correlator.add_request)
+        correlator.match_response = self.wrap("correlate", correlator.match_response)
+
+    def release(self, correlator):
+        """ Removes the instrumentation of a correlator (e.g. before sending it to another process). """
+        for name in ("add_request", "match_response"):
+            correlator.__dict__.pop(name, None)
+
+    def merge(self, other):
+        """ Adds the timings and counters of another Stats (e.g. from a worker process). """
+        for stage, elapsed in other.times.items():
+            self.times[stage] += elapsed
+        self.packets.update(other.packets)
+        self.unknown_addresses += other.unknown_addresses
+        self.unknown_devices += other.unknown_devices
+
+    # === REPORTING ===
+
+    def to_dict(self):
+        """
+        Snapshot of the statistics.
+
+        :return: Dictionary with stage times (seconds), packet counts, unknown items and correlation counters.
+        """
+        self.switch(self._stage)                                    # Account for the current stage up to now
+        report = {
+            "stages": {stage: elapsed / 1e9 for stage, elapsed in self.times.items()},
+            "packets": [{"rosctr": rosctr, "function": function, "count": count}
+                        for (rosctr, function), count in sorted(self.packets.items())],
+            "unknown_addresses": self.unknown_addresses,
+            "unknown_devices": self.unknown_devices
+        }
+        if self.correlator is not None:
+            report["correlation"] = self.correlator.stats()
+        return report
+
+    def to_prometheus(self):
+        """ Statistics in the Prometheus text exposition format. """
+        report = self.to_dict()
+        lines = ["# HELP gar7ic_stage_seconds_total Time spent in each processing stage.",
+                 "# TYPE gar7ic_stage_seconds_total counter"]
+        lines += [f'gar7ic_stage_seconds_total{{stage="{stage}"}} {seconds:.9f}'
+                  for stage, seconds in report["stages"].items()]
+
+        lines += ["# HELP gar7ic_packets_total Labelled S7COMM packets by ROSCTR and function.",
+                  "# TYPE gar7ic_packets_total counter"]
+        lines += [f'gar7ic_packets_total{{rosctr="{entry["rosctr"]}",function="{entry["function"]}"}} {entry["count"]}'
+                  for entry in report["packets"]]
+
+        lines += ["# HELP gar7ic_unknown_items_total Request items that could not be labelled.",
+                  "# TYPE gar7ic_unknown_items_total counter",
+                  f'gar7ic_unknown_items_total{{reason="address"}} {report["unknown_addresses"]}',
+                  f'gar7ic_unknown_items_total{{reason="device"}} {report["unknown_devices"]}']
+
+        correlation = report.get("correlation")
+        if correlation is not None:
+            lines += ["# HELP gar7ic_responses_total Responses and requests by correlation outcome.",
+                      "# TYPE gar7ic_responses_total counter"]
+            lines += [f'gar7ic_responses_total{{result="{result}"}} {correlation[result]}'
+                      for result in ("matched", "orphaned", "expired")]
+            lines += ["# HELP gar7ic_pending_requests Requests waiting for their response.",
+                      "# TYPE gar7ic_pending_requests gauge",
+                      f'gar7ic_pending_requests {correlation["pending"]}',
+                      "# HELP gar7ic_response_latency_seconds Request to response latency per PLC.",
+                      "# TYPE gar7ic_response_latency_seconds gauge"]
+            for plc_ip, latency in sorted(correlation["latency"].items()):
+                lines += [f'gar7ic_response_latency_seconds{{plc="{plc_ip}",stat="{stat}"}} {latency[stat]:.9f}'
+                          for stat in ("mean", "min", "max")]
+
+        return "\n".join(lines) + "\n"
+
+    def format_summary(self):
+        """ Human-readable summary table of the statistics. """
+        report = self.to_dict()
+        total = sum(report["stages"].values()) or 1
+        lines = [f"{'Stage':<12}{'Time (s)':>12}{'Share':>9}"]
+        lines += [f"{stage:<12}{seconds:>12.3f}{seconds / total:>9.1%}" for stage, seconds in report["stages"].items()]
+        lines.append(f"{'total':<12}{total:>12.3f}")
+
+        lines.append(f"\n{'ROSCTR':<12}{'Function':<22}{'Packets':>10}")
+        lines += [f"{entry['rosctr']:<12}{entry['function']:<22}{entry['count']:>10}" for entry in report["packets"]]
+        lines.append(f"\nUnknown addresses: {report['unknown_addresses']}, unknown devices: {report['unknown_devices']}.")
+        return "\n".join(lines)
+
+    def save(self, path=None):
+        """
+        Writes the statistics file atomically, so it can be scraped while a stream is running.
+
+        :param path: (Optional) Output path instead of the one given at construction.
+        """
+        path = path or self.path
+        if path is None:
+            return
+        content = json.dumps(self.to_dict(), indent=2) if path.endswith(".json") else self.to_prometheus()
+        with open(path + ".tmp", "w") as file:
+            file.write(content)
+        os.replace(path + ".tmp", path)
+        self._saved = time.monotonic()
+
+    def tick(self):
+        """ Rewrites the statistics file when the refresh interval has elapsed (stream mode). """
+        if self.path is not None and time.monotonic() - self._saved >= self.interval:
+            self.save()
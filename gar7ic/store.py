@@ -0,0 +1,186 @@
+import os
+import json
+import sqlite3
+
+from .capture import file_digest
+from .enums import S7CommHeaderRosctr
+from .table import TABLE_COLUMNS
+
+# ===============================
+# RECORD STORE
+# ===============================
+
+# Output formats of table mode written to a database, and their default file extension
+STORE_FORMATS = {"sqlite": ".sqlite", "duckdb": ".duckdb"}
+
+STORE_BATCH_ROWS = 100_000                                          # Rows inserted per transaction
+STORE_CACHE_KIB = 131_072                                           # SQLite page cache, for the index updates of large batches
+
+# Columns added to the table rows: capture, rank of the row within its frame, PLC the row is about
+STORE_KEY_COLUMNS = ("Capture_Id", "Frame_Number", "Row_Index")
+STORE_COLUMNS = ("Capture_Id", "Row_Index") + tuple(TABLE_COLUMNS) + ("PLC_IP",)
+
+_DATA_VALUE = STORE_COLUMNS.index("Data_Value")
+
+STORE_INDEXES = {
+    "records_timestamp": ("Timestamp_Epoch",),
+    "records_plc": ("PLC_IP", "Timestamp_Epoch"),
+    "records_variable": ("Variable_Name", "Timestamp_Epoch")
+}
+
+duckdb = None                                                       # duckdb, imported on first DuckDB store
+
+
+def _load_duckdb():
+    """ Imports duckdb, which is only needed for DuckDB stores. """
+    global duckdb
+    if duckdb is None:
+        try:
+            import duckdb as module
+        except ImportError:
+            raise RuntimeError("DuckDB output requires the 'duckdb' package.") from None
+        duckdb = module
+
+
+def _sql_type(column, engine):
+    """ SQL type of a store column. """
+    if column == "Data_Value":
+        # SQLite keeps each value with its own type (BLOB affinity); DuckDB columns have one type
+        return "VARCHAR" if engine == "duckdb" else ""
+    dtype = TABLE_COLUMNS.get(column, "int64" if column in STORE_KEY_COLUMNS else "object")
+    if dtype in ("int64", "Int64"):
+        return "BIGINT"
+    return "DOUBLE" if dtype == "float64" else "VARCHAR"
+
+
+class RecordStore:
+    """
+    Database of labelled table rows, gathering the captures of many runs (SQLite, or DuckDB).
+
+    Every capture is registered by the SHA-256 of its content, and its rows are keyed by
+    (capture, frame number, rank within the frame): ingesting a capture again, under any name,
+    inserts nothing twice, and an interrupted ingest is completed by running it again. Rows are
+    inserted with executemany, one transaction per batch, into a table indexed by timestamp,
+    PLC address and variable name.
+    """
+
+    def __init__(self, path, engine=None):
+        """
+        :param path: Database file (created if missing).
+        :param engine: 'sqlite' or 'duckdb' (default: 'duckdb' for a *.duckdb path, 'sqlite' otherwise).
+        """
+        self.path = path
+        self.engine = engine or ("duckdb" if path.lower().endswith(STORE_FORMATS["duckdb"]) else "sqlite")
+        if self.engine == "duckdb":
+            _load_duckdb()
+            self.connection = duckdb.connect(path)
+        else:
+            self.connection = sqlite3.connect(path, isolation_level=None)   # Transactions are explicit
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(f"PRAGMA cache_size=-{STORE_CACHE_KIB}")
+        self._create_schema()
+        self._insert = (f"INSERT OR IGNORE INTO records ({', '.join(STORE_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(STORE_COLUMNS))})")
+
+    def _create_schema(self):
+        """ Creates the tables and indexes of a new store. """
+        columns = ",\n    ".join(f"{column} {_sql_type(column, self.engine)}".rstrip() for column in STORE_COLUMNS)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                Capture_Id BIGINT PRIMARY KEY,
+                Capture_Hash VARCHAR NOT NULL UNIQUE,
+                Path VARCHAR,
+                Size BIGINT,
+                Settings VARCHAR,
+                Row_Count BIGINT,
+                Complete BOOLEAN
+            )""")
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS records (
+                {columns},
+                PRIMARY KEY ({', '.join(STORE_KEY_COLUMNS)})
+            )""")
+        for name, columns in STORE_INDEXES.items():
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON records ({', '.join(columns)})")
+
+    def find_capture(self, digest):
+        """
+        Looks up an ingested capture.
+
+        :param digest: SHA-256 of the capture (see file_digest).
+        :return: Dictionary {"id", "path", "settings", "rows", "complete"}, or None if the capture was never ingested.
+        """
+        row = self.connection.execute("SELECT Capture_Id, Path, Settings, Row_Count, Complete FROM captures "
+                                      "WHERE Capture_Hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "path": row[1], "settings": json.loads(row[2]), "rows": row[3], "complete": bool(row[4])}
+
+    def begin_capture(self, path, digest=None, settings=None, replace=False):
+        """
+        Registers a capture before its rows are inserted.
+
+        :param path: Capture path.
+        :param digest: (Optional) SHA-256 of the capture, when already computed.
+        :param settings: (Optional) JSON-serializable description of the configuration and options.
+        :param replace: Delete the rows of a capture ingested before instead of refusing or skipping it.
+        :return: Capture id to insert rows with, or None if the capture is already complete in the store.
+        :raises ValueError: If the capture was ingested with other settings (and replace is not set).
+        """
+        digest = digest or file_digest(path)
+        known = self.find_capture(digest)
+        if known is not None and not replace:
+            if known["settings"] != settings:
+                raise ValueError(f"'{path}' is in '{self.path}' with another configuration or other options.")
+            if known["complete"]:
+                return None
+            return known["id"]                                      # Interrupted ingest: rows already in are ignored
+
+        self.connection.execute("BEGIN TRANSACTION")
+        if known is not None:
+            self.connection.execute("DELETE FROM records WHERE Capture_Id = ?", (known["id"],))
+            self.connection.execute("DELETE FROM captures WHERE Capture_Id = ?", (known["id"],))
+        capture_id = self.connection.execute("SELECT COALESCE(MAX(Capture_Id), 0) + 1 FROM captures").fetchone()[0]
+        self.connection.execute("INSERT INTO captures VALUES (?, ?, ?, ?, ?, 0, FALSE)",
+                                (capture_id, digest, os.path.abspath(path), os.path.getsize(path),
+                                 json.dumps(settings, sort_keys=True)))
+        self.connection.execute("COMMIT")
+        return capture_id
+
+    def insert(self, capture_id, rows):
+        """
+        Inserts table rows in one transaction; rows already in the store are ignored.
+
+        :param capture_id: Capture id from begin_capture.
+        :param rows: List of (row index within its frame, row dictionary keyed by TABLE_COLUMNS).
+        """
+        as_text = self.engine == "duckdb"
+        values = []
+        for index, row in rows:
+            value = row["Data_Value"]
+            if value is not None and (as_text or not isinstance(value, (int, float, str))):
+                value = str(value)
+            # Responses come from the PLC, jobs go to it
+            plc = row["Destination_IP"] if row["Header_Rosctr"] == S7CommHeaderRosctr.JOB.name else row["Source_IP"]
+            record = [capture_id, index, *row.values(), plc]
+            record[_DATA_VALUE] = value
+            values.append(record)
+
+        self.connection.execute("BEGIN TRANSACTION")
+        self.connection.executemany(self._insert, values)
+        self.connection.execute("COMMIT")
+
+    def end_capture(self, capture_id):
+        """ Marks the ingest of a capture as complete, with its row count. """
+        self.connection.execute("UPDATE captures SET Row_Count = (SELECT COUNT(*) FROM records WHERE Capture_Id = ?), "
+                                "Complete = TRUE WHERE Capture_Id = ?", (capture_id, capture_id))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
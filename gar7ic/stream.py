@@ -0,0 +1,81 @@
+from .annotate import annotate_pcapng
+from .correlation import RequestCorrelator
+from .decoder import Decoder
+from .labeling import label_packet_comments, label_packet_rows
+from .sinks import CsvLineSink
+
+# ===============================
+# STREAMING MODE
+# ===============================
+
+def stream_table_csv(src, dst_path, lookup, correlator=None, stats=None, frame_filter=None, reassemble=True, sink=None,
+                     rules=None):
+    """
+    Labels S7COMM traffic read from a live stream and appends one CSV line per item as packets arrive.
+
+    :param src: Binary file object delivering pcap/pcapng data (stdin, named pipe, ...).
+    :param dst_path: Output CSV path.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param correlator: (Optional) RequestCorrelator to use, e.g. to read its counters afterwards.
+    :param stats: (Optional) Stats measuring the stream, its file rewritten periodically.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :param sink: (Optional) Sink receiving the rows instead of a CSV file at dst_path (e.g. TrafficSink), flushed
+        after every packet.
+    :param rules: (Optional) RuleEngine attached to correlator, its alerts collected after every packet.
+    """
+    from .values import convert_row_values
+
+    if correlator is None:
+        correlator = RequestCorrelator()                            # Unanswered requests expire by capture time
+    label, convert = label_packet_rows, convert_row_values
+
+    with sink or CsvLineSink(dst_path) as sink:
+        write = sink.write_all
+        if stats is not None:
+            label, convert = stats.wrap_label(label), stats.wrap("convert", convert)
+            write = stats.wrap("write", write)
+
+        for packet in Decoder(stats=stats, frame_filter=frame_filter, reassemble=reassemble).iter_stream(src):
+            write(convert(label(packet, lookup, correlator)))
+            sink.flush()
+            if rules is not None:
+                rules.collect()
+            if stats is not None:
+                stats.tick()
+
+
+def stream_annotated_pcapng(src, dst_path, lookup, correlator=None, stats=None, frame_filter=None, reassemble=True,
+                            rules=None):
+    """
+    Labels S7COMM traffic read from a live stream and appends commented packets to a pcapng file.
+
+    :param src: Binary file object delivering pcap/pcapng data (stdin, named pipe, ...).
+    :param dst_path: Output pcapng path.
+    :param lookup: Compiled address index from build_fast_lookup.
+    :param correlator: (Optional) RequestCorrelator to use, e.g. to read its counters afterwards.
+    :param stats: (Optional) Stats measuring the stream (copying blocks counts as writing), its file rewritten periodically.
+    :param frame_filter: (Optional) FrameFilter discarding frames before they are decoded.
+    :param reassemble: Reassemble TCP segments (see Decoder).
+    :param rules: (Optional) RuleEngine attached to correlator; the alerts of each frame are added to its comments.
+    """
+    if correlator is None:
+        correlator = RequestCorrelator()                            # Unanswered requests expire by capture time
+    decode, label = Decoder(frame_filter=frame_filter, reassemble=reassemble).decode_segment, label_packet_comments
+    if stats is not None:
+        decode, label = stats.wrap("decode", decode), stats.wrap_label(label)
+
+    def comments_for_frame(*frame):
+        if stats is not None:
+            stats.tick()
+        comments = [comment for packet in decode(*frame) for comment in label(packet, lookup, correlator)]
+        if rules is not None:
+            comments = rules.merge_comments(comments)
+        return [comment for _, comment in comments]
+
+    with open(dst_path, "wb") as dst:
+        if stats is None:
+            annotate_pcapng(src, dst, comments_for_frame, flush=True)
+        else:
+            with stats.stage("write"):
+                annotate_pcapng(src, dst, comments_for_frame, flush=True)
@@ -0,0 +1,203 @@
+from enum import Enum
+
+from .enums import S7CommParamFunction, S7CommHeaderRosctr, S7CommMemoryArea, S7CommTransportSize, S7CommItemResponse
+
+# ===============================
+# TABLE BUILDING
+# ===============================
+
+# Column name -> dtype. Enum columns are categorical with the enum member names as fixed category set,
+# so chunks of the table stay consistent. Missing values are stored as nulls rather than "Unknown" strings.
+TABLE_COLUMNS = {
+    "Frame_Number": "int64",
+    "Timestamp": "object",
+    "Timestamp_Epoch": "float64",
+    "Timestamp_Shift": "float64",
+    "Source_IP": "object",
+    "Destination_IP": "object",
+    "Length": "int64",
+    "Header_Rosctr": S7CommHeaderRosctr,
+    "Header_PduRef": "int64",
+    "Param_Function": S7CommParamFunction,
+    "Param_Item_Count": "Int64",
+    "Param_Item_Transport_Size": S7CommTransportSize,
+    "Param_Item_Length": "Int64",
+    "Param_Item_DB": "Int64",
+    "Param_Item_Area": S7CommMemoryArea,
+    "Param_Address_Byte": "Int64",
+    "Param_Address_Bit": "Int64",
+    "Variable_Name": "object",
+    "Data_Type": "category",
+    "Data_Value": "object",
+    "Data_Return_Code": S7CommItemResponse
+}
+
+TABLE_CHUNK_ROWS = 100_000                                          # Rows kept in memory before being flushed
+
+
+def new_table_buffer():
+    """
+    Creates empty column buffers for the S7COMM table.
+
+    :return: Dictionary {column name: list of values}.
+    """
+    return {column: [] for column in TABLE_COLUMNS}
+
+
+pa = pq = None                                                      # pyarrow, imported on first Parquet/Arrow output
+
+
+def _is_enum_dtype(dtype):
+    """ Tells whether a TABLE_COLUMNS dtype is an S7COMM enumeration. """
+    return isinstance(dtype, type) and issubclass(dtype, Enum)
+
+
+def _pandas_dtype(dtype):
+    """ pandas dtype of a TABLE_COLUMNS entry. """
+    import pandas as pd
+    return pd.CategoricalDtype([member.name for member in dtype]) if _is_enum_dtype(dtype) else dtype
+
+
+def _load_pyarrow():
+    """ Imports pyarrow, which is only needed for Parquet/Arrow output. """
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet/Arrow output requires the 'pyarrow' package.") from None
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def table_buffer_to_frame(buffer):
+    """
+    Converts column buffers into a typed DataFrame in a single allocation per column.
+
+    :param buffer: Dictionary {column name: list of values} as created by new_table_buffer.
+    :return: pandas DataFrame with the dtypes of TABLE_COLUMNS.
+    """
+    import pandas as pd                                             # Only table mode needs pandas
+    return pd.DataFrame({column: pd.Series(values, dtype=_pandas_dtype(TABLE_COLUMNS[column]))
+                         for column, values in buffer.items()})
+
+
+def flush_table_csv(buffer, path, header):
+    """
+    Appends the buffered rows to a CSV file and empties the buffers.
+
+    :param buffer: Dictionary {column name: list of values}.
+    :param path: Output CSV path.
+    :param header: True for the first chunk (file is truncated and the header written).
+    """
+    table_buffer_to_frame(buffer).to_csv(path, mode="w" if header else "a", header=header, index=False,
+                                         encoding="utf-8", na_rep="Unknown")
+    for values in buffer.values():
+        values.clear()
+
+
+# Output formats of table mode and their default file extension
+TABLE_FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "feather": ".feather"}
+
+# Text columns with few distinct values, dictionary-encoded like the enum columns in Parquet/Arrow output
+TABLE_DICTIONARY_COLUMNS = ("Source_IP", "Destination_IP", "Variable_Name")
+
+
+def _arrow_field(column, dtype):
+    """ Arrow field of a TABLE_COLUMNS entry (Data_Value, whose type depends on the variable, is stored as text). """
+    if _is_enum_dtype(dtype) or dtype == "category" or column in TABLE_DICTIONARY_COLUMNS:
+        return pa.field(column, pa.dictionary(pa.int32(), pa.string()))
+    if dtype in ("int64", "Int64"):
+        return pa.field(column, pa.int64(), nullable=dtype == "Int64")
+    if dtype == "float64":
+        return pa.field(column, pa.float64())
+    return pa.field(column, pa.string())
+
+
+class TableWriter:
+    """
+    Writes the S7COMM table chunk by chunk as CSV, Parquet or Arrow IPC (Feather v2).
+
+    Each chunk becomes a Parquet row group or an Arrow record batch, so the table is never held in
+    memory as a whole. Dictionaries only grow across chunks, which Arrow IPC files store as deltas.
+    A CSV table can also be continued: with append, rows are added after the existing ones.
+    """
+
+    def __init__(self, path, table_format="csv", append=False):
+        if table_format not in TABLE_FORMATS:
+            raise ValueError(f"Unsupported table format: {table_format}")
+        if append and table_format != "csv":
+            raise ValueError("Only CSV tables can be appended to.")
+        if table_format != "csv":
+            _load_pyarrow()
+
+        self.path = path
+        self.format = table_format
+        self.append = append
+        self.rows = 0
+        self._writer = None
+        self._dictionaries = {}                                     # Column -> {value: dictionary index}
+
+        if table_format != "csv":
+            self.schema = pa.schema([_arrow_field(column, dtype) for column, dtype in TABLE_COLUMNS.items()])
+            for column, dtype in TABLE_COLUMNS.items():
+                if _is_enum_dtype(dtype):
+                    self._dictionaries[column] = {member.name: index for index, member in enumerate(dtype)}
+                elif pa.types.is_dictionary(self.schema.field(column).type):
+                    self._dictionaries[column] = {}
+
+    def _record_batch(self, buffer):
+        """ Converts column buffers into an Arrow record batch with the writer's schema. """
+        arrays = []
+        for column, values in buffer.items():
+            codes = self._dictionaries.get(column)
+            if codes is not None:
+                indices = pa.array([None if value is None else codes.setdefault(value, len(codes)) for value in values],
+                                   pa.int32())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(list(codes), pa.string())))
+            elif column == "Data_Value":
+                arrays.append(pa.array([None if value is None else str(value) for value in values], pa.string()))
+            else:
+                arrays.append(pa.array(values, self.schema.field(column).type))
+        return pa.record_batch(arrays, schema=self.schema)
+
+    def _open(self):
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression="zstd")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression="zstd", emit_dictionary_deltas=True)
+            self._writer = pa.ipc.new_file(self.path, self.schema, options=options)
+
+    def write(self, buffer):
+        """
+        Appends the buffered rows to the output and empties the buffers.
+
+        :param buffer: Dictionary {column name: list of values} as created by new_table_buffer.
+        """
+        rows = len(buffer["Frame_Number"])
+
+        if self.format == "csv":
+            flush_table_csv(buffer, self.path, header=self.rows == 0 and not self.append)
+        else:
+            if self._writer is None:
+                self._open()
+            if rows:
+                self._writer.write_batch(self._record_batch(buffer))
+            for values in buffer.values():
+                values.clear()
+
+        self.rows += rows
+
+    def close(self):
+        """ Finalises the output file (an empty table still gets its header/schema). """
+        if self.rows == 0 and self._writer is None:
+            self.write(new_table_buffer())
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
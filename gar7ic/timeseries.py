@@ -0,0 +1,154 @@
+from .enums import S7CommParamFunction, S7CommHeaderRosctr, S7CommItemResponse
+
+# ===============================
+# PROCESS-VALUE TIME SERIES
+# ===============================
+
+TIMESERIES_AGGREGATIONS = ("last", "mean", "min", "max")
+
+
+def is_process_value(row):
+    """
+    Tells whether a labelled table row carries a process value: a successful READ response or a WRITE job.
+
+    :param row: Row dictionary with a converted Data_Value.
+    :return: True if the row has a variable and a value to keep.
+    """
+    if row["Variable_Name"] is None or row["Data_Value"] is None or row["Param_Function"] is None:
+        return False
+    if row["Header_Rosctr"] == S7CommHeaderRosctr.ACK_DATA.name:
+        return row["Param_Function"] == S7CommParamFunction.READ.name and \
+            row["Data_Return_Code"] == S7CommItemResponse.SUCCESS.name
+    return row["Header_Rosctr"] == S7CommHeaderRosctr.JOB.name and row["Param_Function"] == S7CommParamFunction.WRITE.name
+
+
+class TimeSeries:
+    """
+    Collects (timestamp, PLC, variable, value) points from labelled table rows.
+
+    Only the points are kept, in three flat lists (epoch seconds, series index, value), instead of
+    the twenty columns of the full table. With changes_only, a point is dropped as it arrives when
+    its value equals the previous value of the same series.
+    """
+
+    def __init__(self, plcs=None, changes_only=False):
+        """
+        :param plcs: (Optional) {IP: name} of the configured PLCs (lookup["plcs"]), to name series by PLC.
+        :param changes_only: Keep only the points where the value of a series changes.
+        """
+        self.plcs = plcs or {}
+        self.changes_only = changes_only
+        self.series = {}                                            # (PLC, variable) -> series index
+        self.timestamps = []
+        self.indexes = []
+        self.values = []
+        self._last = {}                                             # Series index -> last kept value
+
+    def add(self, row):
+        """
+        Adds the process value of a table row, if it carries one.
+
+        :param row: Row dictionary keyed by TABLE_COLUMNS, with a converted Data_Value.
+        """
+        if not is_process_value(row):
+            return
+
+        # Responses come from the PLC, write jobs go to it
+        ip = row["Source_IP"] if row["Header_Rosctr"] == S7CommHeaderRosctr.ACK_DATA.name else row["Destination_IP"]
+        key = (self.plcs.get(ip, ip), row["Variable_Name"])
+        index = self.series.setdefault(key, len(self.series))
+
+        value = row["Data_Value"]
+        if self.changes_only:
+            if index in self._last and self._last[index] == value:
+                return
+            self._last[index] = value
+
+        self.timestamps.append(row["Timestamp_Epoch"])
+        self.indexes.append(index)
+        self.values.append(value)
+
+    def add_rows(self, rows):
+        """ Adds the process values of an iterable of table rows. """
+        for row in rows:
+            self.add(row)
+
+    def to_frame(self, pivot=False, resample=None, agg="last"):
+        """
+        Builds the time series as a DataFrame.
+
+        :param pivot: Return one column per "PLC/variable" (indexed by timestamp, last known value carried forward)
+            instead of the long (Timestamp, PLC, Variable, Value) layout.
+        :param resample: (Optional) pandas offset alias (e.g. "1s", "5min") of the aggregation windows.
+        :param agg: Aggregation of the values of a window: last, mean, min or max (numeric values only except last).
+        :return: pandas DataFrame.
+        """
+        import numpy as np
+        import pandas as pd
+
+        if agg not in TIMESERIES_AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation: {agg}")
+
+        indexes = np.array(self.indexes, dtype=np.int64)
+        plcs = np.array([plc for plc, _ in self.series] or [""], dtype=object)
+        variables = np.array([variable for _, variable in self.series] or [""], dtype=object)
+        frame = pd.DataFrame({
+            "Timestamp": pd.to_datetime(np.array(self.timestamps, dtype=np.float64), unit="s", utc=True),
+            "PLC": pd.Categorical(plcs[indexes]),
+            "Variable": pd.Categorical(variables[indexes]),
+            "Value": _value_series(self.values, numeric=agg != "last")
+        })
+
+        if resample is not None:
+            frame = frame.groupby(["PLC", "Variable", pd.Grouper(key="Timestamp", freq=resample)], observed=True,
+                                  sort=False)["Value"].agg(agg).reset_index().sort_values("Timestamp", kind="stable")
+            frame = frame[["Timestamp", "PLC", "Variable", "Value"]].reset_index(drop=True)
+
+        if not pivot:
+            return frame
+
+        columns = frame["PLC"].astype(str) + "/" + frame["Variable"].astype(str)
+        wide = frame.assign(Series=columns).groupby(["Timestamp", "Series"], sort=False)["Value"].last().unstack("Series")
+        wide = wide.sort_index().rename_axis(columns=None)
+        if resample is not None:
+            wide = wide.resample(resample).asfreq()                 # Windows without any point become rows too
+        return wide.ffill()
+
+
+def _value_series(values, numeric=False):
+    """
+    Converts process values to a pandas Series: float64 when every value is a number or boolean, object otherwise.
+
+    :param values: List of converted values.
+    :param numeric: Coerce every value to a number (non-numeric values become NaN), for arithmetic aggregations.
+    :return: pandas Series.
+    """
+    import pandas as pd
+
+    series = pd.Series(values, dtype="object")
+    converted = pd.to_numeric(series, errors="coerce")
+    if numeric or converted.notna().sum() == series.notna().sum():
+        return converted.astype("float64")
+    return series
+
+
+def write_timeseries(frame, path, table_format="csv"):
+    """
+    Writes a time-series DataFrame as CSV, Parquet or Arrow IPC.
+
+    :param frame: DataFrame from TimeSeries.to_frame.
+    :param path: Output path.
+    :param table_format: csv, parquet, arrow or feather.
+    """
+    if frame.index.name == "Timestamp":
+        frame = frame.reset_index()                                 # Pivoted frame: timestamp as first column
+    if table_format == "csv":
+        frame.to_csv(path, index=False, encoding="utf-8")
+        return
+
+    # Arrow columns need one type: mixed values (text, dates) are stored as text
+    frame = frame.astype({column: str for column in frame.columns if frame[column].dtype == object})
+    if table_format == "parquet":
+        frame.to_parquet(path, index=False, compression="zstd")
+    else:
+        frame.to_feather(path)
@@ -0,0 +1,271 @@
+import os
+import json
+import math
+import time
+
+from .correlation import LATENCY_BUCKETS_S
+from .enums import S7CommParamFunction, S7CommHeaderRosctr, S7CommItemResponse
+
+# ===============================
+# TRAFFIC STATISTICS
+# ===============================
+
+TRAFFIC_QUANTILES = (0.5, 0.9, 0.99)                                # Latency quantiles estimated from the histogram
+
+
+class RunningMoments:
+    """ Count, mean, variance (Welford's algorithm), minimum and maximum of a series, in constant memory. """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = self.m2 = 0.0
+        self.min = self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    @property
+    def std(self):
+        """ Population standard deviation (0 below two values). """
+        return math.sqrt(self.m2 / self.count) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "std": self.std, "min": self.min, "max": self.max}
+
+
+def histogram_quantile(bounds, counts, quantile, maximum):
+    """
+    Estimates a quantile from a fixed-bucket histogram, as the upper bound of the bucket reaching it.
+
+    :param bounds: Bucket upper bounds, increasing.
+    :param counts: Values per bucket, with one more bucket (above the last bound) than bounds.
+    :param quantile: Quantile in [0, 1].
+    :param maximum: Largest value, bounding the last bucket and every estimate.
+    :return: Estimated quantile, or None without values.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank, seen = quantile * total, 0
+    for bound, count in zip(bounds, counts):
+        seen += count
+        if seen >= rank:
+            return min(bound, maximum)
+    return maximum
+
+
+class _VariableTraffic:
+    """ Traffic counters of one variable of one PLC. """
+
+    __slots__ = ("polls", "intervals", "last_poll", "writes", "return_codes")
+
+    def __init__(self):
+        self.polls = 0                                              # READ requests of the variable
+        self.intervals = RunningMoments()                           # Seconds between consecutive polls
+        self.last_poll = None                                       # (frame number, timestamp) of the last poll
+        self.writes = 0                                             # WRITE requests of the variable
+        self.return_codes = {}                                      # Return code name -> responses
+
+
+class TrafficStats:
+    """
+    Operational metrics of the labelled S7COMM traffic, aggregated in one pass over the table rows.
+
+    For each (PLC, variable): number of READ requests (polls) with the mean, standard deviation
+    (jitter), minimum and maximum of the time between consecutive polls, number of WRITE requests
+    and response return codes. For each PLC: request/response latency histogram, read from the
+    correlator that labelled the rows. Memory depends on the number of variables only, whatever
+    the length of the capture or stream; rows are not kept.
+    """
+
+    def __init__(self, correlator=None, plcs=None, path=None, interval=None):
+        """
+        :param correlator: (Optional) RequestCorrelator labelling the rows, for the response latencies.
+        :param plcs: (Optional) {IP: name} of the configured PLCs (lookup["plcs"]).
+        :param path: (Optional) Report file written by save(): JSON for *.json, Prometheus text otherwise.
+        :param interval: (Optional) Minimum delay in seconds between two periodic writes by tick().
+        """
+        self.correlator = correlator
+        self.plcs = plcs or {}
+        self.path = path
+        self.interval = interval
+        self.variables = {}                                         # (PLC IP, variable name or None) -> _VariableTraffic
+        self.rows = 0
+        self.first = self.last = None                               # Timestamp_Epoch of the first and last rows
+        self._saved = time.monotonic()
+
+    def add(self, row):
+        """
+        Accounts for one labelled table row.
+
+        :param row: Row dictionary keyed by TABLE_COLUMNS.
+        """
+        self.rows += 1
+        timestamp = row["Timestamp_Epoch"]
+        if self.first is None:
+            self.first = timestamp
+        self.last = timestamp
+
+        job = row["Header_Rosctr"] == S7CommHeaderRosctr.JOB.name
+        plc = row["Destination_IP"] if job else row["Source_IP"]     # Jobs go to the PLC, responses come from it
+        key = (plc, row["Variable_Name"])
+        variable = self.variables.get(key)
+        if variable is None:
+            variable = self.variables[key] = _VariableTraffic()
+
+        if job:
+            if row["Param_Function"] == S7CommParamFunction.READ.name:
+                last = variable.last_poll
+                if last is None or last[0] != row["Frame_Number"]:  # A variable read twice by one request is one poll
+                    variable.polls += 1
+                    if last is not None:
+                        variable.intervals.add(timestamp - last[1])
+                    variable.last_poll = (row["Frame_Number"], timestamp)
+            elif row["Param_Function"] == S7CommParamFunction.WRITE.name:
+                variable.writes += 1
+        elif row["Header_Rosctr"] == S7CommHeaderRosctr.ACK_DATA.name and row["Data_Return_Code"] is not None:
+            variable.return_codes[row["Data_Return_Code"]] = variable.return_codes.get(row["Data_Return_Code"], 0) + 1
+
+    def add_rows(self, rows):
+        """ Accounts for an iterable of table rows. """
+        for row in rows:
+            self.add(row)
+
+    # === REPORTING ===
+
+    def to_dict(self):
+        """
+        Snapshot of the metrics.
+
+        :return: Dictionary {"first", "last", "rows", "plcs": [...], "variables": [...]}; times in seconds.
+        """
+        variables = []
+        for (plc, name), variable in sorted(self.variables.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+            intervals = variable.intervals
+            variables.append({
+                "plc": plc,
+                "plc_name": self.plcs.get(plc),
+                "variable": name,
+                "polls": variable.polls,
+                "poll_rate": 1 / intervals.mean if intervals.count and intervals.mean > 0 else None,
+                "poll_interval": intervals.to_dict(),
+                "writes": variable.writes,
+                "return_codes": dict(sorted(variable.return_codes.items()))
+            })
+
+        plcs = {}
+        for entry in variables:
+            errors = sum(count for code, count in entry["return_codes"].items() if code != S7CommItemResponse.SUCCESS.name)
+            plc = plcs.setdefault(entry["plc"], {"plc": entry["plc"], "plc_name": entry["plc_name"], "variables": 0,
+                                                 "polls": 0, "writes": 0, "errors": 0, "latency": None})
+            plc["variables"] += entry["variable"] is not None
+            plc["polls"] += entry["polls"]
+            plc["writes"] += entry["writes"]
+            plc["errors"] += errors
+
+        latencies = {} if self.correlator is None else self.correlator.stats()["latency"]
+        for plc_ip, latency in latencies.items():
+            plc = plcs.setdefault(plc_ip, {"plc": plc_ip, "plc_name": self.plcs.get(plc_ip), "variables": 0,
+                                           "polls": 0, "writes": 0, "errors": 0})
+            plc["latency"] = dict(latency, bounds=list(LATENCY_BUCKETS_S),
+                                  quantiles={str(quantile): histogram_quantile(LATENCY_BUCKETS_S, latency["buckets"], quantile,
+                                                                               latency["max"])
+                                             for quantile in TRAFFIC_QUANTILES})
+
+        return {"first": self.first, "last": self.last, "rows": self.rows,
+                "plcs": [plcs[plc_ip] for plc_ip in sorted(plcs)], "variables": variables}
+
+    def to_prometheus(self):
+        """ Metrics in the Prometheus text exposition format. """
+        report = self.to_dict()
+        lines = ["# HELP gar7ic_variable_polls_total READ requests per variable.",
+                 "# TYPE gar7ic_variable_polls_total counter"]
+        labelled = [(f'plc="{entry["plc"]}",variable="{_escape(entry["variable"] or "")}"', entry)
+                    for entry in report["variables"]]
+        lines += [f"gar7ic_variable_polls_total{{{labels}}} {entry['polls']}" for labels, entry in labelled]
+
+        lines += ["# HELP gar7ic_variable_poll_interval_seconds Time between consecutive polls of a variable.",
+                  "# TYPE gar7ic_variable_poll_interval_seconds gauge"]
+        for labels, entry in labelled:
+            interval = entry["poll_interval"]
+            if interval["count"]:
+                lines += [f'gar7ic_variable_poll_interval_seconds{{{labels},stat="{stat}"}} {interval[stat]:.9f}'
+                          for stat in ("mean", "std", "min", "max")]
+
+        lines += ["# HELP gar7ic_variable_writes_total WRITE requests per variable.",
+                  "# TYPE gar7ic_variable_writes_total counter"]
+        lines += [f"gar7ic_variable_writes_total{{{labels}}} {entry['writes']}" for labels, entry in labelled if entry["writes"]]
+
+        lines += ["# HELP gar7ic_variable_responses_total Response items per variable and return code.",
+                  "# TYPE gar7ic_variable_responses_total counter"]
+        lines += [f'gar7ic_variable_responses_total{{{labels},code="{code}"}} {count}'
+                  for labels, entry in labelled for code, count in entry["return_codes"].items()]
+
+        lines += ["# HELP gar7ic_plc_response_latency_seconds Request to response latency per PLC.",
+                  "# TYPE gar7ic_plc_response_latency_seconds histogram"]
+        for plc in report["plcs"]:
+            latency = plc["latency"]
+            if latency is None:
+                continue
+            cumulative = 0
+            for bound, count in zip(latency["bounds"] + ["+Inf"], latency["buckets"]):
+                cumulative += count
+                lines.append(f'gar7ic_plc_response_latency_seconds_bucket{{plc="{plc["plc"]}",le="{bound}"}} {cumulative}')
+            lines += [f'gar7ic_plc_response_latency_seconds_sum{{plc="{plc["plc"]}"}} {latency["mean"] * latency["count"]:.9f}',
+                      f'gar7ic_plc_response_latency_seconds_count{{plc="{plc["plc"]}"}} {latency["count"]}']
+
+        return "\n".join(lines) + "\n"
+
+    def format_summary(self):
+        """ Human-readable summary of the metrics, per PLC. """
+        report = self.to_dict()
+        lines = [f"{'PLC':<18}{'Variables':>10}{'Polls':>10}{'Writes':>9}{'Errors':>8}"
+                 f"{'Latency p50':>14}{'p90':>14}{'p99':>14}{'max':>14}"]
+        for plc in report["plcs"]:
+            latency = plc["latency"]
+            times = [None] * 4 if latency is None else \
+                [latency["quantiles"][str(quantile)] for quantile in TRAFFIC_QUANTILES] + [latency["max"]]
+            times = ["-" if value is None else f"{value * 1000:.3f} ms" for value in times]
+            lines.append(f"{plc['plc_name'] or plc['plc']:<18}{plc['variables']:>10}{plc['polls']:>10}{plc['writes']:>9}"
+                         f"{plc['errors']:>8}" + "".join(f"{time:>14}" for time in times))
+
+        polled = [entry for entry in report["variables"] if entry["poll_interval"]["count"]]
+        if polled:
+            jittery = max(polled, key=lambda entry: entry["poll_interval"]["std"])
+            lines.append(f"\n{len(polled)} variables polled; largest poll jitter: {jittery['variable']} "
+                         f"({jittery['plc']}), every {jittery['poll_interval']['mean'] * 1000:.3f} ms "
+                         f"± {jittery['poll_interval']['std'] * 1000:.3f} ms.")
+        return "\n".join(lines)
+
+    def save(self, path=None):
+        """
+        Writes the report file atomically, so it can be scraped while a stream is running.
+
+        :param path: (Optional) Output path instead of the one given at construction.
+        """
+        path = path or self.path
+        if path is None:
+            return
+        content = json.dumps(self.to_dict(), indent=2) if path.endswith(".json") else self.to_prometheus()
+        with open(path + ".tmp", "w") as file:
+            file.write(content)
+        os.replace(path + ".tmp", path)
+        self._saved = time.monotonic()
+
+    def tick(self):
+        """ Rewrites the report file when the refresh interval has elapsed (stream mode). """
+        if self.path is not None and self.interval is not None and time.monotonic() - self._saved >= self.interval:
+            self.save()
+
+
+def _escape(text):
+    """ Escapes a Prometheus label value. """
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
@@ -0,0 +1,145 @@
+import datetime
+
+import numpy as np
+
+from .decoder import S7RawValue
+
+# ===============================
+# VALUE CONVERSION
+# ===============================
+
+# Big-endian NumPy dtype of each fixed-size numeric S7 type
+S7_NUMPY_DTYPES = {
+    "BYTE": "u1", "WORD": ">u2", "UINT": ">u2", "INT": ">i2",
+    "DWORD": ">u4", "UDINT": ">u4", "DINT": ">i4", "REAL": ">f4", "LREAL": ">f8"
+}
+
+# Bytes needed to decode each S7 type (STRING: 2-byte header, characters follow)
+S7_TYPE_SIZES = dict({"BOOL": 1, "CHAR": 1, "S5TIME": 2, "DATE_AND_TIME": 8, "STRING": 2},
+                     **{data_type: np.dtype(dtype).itemsize for data_type, dtype in S7_NUMPY_DTYPES.items()})
+
+S5TIME_BASES_MS = np.array([10, 100, 1000, 10000])                 # S5TIME time base codes 0-3
+
+
+def _bcd(values):
+    """ Decodes an array of packed BCD bytes/words (two digits per byte) into integers. """
+    result = np.zeros(values.shape, dtype=np.int64)
+    for shift in range(values.dtype.itemsize * 8 - 4, -1, -4):
+        result = result * 10 + ((values >> shift) & 0xF)
+    return result
+
+
+def _decode_date_and_time(buffer):
+    """ Decodes concatenated 8-byte BCD DATE_AND_TIME values into datetime objects (None when invalid). """
+    fields = _bcd(np.frombuffer(buffer, dtype="u1").reshape(-1, 8))
+    years = np.where(fields[:, 0] < 90, 2000, 1900) + fields[:, 0]
+    microseconds = (fields[:, 6] * 10 + fields[:, 7] // 10) * 1000  # Last byte: millisecond digit + weekday
+
+    values = []
+    for year, (_, month, day, hour, minute, second, _, _), microsecond in \
+            zip(years.tolist(), fields.tolist(), microseconds.tolist()):
+        try:
+            values.append(datetime.datetime(year, month, day, hour, minute, second, microsecond))
+        except ValueError:
+            values.append(None)
+    return values
+
+
+def decode_s7_numbers(data_type, matrix, bit_indexes):
+    """
+    Decodes numeric S7 values held in the rows of a byte matrix, as a NumPy array.
+
+    :param data_type: S7 type name (any key of S7_NUMPY_DTYPES, BOOL or S5TIME).
+    :param matrix: uint8 array with one value per row, S7_TYPE_SIZES[data_type] bytes each.
+    :param bit_indexes: Bit index of each value (used by BOOL).
+    :return: Array of values (S5TIME in seconds).
+    """
+    if data_type in S7_NUMPY_DTYPES:
+        return np.ascontiguousarray(matrix).view(S7_NUMPY_DTYPES[data_type]).ravel()
+    if data_type == "BOOL":
+        return ((matrix[:, 0] >> np.asarray(bit_indexes, dtype="u1")) & 1).astype(bool)
+    if data_type == "S5TIME":
+        words = np.ascontiguousarray(matrix).view(">u2").ravel()
+        return _bcd(words & 0x0FFF) * S5TIME_BASES_MS[(words >> 12) & 0x3] / 1000     # Seconds
+    raise ValueError(f"Unsupported numeric type: {data_type}")
+
+
+def _decode_s7_batch(data_type, buffer, bit_indexes):
+    """
+    Decodes the concatenated fixed-size values of one S7 type.
+
+    :param data_type: S7 type name (any key of S7_TYPE_SIZES except STRING).
+    :param buffer: Bytes of every value, S7_TYPE_SIZES[data_type] bytes each.
+    :param bit_indexes: Bit index of each value (used by BOOL).
+    :return: List of Python values.
+    """
+    if data_type == "CHAR":
+        return list(buffer.decode("latin-1"))
+    if data_type == "DATE_AND_TIME":
+        return _decode_date_and_time(buffer)
+    matrix = np.frombuffer(buffer, dtype="u1").reshape(-1, S7_TYPE_SIZES[data_type])
+    return decode_s7_numbers(data_type, matrix, bit_indexes).tolist()
+
+
+def convert_s7_values(raw_values, data_types):
+    """
+    Converts raw S7COMM item data into values, decoding all the values of one type at once.
+
+    :param raw_values: List of S7RawValue (big-endian data as transmitted by the PLC) or None.
+    :param data_types: S7 type of each value ('BOOL', 'INT', 'REAL', 'DINT', 'STRING', ...).
+    :return: List of converted values (None where the data is missing or too short for its type).
+    """
+    values = [None] * len(raw_values)
+
+    groups = {}
+    for index, (raw, data_type) in enumerate(zip(raw_values, data_types)):
+        if raw is not None:
+            groups.setdefault(data_type, []).append(index)
+
+    for data_type, indexes in groups.items():
+        size = S7_TYPE_SIZES.get(data_type)
+        if size is None:
+            raise ValueError(f"Unsupported type: {data_type}")
+
+        indexes = [index for index in indexes if len(raw_values[index].data) >= size]
+
+        if data_type == "STRING":
+            for index in indexes:
+                data = raw_values[index].data                       # Maximum length, current length, characters
+                values[index] = bytes(data[2:2 + min(data[0], data[1])]).decode("latin-1")
+            continue
+
+        if indexes:
+            buffer = b"".join(raw_values[index].data[:size] for index in indexes)
+            decoded = _decode_s7_batch(data_type, buffer, [raw_values[index].bit_index for index in indexes])
+            for index, value in zip(indexes, decoded):
+                values[index] = value
+
+    return values
+
+
+def convert_s7_bytes_to_value(data_bytes, data_type, bit_index=0):
+    """
+    Convert raw S7COMM item data into a value based on the specified type.
+
+    :param data_bytes: The raw item data (big-endian, as transmitted by the PLC)
+    :param data_type: Expected data type (any key of S7_TYPE_SIZES)
+    :param bit_index: (Optional) Bit index for BOOL (0-7) if applicable
+    :return: Converted value
+    """
+    return convert_s7_values([S7RawValue(data_bytes, bit_index)], [data_type])[0]
+
+
+def convert_row_values(rows):
+    """
+    Replaces the raw Data_Value of table rows (S7RawValue) by converted values, in one batch.
+
+    :param rows: List of row dictionaries from label_packet_rows, updated in place.
+    :return: The same list.
+    """
+    indexes = [index for index, row in enumerate(rows) if isinstance(row["Data_Value"], S7RawValue)]
+    values = convert_s7_values([rows[index]["Data_Value"] for index in indexes],
+                               [rows[index]["Data_Type"] for index in indexes])
+    for index, value in zip(indexes, values):
+        rows[index]["Data_Value"] = value
+    return rows